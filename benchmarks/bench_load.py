@@ -0,0 +1,82 @@
+"""Benchmark: load_processed_files per-file mode vs --bulk mode.
+
+    python benchmarks/bench_load.py --files 100 --rows-per-file 5000 --existing 200000
+
+Writes `--files` staged CSVs of synthetic processed rows (a share of them
+re-scraping listings already in the DB), loads them into a DB pre-seeded with
+`--existing` rows in each mode, checks both modes leave identical tables, and
+prints the load time per mode.
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+import hashlib
+import shutil
+import sqlite3
+import tempfile
+
+import config
+from scripts import load_to_db, staging
+from bench_upsert import make_processed
+
+
+def table_digest(db: Path) -> str:
+    digest = hashlib.sha256()
+    conn = sqlite3.connect(db)
+    for row in conn.execute(f"SELECT * FROM {config.DB_TABLE} ORDER BY ads_id"):
+        digest.update(repr(row).encode())
+    conn.close()
+    return digest.hexdigest()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--files", type=int, default=100)
+    ap.add_argument("--rows-per-file", type=int, default=5000)
+    ap.add_argument("--existing", type=int, default=200_000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        # New rows get ids past the seeded ones; every 4th file re-scrapes seeded ids.
+        fresh = make_processed(args.files * args.rows_per_file, seed=1)
+        fresh["ads_id"] = [str(900000000 + i) for i in range(len(fresh))]
+        seeded = make_processed(args.existing, seed=2).drop_duplicates("ads_id")
+        frames = [fresh.iloc[i * args.rows_per_file:(i + 1) * args.rows_per_file]
+                  for i in range(args.files)]
+        for i in range(0, args.files, 4):
+            frames[i] = seeded.iloc[:args.rows_per_file]
+
+        seed_db = tmp / "seed.db"
+        config.DB_FILE = seed_db
+        conn = load_to_db.connect()
+        load_to_db.upsert_dataframe(conn, seeded)
+        conn.commit()
+        conn.close()
+
+        digests = {}
+        for mode in ("per-file", "bulk"):
+            config.DB_FILE = tmp / f"{mode}.db"
+            shutil.copy(seed_db, config.DB_FILE)
+            config.PROCESSED_DATA_DIR = tmp / f"processed-{mode}"
+            config.RAW_DATA_DIR = tmp / f"raw-{mode}"
+            config.PROCESSED_DATA_DIR.mkdir()
+            config.RAW_DATA_DIR.mkdir()
+            for i, frame in enumerate(frames):
+                staging.write(frame, config.PROCESSED_DATA_DIR / f"file_{i:04d}.csv")
+
+            start = time.perf_counter()
+            rows = load_to_db.load_processed_files(bulk=mode == "bulk")
+            elapsed = time.perf_counter() - start
+            digests[mode] = table_digest(config.DB_FILE)
+            print(f"  {mode:<9} {rows:>9,} rows from {args.files} files in {elapsed:6.2f}s "
+                  f"({rows / elapsed:>9,.0f} rows/s)")
+        assert digests["per-file"] == digests["bulk"], "modes disagree"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Benchmark: v1 properties vs the compact v2 layout (scripts/schema_v2.py).
+
+    python benchmarks/bench_schema.py --rows 1000000
+
+Loads a synthetic processed frame into a fresh on-disk DB, exports it to a v2 file,
+then prints each table's on-disk size (dbstat) and the time of a typical
+analytical scan — mean rent per state/region for one month — against v1,
+against properties_v2 directly, and through the decoding view. All three must
+return the same rows.
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+import sqlite3
+import tempfile
+
+import numpy as np
+
+import config
+from bench_upsert import make_processed
+from scripts import load_to_db, schema_v2
+
+REGIONS = ["Shah Alam", "Petaling Jaya", "Klang", "Cheras", "Johor Bahru", "Georgetown"]
+
+# 20574..20604 = 2026-05-01..2026-05-31 as days since the epoch.
+QUERIES = {
+    "v1": f"""
+        SELECT state, region, COUNT(*), AVG(monthly_rent) FROM {config.DB_TABLE}
+        WHERE scrape_date BETWEEN '2026-05-01' AND '2026-05-31'
+        GROUP BY state, region ORDER BY state, region""",
+    "v2": f"""
+        SELECT s.name, r.name, n, rent FROM (
+            SELECT state_code, region_code, COUNT(*) AS n, AVG(monthly_rent) AS rent
+            FROM {schema_v2.V2_TABLE}
+            WHERE scrape_date_day BETWEEN 20574 AND 20604
+            GROUP BY state_code, region_code) g
+        LEFT JOIN lk_state s ON s.id = g.state_code
+        LEFT JOIN lk_region r ON r.id = g.region_code
+        ORDER BY s.name, r.name""",
+    "v2 view": f"""
+        SELECT state, region, COUNT(*), AVG(monthly_rent) FROM {schema_v2.V2_VIEW}
+        WHERE scrape_date BETWEEN '2026-05-01' AND '2026-05-31'
+        GROUP BY state, region ORDER BY state, region""",
+}
+
+
+def table_bytes(conn: sqlite3.Connection, table: str, schema: str = "main") -> int:
+    """Bytes of the table plus its indexes."""
+    return conn.execute(
+        f"SELECT SUM(pgsize) FROM dbstat(?) WHERE name = ? "
+        f"OR name IN (SELECT name FROM {schema}.sqlite_master WHERE type = 'index' AND tbl_name = ?)",
+        (schema, table, table),
+    ).fetchone()[0]
+
+
+def timed(conn: sqlite3.Connection, sql: str, repeat: int = 3):
+    best, rows = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = conn.execute(sql).fetchall()
+        best = min(best, time.perf_counter() - start)
+    return best, rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    args = ap.parse_args()
+
+    df = make_processed(args.rows)
+    df["region"] = np.array(REGIONS)[np.arange(len(df)) % len(REGIONS)]
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file, v2_file = Path(tmp) / "bench.db", Path(tmp) / "bench_v2.db"
+        conn = sqlite3.connect(db_file)
+        load_to_db.ensure_schema(conn)
+        load_to_db.upsert_dataframe(conn, df)
+        conn.commit()
+        start = time.perf_counter()
+        schema_v2.export(db_file, v2_file)
+        print(f"{args.rows:,} rows; exported to v2 in {time.perf_counter() - start:.1f}s")
+
+        conn.execute("ATTACH DATABASE ? AS v2", (str(v2_file),))
+        v1, v2 = table_bytes(conn, config.DB_TABLE), table_bytes(conn, schema_v2.V2_TABLE, "v2")
+        print(f"  size   v1 {v1 / 2**20:8.1f} MiB   v2 {v2 / 2**20:8.1f} MiB  ({v2 / v1:.0%})")
+        results = {name: timed(conn, sql) for name, sql in QUERIES.items()}
+        for name, (elapsed, _) in results.items():
+            print(f"  scan   {name:<8} {elapsed * 1000:8.1f} ms")
+        assert len({repr(rows) for _, rows in results.values()}) == 1, "layouts disagree"
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
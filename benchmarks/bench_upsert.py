@@ -0,0 +1,139 @@
+"""Benchmark: streaming upsert_dataframe vs the whole-frame path it replaced.
+
+    python benchmarks/bench_upsert.py --rows 100000 1000000
+
+Loads a synthetic processed frame (typed like a staged file, with NULLs and a
+few duplicate ads_ids) into a fresh on-disk DB with each path, checks the two
+tables are identical, and prints rows/sec plus how far the upsert pushed peak
+RSS above the process's footprint with the frame already built (Linux: the
+peak is reset via /proc/self/clear_refs just before the upsert). Each run gets
+its own process so the peaks don't mask each other.
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+import hashlib
+import multiprocessing
+import sqlite3
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import config
+from scripts import load_to_db
+
+
+def make_processed(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    ids = (100000000 + np.arange(rows)).astype(str)
+    ids[rng.random(rows) < 0.001] = ids[0]  # a few duplicates to drop
+    rent = rng.integers(300, 20000, rows).astype(float)
+    rent[rng.random(rows) < 0.02] = np.nan
+    size = rng.integers(150, 9000, rows).astype(float)
+    size[rng.random(rows) < 0.05] = np.nan
+    states = np.array(["Selangor", "Kuala Lumpur", "Johor", "Penang"])
+    rooms = rng.integers(1, 8, rows).astype(str).astype(object)
+    rooms[rng.random(rows) < 0.02] = None
+    df = pd.DataFrame({
+        "ads_id": ids,
+        "monthly_rent": rent,
+        "property_type": "Condominium",
+        "category_id": "Apartment / Condominium",
+        "CPI": "Condominium",
+        "state": states[rng.integers(0, len(states), rows)],
+        "rooms": rooms,
+        "size": size,
+        "address": "Shah Alam, Selangor",
+        "latitude": rng.uniform(1, 7, rows),
+        "longitude": rng.uniform(100, 119, rows),
+        "publishedDatetime": "05/01/2026",
+        "scrape_date": "2026-05-01",
+    })
+    from scripts import staging
+    return staging.conform(df)
+
+
+def legacy_upsert(conn: sqlite3.Connection, df: pd.DataFrame) -> int:
+    """The pre-streaming upsert: copy, reindex, astype(object), values.tolist()."""
+    cols = load_to_db.SCRAPE_COLUMNS
+    df = df.drop_duplicates(subset="ads_id").copy()
+    for col in cols:
+        if col not in df.columns:
+            df[col] = None
+    df = df[cols]
+    df = df.astype(object).where(pd.notnull(df), None)
+    insert_cols = cols + ["first_seen"]
+    update_set = ", ".join(f"{c} = excluded.{c}" for c in cols if c != "ads_id")
+    sql = (
+        f"INSERT INTO {config.DB_TABLE} ({', '.join(insert_cols)}, availability_status) "
+        f"VALUES ({', '.join('?' * len(insert_cols))}, 'active') "
+        f"ON CONFLICT(ads_id) DO UPDATE SET {update_set}, availability_status = 'active', "
+        f"gone_at = NULL, last_checked_at = excluded.scrape_date"
+    )
+    i = cols.index("scrape_date")
+    conn.executemany(sql, [row + [row[i]] for row in df.values.tolist()])
+    return len(df)
+
+
+PATHS = {"legacy": legacy_upsert, "streaming": load_to_db.upsert_dataframe}
+
+
+def _status_kib(field: str) -> int:
+    for line in Path("/proc/self/status").read_text().splitlines():
+        if line.startswith(field + ":"):
+            return int(line.split()[1])
+    raise KeyError(field)
+
+
+def _reset_peak_rss() -> int:
+    """Reset the peak-RSS watermark; returns current RSS in bytes."""
+    Path("/proc/self/clear_refs").write_text("5")
+    return _status_kib("VmRSS") * 1024
+
+
+def run(name: str, rows: int, db: str):
+    """One timed upsert in a fresh process. Returns (count, seconds, peak bytes, table digest)."""
+    df = make_processed(rows)
+    conn = sqlite3.connect(db)
+    conn.execute(load_to_db.CREATE_TABLE_SQL)
+    baseline = _reset_peak_rss()
+    start = time.perf_counter()
+    count = PATHS[name](conn, df)
+    conn.commit()
+    elapsed = time.perf_counter() - start
+    peak = _status_kib("VmHWM") * 1024 - baseline
+    digest = hashlib.sha256()
+    for row in conn.execute(f"SELECT * FROM {config.DB_TABLE} ORDER BY ads_id"):
+        digest.update(repr(row).encode())
+    conn.close()
+    return count, elapsed, peak, digest.hexdigest()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = ap.parse_args()
+
+    spawn = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            results = {}
+            for name in PATHS:
+                with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+                    results[name] = pool.submit(run, name, rows, str(Path(tmp) / f"{name}.db")).result()
+            assert results["legacy"][0] == results["streaming"][0]
+            assert results["legacy"][3] == results["streaming"][3], "paths disagree"
+            print(f"{rows:>9,} rows")
+            for name, (count, elapsed, peak, _) in results.items():
+                print(f"  {name:<10} {count / elapsed:>10,.0f} rows/s  "
+                      f"{elapsed:6.2f}s  peak +{peak / 2**20:7.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
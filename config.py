@@ -13,7 +13,12 @@ MAPPING_FILE = DATA_DIR / "mapping.csv"
 
 # SQLite database
 DB_FILE = DATA_DIR / "mudah_rent.db"
+# Compact v2 export of the listings (scripts/schema_v2.py); read-only snapshot.
+DB_V2_FILE = DATA_DIR / "mudah_rent_v2.db"
 DB_TABLE = "properties"
+# Persisted known-ads_id index (scripts/known_ids.py) for the scraper's skip_known
+# filter. Set to None to rebuild it from the DB on every run instead.
+KNOWN_IDS_FILE = DATA_DIR / "known_ids.idx"
 
 # Ensure directories exist
 RAW_DATA_DIR.mkdir(parents=True, exist_ok=True)
@@ -22,7 +27,27 @@ PROCESSED_DATA_DIR.mkdir(parents=True, exist_ok=True)
 # --- Geolocation Configuration ---
 GEOLOCATOR_USER_AGENT = "mudah_rent_analysis/1.0"
 GEOLOCATION_TIMEOUT = 5  # seconds
-GEO_CACHE_FILE = DATA_DIR / "geocache.json"
+# Geocoder backend (scripts/geocoder.py): "nominatim" (public, 1 req/s),
+# "nominatim-local" (self-hosted at GEOCODER_LOCAL_URL), "offline" (centroid
+# table only, no network) or "null" (no geocoding).
+GEOCODER_BACKEND = "nominatim"
+GEOCODER_LOCAL_URL = "localhost:8080"
+GEOCODER_LOCAL_SCHEME = "http"
+GEOCODER_LOCAL_WORKERS = 16         # requests in flight against the local server
+GEOCODER_MIN_DELAY = {              # seconds between requests, per backend
+    "nominatim": 1.0,               # public usage policy
+    "nominatim-local": 0.0,
+}
+GEOCODER_BATCH_SIZE = 64            # queued queries handed to geocode_many at once
+GEO_CACHE_FILE = DATA_DIR / "geocache.json"   # legacy cache, migrated once into GEO_CACHE_DB
+# Geocode cache: one indexed SQLite row per query, written as results arrive.
+# Failed lookups ([None, None]) are retried once older than the negative TTL.
+GEO_CACHE_DB = DATA_DIR / "geocache.db"
+GEO_CACHE_NEGATIVE_TTL_DAYS = 30
+# Offline centroid table (scripts/offline_geocoder.py), built from the cache plus
+# the bundled gazetteer and consulted before any network geocode.
+GEO_OFFLINE = True
+GEO_GAZETTEER_FILE = DATA_DIR / "gazetteer.csv"
 
 # --- Logging Configuration ---
 LOG_DIR = PROJECT_ROOT / "logs"
@@ -38,6 +63,24 @@ LOG_DIR.mkdir(exist_ok=True)
 SCRAPED_TYPE_FILENAME_TEMPLATE = "{state}_{type_id}_{type_slug}_{timestamp}.csv"
 SCRAPED_COMBINED_FILENAME_TEMPLATE = "{state}_ALL_{timestamp}.csv"
 SCRAPED_COMBINED_MARKER = "_ALL_"
+# Format of the processed staging files clean.py hands to load_to_db.py:
+# "csv" (default, easy to eyeball) or "parquet" (typed and compact; needs the
+# optional pyarrow package). Raw scrape output is always CSV. See scripts/staging.py.
+STAGING_FORMAT = "csv"
+# load_to_db.upsert_dataframe converts and sends rows to SQLite this many at a
+# time, so peak memory stays flat however large the frame being loaded is.
+LOAD_CHUNK_ROWS = 10_000
+# PRAGMAs for load_to_db --bulk (backfills, full rebuilds). synchronous=OFF trades
+# crash durability for speed — a bulk load interrupted mid-way is simply re-run
+# (its files are only removed after the single commit).
+BULK_LOAD_PRAGMAS = [
+    "synchronous=OFF",
+    "cache_size=-262144",   # KiB (negative) -> 256 MiB page cache
+    "temp_store=MEMORY",
+]
+# Rows per streamed batch: the scrape appends each batch to the per-type and
+# combined CSVs as it goes instead of holding a whole state's listings in memory.
+SCRAPE_BATCH_SIZE = 500
 
 # --- API Configuration ---
 API_BASE_URL = "https://search.mudah.my/v1/search"
@@ -48,8 +91,6 @@ API_PAGE_SIZE = 200  # Server caps a page at 200 (live-probed); >200 silently tr
                      # 24 re-fetched the same rows ~8x. Sending limit + paging by 200 fixes it.
 API_FIELDS = "all"
 API_REQUEST_TIMEOUT = 15
-API_MIN_DELAY = 0.5  # seconds between API calls (polite)
-API_MAX_DELAY = 1.5
 
 # Desktop UA — Mudah serves a stripped variant to mobile UAs
 API_USER_AGENT = (
@@ -62,6 +103,59 @@ API_MAX_RETRIES = 4
 API_BACKOFF_BASE = 2.0      # seconds; exponential: base * 2**attempt
 API_RETRY_MAX_WAIT = 300    # cap any single backoff/Retry-After at 5 min
 
+# Connection pooling — every search/lookup/iter_listings call shares one keep-alive
+# session (mudah_api.ApiClient), so pages and rechecks reuse TCP+TLS connections
+# instead of paying a handshake per request. Everything goes to a single host, so
+# one pool; API_POOL_MAXSIZE bounds how many connections it keeps open at once.
+API_POOL_MAXSIZE = 10
+API_ACCEPT_ENCODING = "gzip, deflate"
+
+# Adaptive request pacing (mudah_api.AdaptiveRateLimiter, AIMD). One limiter is shared
+# by every API request — serial pages, concurrent scrape windows, rechecks. Clean
+# responses add API_RATE_INCREASE req/s; a 403/429/5xx multiplies the rate by
+# API_RATE_DECREASE and pauses all callers for the Retry-After/backoff wait.
+# The learned rate is saved to API_RATE_STATE_FILE at the end of each run and used
+# as the next run's starting rate; API_RATE_LIMIT is the start when none is saved
+# (~1 req/s matches the old fixed 0.5-1.5 s polite delay).
+API_RATE_LIMIT = 1.0   # requests/second across all in-flight queries
+API_RATE_BURST = 4
+API_RATE_MIN = 0.2
+API_RATE_MAX = 5.0
+API_RATE_INCREASE = 0.05
+API_RATE_DECREASE = 0.5
+API_RATE_STATE_FILE = DATA_DIR / "api_rate.json"
+
+# Incremental scrape (run_pipeline.py --incremental): each (region, property_type_id)
+# window remembers the newest list_id it has seen (table WATERMARK_TABLE), and the
+# next run stops paginating at the first page holding nothing newer. Relies on the
+# API's default newest-first ordering. A window gets a full sweep anyway when its
+# last one is SCRAPE_FULL_SWEEP_DAYS old, to catch re-surfaced (bumped) ads.
+WATERMARK_TABLE = "scrape_watermarks"
+SCRAPE_FULL_SWEEP_DAYS = 7
+# Every scraped window also records the ids it saw (known ones included) and when;
+# `recheck.py --mode sweep` treats a fresh sighting as proof of life instead of
+# spending a per-listing lookup on it.
+SIGHTINGS_TABLE = "listing_sightings"
+# Append-only history (scripts/history.py): a row per listing whenever its rent or
+# availability status changes, written by triggers on DB_TABLE.
+OBSERVATIONS_TABLE = "listing_observations"
+# Rent summaries per (state, region, CPI, rooms, scrape week) (scripts/aggregates.py).
+# Triggers on DB_TABLE list the groups a write touches in SUMMARY_DIRTY_TABLE; each
+# load (and recheck) recomputes just those.
+SUMMARY_TABLE = "rent_summary"
+SUMMARY_DIRTY_TABLE = "rent_summary_dirty"
+# content_hash values written since the last dedup (load_to_db._dedup), committed
+# with the rows themselves, so a run that dies before its dedup leaves them for the next.
+DEDUP_PENDING_TABLE = "dedup_pending"
+
+# Concurrent scrape (scrape.scrape_states_concurrent / run_pipeline.py --concurrency):
+# how many (state, property_type_id) windows are paginated at once.
+SCRAPE_CONCURRENCY = 1
+
+# Pages of one (region, property_type_id) window fetched in parallel once page one
+# has reported the window's total (mudah_api.iter_listings). Shares the limiter.
+API_PAGE_CONCURRENCY = 4
+
 # Empirical depth cap: the API returns an empty data array at offset >= ~9984,
 # regardless of total-results. Filter per property_type_id to get a fresh window.
 API_OFFSET_CAP = 9984
@@ -126,6 +220,14 @@ EXCLUDED_CATEGORIES = frozenset({"Commercial Property", "Land"})
 # recheck.py uses this to track availability with a decaying check cadence.
 RECHECK_DECAY = [(7, 1), (21, 3), (None, 7)]   # (age_days_lt, interval_days); None = catch-all
 AD_EXPIRY_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Lookups run on a thread pool (sharing the API rate limiter); one writer applies
+# results with executemany, committing every RECHECK_COMMIT_EVERY rows so a crash
+# loses at most that many checks.
+RECHECK_WORKERS = 4
+RECHECK_COMMIT_EVERY = 200
+
+# clean.py cleans raw files CLEAN_WORKERS at a time in a process pool (1 = serial).
+CLEAN_WORKERS = 1
 
 # Region codes (state URL slug -> Mudah region_id), probed from each state's listing
 # page __NEXT_DATA__.initialQuery (one-shot scripts/discover_regions.py, since deleted —
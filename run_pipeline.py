@@ -10,6 +10,15 @@ Usage:
 
     # Skip scraping (clean + load only — reprocess existing raw files)
     python run_pipeline.py --skip-scrape
+
+    # Scrape up to 8 (state, property type) windows at once
+    python run_pipeline.py --concurrency 8
+
+    # Daily run: stop each window at its watermark (full sweep when one is due)
+    python run_pipeline.py --incremental
+
+    # Clean + upsert scraped batches in memory, skipping the staging files
+    python run_pipeline.py --incremental --direct
 """
 
 import argparse
@@ -21,7 +30,7 @@ from pathlib import Path
 ROOT = Path(__file__).parent
 sys.path.insert(0, str(ROOT))
 import config
-from scripts import scrape, clean, load_to_db
+from scripts import scrape, clean, load_to_db, mudah_api
 
 
 def step(label: str):
@@ -35,33 +44,102 @@ def main():
     parser.add_argument("--state", required=False, default="all",
                         help="State URL slug (e.g. 'selangor'), or 'all' for every state. Default: all.")
     parser.add_argument("--skip-scrape", action="store_true", help="Skip scraping, run clean+load only")
+    parser.add_argument("--concurrency", type=int, default=config.SCRAPE_CONCURRENCY,
+                        help="(state, property type) windows scraped at once; the API "
+                             "rate limiter is shared. Default: "
+                             f"{config.SCRAPE_CONCURRENCY} (serial).")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Stop paging each window at its stored watermark (newest "
+                             "list_id seen). Windows whose last full sweep is older than "
+                             f"{config.SCRAPE_FULL_SWEEP_DAYS} days are swept fully anyway.")
+    parser.add_argument("--full-sweep", action="store_true",
+                        help="With --incremental: sweep every window fully this run.")
+    parser.add_argument("--clean-workers", type=int, default=config.CLEAN_WORKERS,
+                        help="Raw files cleaned in parallel (processes). Default: "
+                             f"{config.CLEAN_WORKERS} (serial).")
+    parser.add_argument("--direct", action="store_true",
+                        help="Clean each scraped batch in memory and upsert it straight "
+                             "into the DB — no raw/processed files (steps 2-3 then only "
+                             "pick up leftovers from interrupted runs).")
+    parser.add_argument("--checkpoint", action="store_true",
+                        help="With --direct: still write per-type raw CSVs as crash-safe "
+                             "checkpoints, deleting each once its window is loaded.")
+    parser.add_argument("--bulk-load", action="store_true",
+                        help="Load step in bulk mode (backfills / rebuilds): all files in one "
+                             "transaction via a staging table, indexes rebuilt once.")
     args = parser.parse_args()
 
     start_time = time.time()
+    scrape_failed = False
 
     if not args.skip_scrape:
         step("STEP 1: Scraping")
         # scrape_all_types writes per-type checkpoints + a combined CSV
         # under data/raw/<state>/ as it goes.
+        # With --direct, batches go through clean + upsert instead.
         states = sorted(config.REGION_CODES) if args.state == "all" else [args.state]
+        loader = load_to_db.DirectLoader() if args.direct else None
+        direct = dict(sink=loader, checkpoint=args.checkpoint) if loader else {}
 
         total_rows = 0
-        for i, state in enumerate(states, 1):
-            print(f"\n[{i}/{len(states)}] Scraping state: {state}")
-            df = scrape.scrape_all_types(state)
-            total_rows += len(df)
-            print(f"  {state}: {len(df)} unique rows")
+        try:
+            if args.concurrency > 1:
+                print(f"Scraping {len(states)} state(s) with concurrency {args.concurrency}")
+                try:
+                    results = scrape.scrape_states_concurrent(
+                        states, concurrency=args.concurrency,
+                        incremental=args.incremental, full_sweep=args.full_sweep, **direct,
+                    )
+                except scrape.ScrapeError as e:
+                    # Still clean + load what the other windows scraped, then exit non-zero.
+                    print(f"  {e}")
+                    results, scrape_failed = e.counts, True
+                for state, count in results.items():
+                    total_rows += count
+                    print(f"  {state}: {count} unique rows")
+                geocache = scrape._load_geocache() if loader else None
+            else:
+                known = scrape._load_known_ads_ids()  # one index shared by every state
+                geocoder = scrape.start_geocoder()  # geocodes each distinct address once per run
+                geocache = geocoder.cache
+                try:
+                    for i, state in enumerate(states, 1):
+                        print(f"\n[{i}/{len(states)}] Scraping state: {state}")
+                        count = scrape.scrape_all_types(
+                            state, known=known, geocoder=geocoder,
+                            incremental=args.incremental, full_sweep=args.full_sweep,
+                            **direct,
+                        )
+                        total_rows += count
+                        print(f"  {state}: {count} unique rows")
+                finally:
+                    scrape.finish_geocoder(geocoder)
+            if loader:
+                # Geocodes that resolved after their rows were loaded.
+                filled = loader.fill_coordinates(geocache)
+                print(f"Loaded {loader.rows} rows directly; back-filled lat/lon on {filled}.")
+        finally:
+            if loader:
+                loader.close()
         print(f"\nScraped {total_rows} total unique rows across {len(states)} state(s).")
+        stats = mudah_api.client_stats()
+        print(f"API: {stats['requests']} requests, {stats['retries']} retries, "
+              f"{stats['connections_opened']} connections opened, "
+              f"{stats['connections_reused']} reused; learned rate {stats['rate']} req/s.")
+        mudah_api.save_rate_state()
     else:
         print("Skipping scrape step.")
 
     step("STEP 2: Cleaning")
-    clean.clean_raw_files()
+    clean.clean_raw_files(workers=args.clean_workers)
 
     step("STEP 3: Loading to database")
-    load_to_db.load_processed_files()
+    load_to_db.load_processed_files(bulk=args.bulk_load)
 
     elapsed = time.time() - start_time
+    if scrape_failed:
+        print(f"\nPipeline finished with failed scrape windows in {elapsed:.1f}s. DB: {config.DB_FILE}")
+        sys.exit(1)
     print(f"\nPipeline complete in {elapsed:.1f}s. DB: {config.DB_FILE}")
 
 
@@ -0,0 +1,194 @@
+"""Materialised rent summaries per (state, region, CPI, rooms, scrape week).
+
+Table config.SUMMARY_TABLE holds, per group: listings, active / rented /
+expired counts, mean and median monthly_rent, and mean rent per sqft — plus
+the sum and count each mean is taken over (rent_sum / rent_count over rows
+with a rent, psf_sum / psf_count over those with a size too), so groups can
+be rolled up into exact means. The
+scrape week is the Monday of the listing's scrape_date ('YYYY-MM-DD'). Group
+keys are stored as-is, NULLs included — match them with IS, not =.
+
+Triggers on the properties table note the group of every row written, moved
+(old and new group) or deleted in config.SUMMARY_DIRTY_TABLE, whichever code
+path made the write. refresh() then recomputes only those groups, each read
+through idx_summary_group (a covering index on properties), and empties the
+dirty list. The load step calls it after every load; recheck after its status
+updates. A summary table created on an existing DB is filled on first ensure().
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import config
+import logging
+import scripts.logger  # noqa: F401  — configures root handlers
+
+logger = logging.getLogger("aggregates")
+
+import sqlite3
+from typing import List
+
+GROUP_COLUMNS = ["state", "region", "CPI", "rooms"]
+_KEYS = GROUP_COLUMNS + ["scrape_week"]
+
+CREATE_SUMMARY_SQL = f"""
+CREATE TABLE IF NOT EXISTS {config.SUMMARY_TABLE} (
+    state                 TEXT,
+    region                TEXT,
+    CPI                   TEXT,
+    rooms                 TEXT,
+    scrape_week           TEXT,
+    listings              INTEGER NOT NULL,
+    active                INTEGER NOT NULL,
+    rented                INTEGER NOT NULL,
+    expired               INTEGER NOT NULL,
+    mean_rent             REAL,
+    median_rent           REAL,
+    mean_rent_psf         REAL,
+    rent_sum              REAL,
+    rent_count            INTEGER NOT NULL,
+    psf_sum               REAL,
+    psf_count             INTEGER NOT NULL
+);
+"""
+
+CREATE_DIRTY_SQL = f"""
+CREATE TABLE IF NOT EXISTS {config.SUMMARY_DIRTY_TABLE} (
+    state TEXT, region TEXT, CPI TEXT, rooms TEXT, scrape_week TEXT
+);
+"""
+
+_KEY_INDEXES_SQL = [
+    f"CREATE INDEX IF NOT EXISTS idx_summary_key ON {config.SUMMARY_TABLE}({', '.join(_KEYS)});",
+    f"CREATE INDEX IF NOT EXISTS idx_summary_dirty_key "
+    f"ON {config.SUMMARY_DIRTY_TABLE}({', '.join(_KEYS)});",
+]
+
+_TRIGGERS = {
+    "insert": f"{config.SUMMARY_TABLE}_on_insert",
+    "update": f"{config.SUMMARY_TABLE}_on_update",
+    "delete": f"{config.SUMMARY_TABLE}_on_delete",
+}
+
+# Properties columns a summary row is computed from.
+_WATCHED = GROUP_COLUMNS + ["scrape_date", "monthly_rent", "size", "availability_status"]
+
+
+def week_sql(date_expr: str) -> str:
+    """SQL for the Monday ('YYYY-MM-DD') of the week holding date_expr."""
+    return f"date({date_expr}, 'weekday 0', '-6 days')"
+
+
+def _mark_dirty(src: str) -> str:
+    # NOT EXISTS rather than a UNIQUE key + OR IGNORE: the keys may be NULL, and
+    # inside a trigger the outer statement's conflict policy would override OR IGNORE.
+    values = [f"{src}.{col}" for col in GROUP_COLUMNS] + [week_sql(f"{src}.scrape_date")]
+    match = " AND ".join(f"{key} IS {value}" for key, value in zip(_KEYS, values))
+    return (
+        f"    INSERT INTO {config.SUMMARY_DIRTY_TABLE} ({', '.join(_KEYS)})\n"
+        f"    SELECT {', '.join(values)}\n"
+        f"    WHERE NOT EXISTS (SELECT 1 FROM {config.SUMMARY_DIRTY_TABLE} WHERE {match});"
+    )
+
+
+def trigger_sql() -> List[str]:
+    table = config.DB_TABLE
+    # A re-scrape moves scrape_date every day; only a new week changes the group.
+    changed = " OR ".join(
+        f"{week_sql('NEW.scrape_date')} IS NOT {week_sql('OLD.scrape_date')}" if col == "scrape_date"
+        else f"NEW.{col} IS NOT OLD.{col}"
+        for col in _WATCHED
+    )
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {_TRIGGERS['insert']} AFTER INSERT ON {table}\n"
+        f"BEGIN\n{_mark_dirty('NEW')}\nEND;",
+        f"CREATE TRIGGER IF NOT EXISTS {_TRIGGERS['update']} "
+        f"AFTER UPDATE OF {', '.join(_WATCHED)} ON {table}\n"
+        f"WHEN {changed}\n"
+        f"BEGIN\n{_mark_dirty('OLD')}\n{_mark_dirty('NEW')}\nEND;",
+        f"CREATE TRIGGER IF NOT EXISTS {_TRIGGERS['delete']} AFTER DELETE ON {table}\n"
+        f"BEGIN\n{_mark_dirty('OLD')}\nEND;",
+    ]
+
+
+def _refresh_sql() -> str:
+    """Recompute every dirty group from properties. Median: average of the middle
+    one or two non-NULL rents, ranked by a window over the group."""
+    keys = ", ".join(f"d.{key}" for key in _KEYS)
+    join = " AND ".join(f"p.{col} IS d.{col}" for col in GROUP_COLUMNS)
+    partition = ", ".join(_KEYS)
+    return f"""
+        INSERT INTO {config.SUMMARY_TABLE}
+        WITH grouped AS (
+            SELECT {keys}, p.monthly_rent, p.size, p.availability_status
+            FROM {config.SUMMARY_DIRTY_TABLE} d
+            JOIN {config.DB_TABLE} p
+              ON {join}
+             AND p.scrape_date >= d.scrape_week
+             AND p.scrape_date < date(d.scrape_week, '+7 days')
+        ), ranked AS (
+            SELECT *, ROW_NUMBER() OVER w AS rn, COUNT(monthly_rent) OVER w AS n
+            FROM grouped
+            WINDOW w AS (PARTITION BY {partition} ORDER BY monthly_rent IS NULL, monthly_rent
+                         ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING)
+        )
+        SELECT {partition},
+               COUNT(*),
+               SUM(availability_status IS NULL OR availability_status = 'active'),
+               SUM(availability_status = 'rented'),
+               SUM(availability_status = 'expired'),
+               AVG(monthly_rent),
+               AVG(CASE WHEN rn IN ((n + 1) / 2, (n + 2) / 2) THEN monthly_rent END),
+               AVG(CASE WHEN size > 0 THEN monthly_rent / size END),
+               SUM(monthly_rent),
+               COUNT(monthly_rent),
+               SUM(CASE WHEN size > 0 THEN monthly_rent / size END),
+               COUNT(CASE WHEN size > 0 THEN monthly_rent / size END)
+        FROM ranked
+        GROUP BY {partition}
+    """
+
+
+def refresh(conn: sqlite3.Connection) -> int:
+    """Recompute the summary rows of every dirty group and commit. Returns groups refreshed."""
+    groups = conn.execute(f"SELECT COUNT(*) FROM {config.SUMMARY_DIRTY_TABLE}").fetchone()[0]
+    if not groups:
+        return 0
+    match = " AND ".join(f"s.{key} IS d.{key}" for key in _KEYS)
+    with conn:
+        conn.execute(
+            f"DELETE FROM {config.SUMMARY_TABLE} AS s WHERE EXISTS "
+            f"(SELECT 1 FROM {config.SUMMARY_DIRTY_TABLE} d WHERE {match})"
+        )
+        conn.execute(_refresh_sql())
+        conn.execute(f"DELETE FROM {config.SUMMARY_DIRTY_TABLE}")
+    return groups
+
+
+def ensure(conn: sqlite3.Connection) -> None:
+    """Create the summary tables and triggers. Idempotent; fills a new summary table.
+
+    A summary table from an older layout (missing columns) is rebuilt.
+    """
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({config.SUMMARY_TABLE})")}
+    if columns and "rent_count" not in columns:
+        # Built before the rent/psf sums and counts were stored.
+        conn.execute(f"DROP TABLE {config.SUMMARY_TABLE}")
+        conn.execute(f"DELETE FROM {config.SUMMARY_DIRTY_TABLE}")
+        columns = set()
+    fresh = not columns
+    conn.execute(CREATE_SUMMARY_SQL)
+    conn.execute(CREATE_DIRTY_SQL)
+    for sql in _KEY_INDEXES_SQL + trigger_sql():
+        conn.execute(sql)
+    if fresh:
+        conn.execute(
+            f"INSERT INTO {config.SUMMARY_DIRTY_TABLE} ({', '.join(_KEYS)}) "
+            f"SELECT DISTINCT {', '.join(GROUP_COLUMNS)}, {week_sql('scrape_date')} "
+            f"FROM {config.DB_TABLE}"
+        )
+        conn.commit()
+        groups = refresh(conn)
+        if groups:
+            logger.info(f"Built {config.SUMMARY_TABLE}: {groups} groups.")
+    conn.commit()
@@ -3,7 +3,8 @@
 Strategy:
 - Query DB for rows where latitude IS NULL.
 - Group by (region, state) — one geocode call fills all matching rows.
-- Use same fallback chain as scraper.
+- Use same fallback chain as scraper: cache, then the offline centroid table,
+  then Nominatim.
 - Update DB in batches.
 """
 import sys
@@ -13,7 +14,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 import config
 import logging
 import scripts.logger  # noqa: F401  — configures root handlers
-from scripts.scrape import geocode as _geocode, _load_geocache, _save_geocache
+from scripts.scrape import geocode as _geocode, _load_geocache, _save_geocache, _load_offline
 
 logger = logging.getLogger("backfill_geocode")
 
@@ -34,6 +35,7 @@ def backfill():
     logger.info(f"Found {len(pairs)} unique (region, state) pairs to geocode")
 
     cache = _load_geocache()
+    offline = _load_offline(cache)
     updated = 0
 
     for region, state in tqdm(pairs, desc="Backfilling"):
@@ -45,7 +47,7 @@ def backfill():
 
         lat = lon = None
         for q in queries:
-            lat, lon = _geocode(q, cache)
+            lat, lon = _geocode(q, cache, offline)
             if lat is not None:
                 break
 
@@ -5,9 +5,15 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 import config
 import logging
 import scripts.logger  # noqa: F401  — configures root handlers
+from scripts import staging
 
 logger = logging.getLogger("clean")
 
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
 import pandas as pd
 import numpy as np
 
@@ -48,22 +54,61 @@ def clean_rooms(rooms):
         return s
 
 
+# --- Vectorised column cleaners ----------------------------------------------
+# Scraped columns are highly repetitive (a few thousand distinct rents/sizes, a
+# dozen room labels across hundreds of thousands of rows), so each column is
+# factorised and the scalar cleaner above runs once per distinct value; the
+# results are broadcast back by code. The scalar functions depend only on
+# str(value), so this is result-identical to Series.apply by construction.
+
+def _map_distinct(values: pd.Series, scalar, dtype=float, missing=np.nan) -> pd.Series:
+    """`values.apply(scalar)` for non-null cells, `missing` for null ones."""
+    result = np.full(len(values), missing, dtype=dtype)
+    present = values.notna().to_numpy()
+    if present.any():
+        codes, uniques = pd.factorize(values[present].astype(str))
+        cleaned = np.array([scalar(u) for u in uniques], dtype=dtype)
+        result[present] = cleaned[codes]
+    return pd.Series(result, index=values.index, name=values.name)
+
+
+def clean_rent_series(rent: pd.Series) -> pd.Series:
+    """Vectorised clean_rent."""
+    return _map_distinct(rent, clean_rent)
+
+
+def clean_size_series(size: pd.Series) -> pd.Series:
+    """Vectorised clean_size."""
+    return _map_distinct(size, clean_size)
+
+
+def clean_rooms_series(rooms: pd.Series) -> pd.Series:
+    """Vectorised clean_rooms."""
+    return _map_distinct(rooms, clean_rooms, dtype=object)
+
+
+def map_cpi(property_type: pd.Series, mapping_dict: dict) -> pd.Series:
+    """Standardised property type (CPI) per row; unmapped or missing -> 'Other'."""
+    return _map_distinct(property_type, lambda t: mapping_dict.get(t.strip(), 'Other'),
+                         dtype=object, missing='Other')
+
+
 def clean_rental_data(df: pd.DataFrame) -> pd.DataFrame:
     df = df.copy()
     df = df.dropna(how='all')
 
     if 'monthly_rent' in df.columns:
-        df['monthly_rent'] = df['monthly_rent'].apply(clean_rent)
+        df['monthly_rent'] = clean_rent_series(df['monthly_rent'])
 
     if 'category_id' in df.columns:
         df['category_id'] = df['category_id'].fillna('').astype(str).str.replace(', For rent', '', regex=False)
         df = df[~df['category_id'].isin(config.EXCLUDED_CATEGORIES)]
 
     if 'size' in df.columns:
-        df['size'] = df['size'].apply(clean_size)
+        df['size'] = clean_size_series(df['size'])
 
     if 'rooms' in df.columns:
-        df['rooms'] = df['rooms'].apply(clean_rooms)
+        df['rooms'] = clean_rooms_series(df['rooms'])
 
     if 'publishedDatetime' in df.columns:
         df['publishedDatetime'] = pd.to_datetime(
@@ -86,43 +131,132 @@ def create_mapping_dict(mapping_df: pd.DataFrame) -> dict:
     return mapping_dict
 
 
-def clean_raw_files():
-    mapping_df = pd.read_csv(config.MAPPING_FILE)
-    mapping_dict = create_mapping_dict(mapping_df)
+def clean_with_cpi(df: pd.DataFrame, mapping_dict: dict) -> pd.DataFrame:
+    """clean_rental_data plus the CPI column — everything the clean step does to a frame."""
+    cleaned_df = clean_rental_data(df)
+    if 'property_type' in cleaned_df.columns:
+        cleaned_df['CPI'] = map_cpi(cleaned_df['property_type'], mapping_dict)
+    return cleaned_df
+
+
+def clean_raw(raw: pd.DataFrame, mapping_dict: dict) -> pd.DataFrame:
+    """Clean a raw scrape frame into the staging schema.
+
+    The one step both the file path (read_raw -> clean_file) and the in-memory
+    --direct path (load_to_db.DirectLoader) take, so a listing is stored the
+    same way — content_hash included — whichever way it reached the DB.
+    """
+    raw = raw.where(raw.ne(""))  # as read_raw would: empty cell -> missing
+    return staging.conform(clean_with_cpi(raw, mapping_dict))
+
+
+def load_mapping_dict(mapping_file=None) -> dict:
+    return create_mapping_dict(pd.read_csv(mapping_file or config.MAPPING_FILE))
 
-    # Recurse into per-state subdirs (data/raw/<state>/). Skip combined _ALL_
-    # snapshots — the per-type files already cover every row, and processing
-    # both would double-count. (load_to_db upserts by ads_id regardless.)
-    raw_files = [
-        p for p in config.RAW_DATA_DIR.rglob('*.csv')
-        if config.SCRAPED_COMBINED_MARKER not in p.name
-    ]
-    if not raw_files:
-        logger.warning("No raw CSV files found.")
-        return
 
-    for raw_path in raw_files:
-        out_path = config.PROCESSED_DATA_DIR / raw_path.name
-        if out_path.exists():
+def read_raw(raw_path: Path) -> pd.DataFrame:
+    """Read a raw scrape CSV as text: every cell a string, empty cells missing.
+
+    No type inference, so "2" stays "2" and "123" stays "123" however many
+    blanks the column has (inferred, it would turn float: "2.0", "123.0").
+    """
+    return pd.read_csv(raw_path, dtype=str, keep_default_na=False, na_values=[""])
+
+
+def clean_file(raw_path: Path, out_path: Path, mapping_dict: dict) -> dict:
+    """Clean one raw CSV into `out_path`; never raises — errors come back in the result."""
+    start = time.perf_counter()
+    result = {"name": raw_path.name, "out": str(out_path), "rows": 0, "error": None}
+    try:
+        cleaned_df = clean_raw(read_raw(raw_path), mapping_dict)
+        staging.write(cleaned_df, out_path)
+        result["rows"] = len(cleaned_df)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+# Per-process mapping for the pool: loaded once by the initializer rather than
+# pickled along with every file.
+_WORKER_MAPPING: Optional[dict] = None
+
+
+def _init_worker(mapping_file: str) -> None:
+    global _WORKER_MAPPING
+    _WORKER_MAPPING = load_mapping_dict(mapping_file)
+
+
+def _clean_file_in_worker(raw_path: Path, out_path: Path) -> dict:
+    return clean_file(raw_path, out_path, _WORKER_MAPPING)
+
+
+def pending_raw_files() -> List[Tuple[Path, Path]]:
+    """(raw, processed) pairs still to clean, in sorted order.
+
+    Recurse into per-state subdirs (data/raw/<state>/). Skip combined _ALL_
+    snapshots — the per-type files already cover every row, and processing
+    both would double-count. (load_to_db upserts by ads_id regardless.)
+    """
+    pairs, claimed = [], set()
+    for raw_path in sorted(config.RAW_DATA_DIR.rglob('*.csv')):
+        if config.SCRAPED_COMBINED_MARKER in raw_path.name:
+            continue
+        out_path = staging.staged_path(config.PROCESSED_DATA_DIR, raw_path)
+        if staging.existing_staged(config.PROCESSED_DATA_DIR, raw_path) or out_path in claimed:
             logger.info(f"Already processed, skipping: {raw_path.name}")
             continue
+        claimed.add(out_path)
+        pairs.append((raw_path, out_path))
+    return pairs
+
 
-        try:
-            df = pd.read_csv(raw_path)
-            cleaned_df = clean_rental_data(df)
+def clean_raw_files(workers: Optional[int] = None) -> List[dict]:
+    """Clean every pending raw CSV, `workers` files at a time in a process pool.
 
-            if 'property_type' in cleaned_df.columns:
-                cleaned_df['CPI'] = cleaned_df['property_type'].apply(
-                    lambda x: mapping_dict.get(str(x).strip(), 'Other') if pd.notna(x) else 'Other'
-                )
+    One file failing (or its worker dying) is logged and doesn't stop the rest;
+    the per-file summary is logged in file order once all files are done, so the
+    log reads the same however the pool scheduled them.
+    """
+    workers = max(workers or config.CLEAN_WORKERS, 1)
+    if not any(config.RAW_DATA_DIR.rglob('*.csv')):
+        logger.warning("No raw CSV files found.")
+        return []
+    pairs = pending_raw_files()
+    if not pairs:
+        return []
 
-            cleaned_df.to_csv(out_path, index=False)
-            logger.info(f"Cleaned: {raw_path.name} → {out_path}")
+    start = time.perf_counter()
+    results = []
+    if workers == 1 or len(pairs) == 1:
+        mapping_dict = load_mapping_dict()
+        results = [clean_file(raw, out, mapping_dict) for raw, out in pairs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pairs)),
+                                 initializer=_init_worker,
+                                 initargs=(str(config.MAPPING_FILE),)) as pool:
+            futures = [pool.submit(_clean_file_in_worker, raw, out) for raw, out in pairs]
+            for (raw, out), future in zip(pairs, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:  # worker process died (e.g. BrokenProcessPool)
+                    results.append({"name": raw.name, "out": str(out), "rows": 0,
+                                    "seconds": 0.0, "error": f"{type(e).__name__}: {e}"})
 
-        except Exception as e:
-            logger.error(f"Error processing {raw_path.name}: {e}")
-            continue
+    for r in results:
+        if r["error"]:
+            logger.error(f"Error processing {r['name']}: {r['error']}")
+        else:
+            logger.info(f"Cleaned: {r['name']} → {r['out']} ({r['rows']} rows, {r['seconds']:.2f}s)")
+    failed = sum(1 for r in results if r["error"])
+    logger.info(f"Clean: {len(results) - failed} file(s) cleaned, {failed} failed, "
+                f"{workers} worker(s), {time.perf_counter() - start:.1f}s wall")
+    return results
 
 
 if __name__ == "__main__":
-    clean_raw_files()
+    ap = argparse.ArgumentParser(description="Clean raw CSVs into data/processed/.")
+    ap.add_argument("--workers", type=int, default=config.CLEAN_WORKERS,
+                    help="Files cleaned in parallel (processes).")
+    args = ap.parse_args()
+    clean_raw_files(workers=args.workers)
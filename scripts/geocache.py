@@ -0,0 +1,168 @@
+"""SQLite-backed geocode cache (query -> lat/lon).
+
+Replaces the monolithic data/geocache.json, which was read and rewritten whole
+on every scrape() call and lost every new entry on a crash. Each query is one
+row under a primary key: lookups are point reads, and every result is committed
+as it is stored, so an interrupted run keeps what it geocoded.
+
+Misses are cached as [None, None] like before, but only for
+config.GEO_CACHE_NEGATIVE_TTL_DAYS — after that they read as absent and are
+retried. The first open of an empty cache imports config.GEO_CACHE_FILE once
+(the JSON file is left in place).
+
+GeoCache quacks like the dict it replaces (`get`, `in`, `[]`, `len`), so the
+geocode helpers accept either.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import config
+import logging
+import scripts.logger  # noqa: F401  — configures root handlers
+
+logger = logging.getLogger("geocache")
+
+import json
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+CREATE_GEOCACHE_SQL = """
+CREATE TABLE IF NOT EXISTS geocache (
+    query       TEXT PRIMARY KEY,
+    latitude    REAL,
+    longitude   REAL,
+    cached_at   TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+# PRAGMA user_version once the legacy JSON cache has been imported.
+_MIGRATED_VERSION = 1
+_TS_FMT = "%Y-%m-%d %H:%M:%S"
+
+
+class GeoCache:
+    """Dict-like geocode cache over one SQLite table. Thread-safe."""
+
+    def __init__(self, db_file: Optional[Path] = None,
+                 negative_ttl_days: Optional[int] = None,
+                 legacy_json: Optional[Path] = None):
+        self.db_file = db_file or config.GEO_CACHE_DB
+        ttl = config.GEO_CACHE_NEGATIVE_TTL_DAYS if negative_ttl_days is None else negative_ttl_days
+        self.negative_ttl = timedelta(days=ttl)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute("PRAGMA synchronous=NORMAL;")
+        self._conn.execute(CREATE_GEOCACHE_SQL)
+        self._conn.commit()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.writes = 0
+        self._migrate(config.GEO_CACHE_FILE if legacy_json is None else legacy_json)
+
+    # --- dict interface -----------------------------------------------------
+
+    def get(self, query: str, default=None) -> Optional[List[Optional[float]]]:
+        """[lat, lon] (or [None, None] for a fresh miss); `default` if absent/expired."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT latitude, longitude, cached_at FROM geocache WHERE query = ?",
+                (query,),
+            ).fetchone()
+            if row is None or self._expired(row):
+                self.misses += 1
+                return default
+            lat, lon, _ = row
+            if lat is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return [lat, lon]
+
+    def __contains__(self, query: str) -> bool:
+        return self.get(query) is not None
+
+    def __getitem__(self, query: str) -> List[Optional[float]]:
+        value = self.get(query)
+        if value is None:
+            raise KeyError(query)
+        return value
+
+    def __setitem__(self, query: str, coords) -> None:
+        lat, lon = coords
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO geocache (query, latitude, longitude, cached_at) "
+                "VALUES (?, ?, ?, ?)",
+                (query, lat, lon, datetime.now().strftime(_TS_FMT)),
+            )
+            self._conn.commit()
+            self.writes += 1
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM geocache").fetchone()[0]
+
+    def items(self) -> List[Tuple[str, List[Optional[float]]]]:
+        """Every positive (query, [lat, lon]) entry — misses are not listed."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT query, latitude, longitude FROM geocache WHERE latitude IS NOT NULL"
+            ).fetchall()
+        return [(q, [lat, lon]) for q, lat, lon in rows]
+
+    # --- housekeeping -------------------------------------------------------
+
+    def _expired(self, row) -> bool:
+        lat, _, cached_at = row
+        if lat is not None:
+            return False  # positive results never expire
+        try:
+            stamp = datetime.strptime(cached_at, _TS_FMT)
+        except (TypeError, ValueError):
+            return True
+        return datetime.now() - stamp >= self.negative_ttl
+
+    def _migrate(self, legacy_json: Optional[Path]) -> None:
+        """Import the legacy JSON cache once (tracked by PRAGMA user_version)."""
+        (version,) = self._conn.execute("PRAGMA user_version").fetchone()
+        if version >= _MIGRATED_VERSION:
+            return
+        imported = 0
+        if legacy_json and legacy_json.exists():
+            try:
+                with open(legacy_json, encoding="utf-8") as f:
+                    legacy = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read legacy geocache {legacy_json}: {e}")
+                return  # retry next open
+            now = datetime.now().strftime(_TS_FMT)
+            rows = [(q, v[0], v[1], now) for q, v in legacy.items()
+                    if isinstance(v, (list, tuple)) and len(v) == 2]
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO geocache (query, latitude, longitude, cached_at) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            imported = len(rows)
+        self._conn.execute(f"PRAGMA user_version = {_MIGRATED_VERSION}")
+        self._conn.commit()
+        if imported:
+            logger.info(f"Migrated {imported} geocache entries from {legacy_json}")
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "negative_hits": self.negative_hits,
+                "misses": self.misses, "writes": self.writes}
+
+    def flush(self) -> None:
+        """Commit anything pending (writes already commit; kept for callers)."""
+        with self._lock:
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
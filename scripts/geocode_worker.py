@@ -0,0 +1,162 @@
+"""Background geocode stage for the scraper.
+
+Geocoding used to run inline, one row at a time, through a 1 req/s rate limiter —
+a window with 3,000 new listings but 400 distinct addresses walked 3,000 rows
+serially and stalled the API scrape on Nominatim. Now:
+
+  - rows take their coordinates straight from the cache when it has them, or
+    from the offline centroid table (scripts/offline_geocoder.py) when given;
+  - otherwise the row is written without coordinates and its query is queued
+    (once per distinct query for the whole run) for a single worker thread;
+  - when the run ends the queue is drained and the CSVs written during the run
+    are back-filled from the cache, keyed by the row's `address`.
+
+Anything still unresolved (worker failure, crash) stays NULL and is picked up by
+backfill_geocode.py after loading.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import config
+import logging
+import scripts.logger  # noqa: F401  — configures root handlers
+from scripts import mudah_api
+
+logger = logging.getLogger("geocode_worker")
+
+import queue
+import threading
+import pandas as pd
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+Coords = Tuple[Optional[float], Optional[float]]
+
+
+class GeocodeWorker:
+    """Resolves distinct uncached queries on one background thread.
+
+    `resolve_many(queries, cache)` resolves a batch of up to `batch_size`
+    queued queries and stores the results in `cache` (scrape.geocode_many does
+    both, through the configured backend's geocode_many). With `offline`, a
+    cache miss it can answer never reaches the queue. The thread starts on the
+    first queued query; close() drains the queue and joins it.
+    """
+
+    def __init__(self, cache: dict, resolve_many: Callable[[List[str], dict], object],
+                 offline=None, batch_size: Optional[int] = None):
+        self.cache = cache
+        self.offline = offline
+        self._resolve_many = resolve_many
+        self.batch_size = max(batch_size or config.GEOCODER_BATCH_SIZE, 1)
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._pending: set = set()
+        self._paths: List[Path] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.queued = 0
+        self.resolved = 0
+        self.failed = 0
+
+    def coords(self, query: str) -> Coords:
+        """Cached or offline coordinates for `query`, or (None, None) after queueing it."""
+        if not query:
+            return (None, None)
+        cached = self.cache.get(query)
+        if cached is not None:
+            return tuple(cached)
+        if self.offline is not None:
+            found = self.offline.lookup(query)
+            if found is not None:
+                return found
+        with self._lock:
+            if query not in self._pending:
+                self._pending.add(query)
+                self.queued += 1
+                self._queue.put(query)
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="geocode-worker", daemon=True,
+                    )
+                    self._thread.start()
+        return (None, None)
+
+    def track(self, path: Path) -> None:
+        """Register a CSV written this run for back-filling after close()."""
+        with self._lock:
+            if path not in self._paths:
+                self._paths.append(path)
+
+    def _run(self) -> None:
+        done = False
+        while not done:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            if None in batch:  # close() sentinel: finish what was queued before it
+                batch = batch[:batch.index(None)]
+                done = True
+            if not batch:
+                continue
+            try:
+                self._resolve_many(batch, self.cache)
+                self.resolved += len(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                logger.warning(f"Geocode failed for {len(batch)} queries: {e}")
+
+    def close(self) -> None:
+        """Wait for every queued query to be resolved, then stop the thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        if not self._queue.empty():
+            logger.info(f"Waiting for {self._queue.qsize()} queued geocodes...")
+        self._queue.put(None)
+        thread.join()
+
+    def fill_rows(self, rows: Iterable[Dict]) -> int:
+        """Back-fill missing lat/lon on in-memory rows from the cache. Returns rows filled."""
+        filled = 0
+        for row in rows:
+            if row.get("latitude") is not None:
+                continue
+            cached = self.cache.get(mudah_api.geocode_query_for_address(row.get("address")))
+            if cached and cached[0] is not None:
+                row["latitude"], row["longitude"] = cached
+                filled += 1
+        return filled
+
+    def backfill(self) -> int:
+        """Back-fill every tracked CSV from the cache. Returns rows filled."""
+        return sum(backfill_csv(path, self.cache) for path in self._paths)
+
+
+def backfill_csv(path: Path, cache: dict) -> int:
+    """Fill empty latitude/longitude cells of a scraped CSV from `cache`.
+
+    Read and written as text so every other cell round-trips unchanged; the file
+    is only rewritten when something was filled.
+    """
+    if not path.exists():
+        return 0
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    if not {"address", "latitude", "longitude"} <= set(df.columns):
+        return 0
+    missing = df["latitude"] == ""
+    if not missing.any():
+        return 0
+    coords = df.loc[missing, "address"].map(
+        lambda a: cache.get(mudah_api.geocode_query_for_address(a))
+    )
+    hits = coords.map(lambda c: bool(c) and c[0] is not None)
+    if not hits.any():
+        return 0
+    idx = hits[hits].index
+    df.loc[idx, "latitude"] = [str(coords[i][0]) for i in idx]
+    df.loc[idx, "longitude"] = [str(coords[i][1]) for i in idx]
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    df.to_csv(tmp, index=False)
+    tmp.replace(path)
+    return len(idx)
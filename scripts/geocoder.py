@@ -0,0 +1,229 @@
+"""Pluggable geocoder backends behind one interface.
+
+config.GEOCODER_BACKEND picks the backend; the shared instance is built on first
+use (get_geocoder), not at import, so importing scrape/backfill stays cheap.
+
+  - "nominatim":       public nominatim.openstreetmap.org, 1 req/s per its policy
+  - "nominatim-local": a self-hosted Nominatim (config.GEOCODER_LOCAL_URL), no
+                       delay and config.GEOCODER_LOCAL_WORKERS requests in flight
+  - "offline":         only the offline centroid table — never touches the network
+  - "null":            geocodes nothing (rows keep NULL lat/lon)
+
+Every backend answers geocode_many(queries) -> {query: (lat, lon) | None}:
+  - (lat, lon) — found;
+  - None       — the backend authoritatively found nothing (safe to cache as a miss);
+  - absent     — no answer this time (transient error, a server that can't
+                 answer the query — HTTP 404 — or a non-authoritative backend
+                 such as offline/null) — do not cache, try again later.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import config
+import logging
+import scripts.logger  # noqa: F401  — configures root handlers
+
+logger = logging.getLogger("geocoder")
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+Coords = Tuple[float, float]
+
+GEOCODER_BACKENDS = ("nominatim", "nominatim-local", "offline", "null")
+
+
+class GeocodeError(Exception):
+    """Transient geocoding failure (timeout, service error) — not a miss."""
+
+
+class GeocodeUnanswered(Exception):
+    """The server can't answer this query (HTTP 404) — not a miss, and not worth a retry."""
+
+
+class Geocoder:
+    """Base backend: rate-limited, retrying per-query lookups.
+
+    Subclasses implement lookup(); `min_delay` spaces consecutive requests
+    across all threads, `workers` requests may be in flight in geocode_many.
+    """
+
+    name = "base"
+    authoritative = True  # does lookup() -> None mean "no such place"?
+
+    def __init__(self, min_delay: float = 0.0, workers: int = 1,
+                 max_retries: int = 3, error_wait: float = 5.0):
+        self.min_delay = max(min_delay, 0.0)
+        self.workers = max(workers, 1)
+        self.max_retries = max_retries
+        self.error_wait = error_wait
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+        self.requests = 0
+        self.errors = 0
+
+    def lookup(self, query: str) -> Optional[Coords]:
+        raise NotImplementedError
+
+    def _throttle(self) -> None:
+        if self.min_delay <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.min_delay
+        if slot > now:
+            time.sleep(slot - now)
+
+    def geocode(self, query: str) -> Optional[Coords]:
+        """Rate-limited lookup with retries. Raises GeocodeError once retries run out,
+        GeocodeUnanswered straight away."""
+        for attempt in range(self.max_retries + 1):
+            self._throttle()
+            with self._lock:
+                self.requests += 1
+            try:
+                return self.lookup(query)
+            except GeocodeError as e:
+                with self._lock:
+                    self.errors += 1
+                if attempt >= self.max_retries:
+                    raise
+                logger.debug(f"{self.name}: retrying {query!r} after {e}")
+                time.sleep(self.error_wait)
+        return None  # unreachable; keeps type checkers happy
+
+    def geocode_many(self, queries: Iterable[str]) -> Dict[str, Optional[Coords]]:
+        """Resolve distinct `queries`; see the module docstring for the result contract."""
+        todo = list(dict.fromkeys(q for q in queries if q))
+        results: Dict[str, Optional[Coords]] = {}
+
+        def _one(query: str) -> None:
+            try:
+                found = self.geocode(query)
+            except GeocodeError as e:
+                logger.warning(f"Geocode error for {query!r}: {e}")
+                return
+            except GeocodeUnanswered:
+                return
+            if found is not None or self.authoritative:
+                results[query] = found
+
+        if self.workers > 1 and len(todo) > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                list(pool.map(_one, todo))
+        else:
+            for query in todo:
+                _one(query)
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        return {"requests": self.requests, "errors": self.errors}
+
+
+class NominatimGeocoder(Geocoder):
+    """geopy's Nominatim client, public or self-hosted (`domain`)."""
+
+    name = "nominatim"
+
+    def __init__(self, domain: Optional[str] = None, scheme: Optional[str] = None,
+                 min_delay: float = 1.0, workers: int = 1, **kwargs):
+        super().__init__(min_delay=min_delay, workers=workers, **kwargs)
+        from geopy.geocoders import Nominatim  # deferred: only when this backend is used
+        from geopy.exc import GeopyError
+        self._errors = (GeopyError,)
+        options = {"user_agent": config.GEOLOCATOR_USER_AGENT,
+                   "timeout": config.GEOLOCATION_TIMEOUT}
+        if domain:
+            options["domain"] = domain
+            options["scheme"] = scheme or "http"
+            self.name = "nominatim-local"
+        self._client = Nominatim(**options)
+
+    def lookup(self, query: str) -> Optional[Coords]:
+        try:
+            location = self._client.geocode(query)
+        except self._errors as e:
+            if getattr(e.__cause__, "status_code", None) == 404:
+                raise GeocodeUnanswered(str(e)) from e
+            raise GeocodeError(str(e)) from e
+        if not location:
+            return None
+        return (location.latitude, location.longitude)
+
+
+class OfflineBackend(Geocoder):
+    """Answers only from an OfflineGeocoder table; a miss is not authoritative."""
+
+    name = "offline"
+    authoritative = False
+
+    def __init__(self, table=None):
+        super().__init__(max_retries=0)
+        self._table = table
+
+    def lookup(self, query: str) -> Optional[Coords]:
+        if self._table is None:
+            from scripts import offline_geocoder
+            from scripts.geocache import GeoCache
+            self._table = offline_geocoder.from_cache(GeoCache(config.GEO_CACHE_DB))
+        return self._table.lookup(query)
+
+
+class NullGeocoder(Geocoder):
+    """Geocodes nothing."""
+
+    name = "null"
+    authoritative = False
+
+    def __init__(self):
+        super().__init__(max_retries=0)
+
+    def lookup(self, query: str) -> Optional[Coords]:
+        return None
+
+    def geocode_many(self, queries: Iterable[str]) -> Dict[str, Optional[Coords]]:
+        return {}
+
+
+def make_geocoder(backend: Optional[str] = None) -> Geocoder:
+    """Build the backend named `backend` (default config.GEOCODER_BACKEND)."""
+    backend = backend or config.GEOCODER_BACKEND
+    if backend not in GEOCODER_BACKENDS:
+        raise ValueError(f"Unknown geocoder backend {backend!r}. Known: {GEOCODER_BACKENDS}")
+    delay = config.GEOCODER_MIN_DELAY.get(backend, 0.0)
+    if backend == "nominatim":
+        return NominatimGeocoder(min_delay=delay)
+    if backend == "nominatim-local":
+        return NominatimGeocoder(domain=config.GEOCODER_LOCAL_URL,
+                                 scheme=config.GEOCODER_LOCAL_SCHEME,
+                                 min_delay=delay, workers=config.GEOCODER_LOCAL_WORKERS)
+    if backend == "offline":
+        return OfflineBackend()
+    return NullGeocoder()
+
+
+_GEOCODER: Optional[Geocoder] = None
+
+
+def get_geocoder() -> Geocoder:
+    """Return the shared backend, creating it on first use."""
+    global _GEOCODER
+    if _GEOCODER is None:
+        _GEOCODER = make_geocoder()
+    return _GEOCODER
+
+
+def configure(geocoder: Optional[Geocoder] = None, backend: Optional[str] = None) -> Geocoder:
+    """Replace the shared backend with `geocoder`, or one built for `backend`."""
+    global _GEOCODER
+    _GEOCODER = geocoder if geocoder is not None else make_geocoder(backend)
+    return _GEOCODER
+
+
+def geocode_many(queries: List[str]) -> Dict[str, Optional[Coords]]:
+    """geocode_many on the shared backend."""
+    return get_geocoder().geocode_many(queries)
@@ -0,0 +1,136 @@
+"""Append-only listing history: one row per change of rent or availability.
+
+The properties table holds each listing's latest state only — a re-scrape
+overwrites monthly_rent and recheck overwrites availability_status. Table
+config.OBSERVATIONS_TABLE keeps what they replaced:
+
+    ads_id, observed_date, monthly_rent, availability_status
+
+A row is written when a listing first appears and whenever a later write
+changes its rent or status — re-scrapes and rechecks that confirm the same
+values add nothing. It is filled by triggers on the properties table, so every
+writer (file loads, --bulk, --direct, recheck) is covered without changes.
+Several changes on one day collapse into that day's last state. Deleting a
+listing (content dedup) leaves its history in place.
+
+The table is keyed (ads_id, observed_date) WITHOUT ROWID, so a listing's history
+is one contiguous range of the primary key; idx_observed_date serves time-range
+queries across listings.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import config
+
+import sqlite3
+from typing import List, Optional, Tuple
+
+CREATE_OBSERVATIONS_SQL = f"""
+CREATE TABLE IF NOT EXISTS {config.OBSERVATIONS_TABLE} (
+    ads_id                TEXT NOT NULL,
+    observed_date         TEXT NOT NULL,
+    monthly_rent          REAL,
+    availability_status   TEXT,
+    PRIMARY KEY (ads_id, observed_date)
+) WITHOUT ROWID;
+"""
+
+OBSERVED_DATE_INDEX_SQL = (
+    f"CREATE INDEX IF NOT EXISTS idx_observed_date "
+    f"ON {config.OBSERVATIONS_TABLE}(observed_date);"
+)
+
+_TRIGGERS = {
+    "insert": f"{config.OBSERVATIONS_TABLE}_on_insert",
+    "update": f"{config.OBSERVATIONS_TABLE}_on_update",
+}
+
+# The day a write describes: the upsert sets last_checked_at to the scrape date on
+# a re-scrape and first_seen on a new listing; recheck sets last_checked_at.
+_OBSERVED = "substr(COALESCE({r}.last_checked_at, {r}.first_seen, {r}.scrape_date, date('now')), 1, 10)"
+
+
+def _record(src: str) -> str:
+    # A plain DELETE + INSERT rather than OR REPLACE: inside a trigger the outer
+    # statement's conflict policy would override it.
+    observed = _OBSERVED.format(r=src)
+    return (
+        f"    DELETE FROM {config.OBSERVATIONS_TABLE}\n"
+        f"    WHERE ads_id = {src}.ads_id AND observed_date = {observed};\n"
+        f"    INSERT INTO {config.OBSERVATIONS_TABLE} "
+        f"(ads_id, observed_date, monthly_rent, availability_status)\n"
+        f"    VALUES ({src}.ads_id, {observed}, {src}.monthly_rent, "
+        f"COALESCE({src}.availability_status, 'active'));"
+    )
+
+
+def trigger_sql() -> List[str]:
+    table = config.DB_TABLE
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {_TRIGGERS['insert']} AFTER INSERT ON {table}\n"
+        f"BEGIN\n{_record('NEW')}\nEND;",
+        f"CREATE TRIGGER IF NOT EXISTS {_TRIGGERS['update']} "
+        f"AFTER UPDATE OF monthly_rent, availability_status ON {table}\n"
+        f"WHEN NEW.monthly_rent IS NOT OLD.monthly_rent "
+        f"OR NEW.availability_status IS NOT OLD.availability_status\n"
+        f"BEGIN\n{_record('NEW')}\nEND;",
+    ]
+
+
+def ensure(conn: sqlite3.Connection) -> None:
+    """Create the history table, its index and triggers. Idempotent.
+
+    On first creation every existing listing gets one observation of its current
+    state, so history starts from the DB as it is rather than from empty.
+    """
+    fresh = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (config.OBSERVATIONS_TABLE,),
+    ).fetchone() is None
+    conn.execute(CREATE_OBSERVATIONS_SQL)
+    conn.execute(OBSERVED_DATE_INDEX_SQL)
+    if fresh:
+        conn.execute(
+            f"INSERT OR IGNORE INTO {config.OBSERVATIONS_TABLE} "
+            f"(ads_id, observed_date, monthly_rent, availability_status) "
+            f"SELECT ads_id, {_OBSERVED.format(r='p')}, monthly_rent, "
+            f"COALESCE(availability_status, 'active') FROM {config.DB_TABLE} p"
+        )
+    for sql in trigger_sql():
+        conn.execute(sql)
+    conn.commit()
+
+
+def listing_history(conn: sqlite3.Connection, ads_id: str) -> List[Tuple]:
+    """(observed_date, monthly_rent, availability_status) for one listing, oldest first."""
+    return conn.execute(
+        f"SELECT observed_date, monthly_rent, availability_status "
+        f"FROM {config.OBSERVATIONS_TABLE} WHERE ads_id = ? ORDER BY observed_date",
+        (str(ads_id),),
+    ).fetchall()
+
+
+def rent_changes(conn: sqlite3.Connection, start: str,
+                 end: Optional[str] = None) -> List[Tuple]:
+    """Rent changes observed between start and end (inclusive, 'YYYY-MM-DD').
+
+    Returns (ads_id, observed_date, previous_rent, monthly_rent) ordered by date;
+    a listing's first observation is not a change and is left out.
+    """
+    return conn.execute(
+        f"""
+        SELECT o.ads_id, o.observed_date,
+               (SELECT prev.monthly_rent FROM {config.OBSERVATIONS_TABLE} prev
+                WHERE prev.ads_id = o.ads_id AND prev.observed_date < o.observed_date
+                ORDER BY prev.observed_date DESC LIMIT 1) AS previous_rent,
+               o.monthly_rent
+        FROM {config.OBSERVATIONS_TABLE} o
+        WHERE o.observed_date BETWEEN ? AND ?
+          AND previous_rent IS NOT o.monthly_rent
+          AND EXISTS (SELECT 1 FROM {config.OBSERVATIONS_TABLE} prev
+                      WHERE prev.ads_id = o.ads_id AND prev.observed_date < o.observed_date)
+        ORDER BY o.observed_date, o.ads_id
+        """,
+        (start, end or "9999-12-31"),
+    ).fetchall()
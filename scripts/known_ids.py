@@ -0,0 +1,198 @@
+"""Compact index of ads_ids already in the DB, for the scraper's skip_known filter.
+
+Listing ids are numeric, so they are held as a sorted `array('q')` (8 bytes per id,
+binary-searched) instead of a set of Python strings. The index is built once per
+run and shared by every state/type window; ids scraped during the run are added
+incrementally so later windows skip them too.
+
+Optionally persisted next to the DB (config.KNOWN_IDS_FILE) together with the
+table's max rowid: the next run loads the file and reads only rows inserted since,
+falling back to a full rebuild if the table no longer matches.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import config
+import logging
+import scripts.logger  # noqa: F401  — configures root handlers
+
+logger = logging.getLogger("known_ids")
+
+import heapq
+import sqlite3
+import struct
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Iterator, Optional, Tuple
+
+# File header: magic, max rowid covered, id count.
+_HEADER = struct.Struct("<8sqq")
+_MAGIC = b"KNOWNID1"
+
+
+def _as_int(ads_id) -> Optional[int]:
+    try:
+        return int(str(ads_id).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+class KnownIds:
+    """Membership index over ads_ids: sorted int64 array + small overflow sets.
+
+    `ids` must already be sorted ascending (as built by from_db); ids added later
+    go to an in-memory set. Non-numeric ids, which the API never produces but a
+    hand-edited DB might hold, live in a plain set so nothing is ever missed.
+    """
+
+    def __init__(self, ids: Optional[array] = None, other: Iterable[str] = (),
+                 max_rowid: int = 0):
+        self._sorted = ids if ids is not None else array("q")
+        self._added: set = set()
+        self._other = set(other)
+        self.max_rowid = max_rowid
+        self._lock = threading.Lock()
+
+    def __contains__(self, ads_id) -> bool:
+        n = _as_int(ads_id)
+        if n is None:
+            return str(ads_id) in self._other
+        i = bisect_left(self._sorted, n)
+        if i < len(self._sorted) and self._sorted[i] == n:
+            return True
+        return n in self._added
+
+    def __len__(self) -> int:
+        return len(self._sorted) + len(self._added) + len(self._other)
+
+    def __iter__(self) -> Iterator[str]:
+        for n in self._sorted:
+            yield str(n)
+        for n in list(self._added):
+            yield str(n)
+        yield from list(self._other)
+
+    def add(self, ads_id) -> None:
+        n = _as_int(ads_id)
+        with self._lock:
+            if n is None:
+                self._other.add(str(ads_id))
+            else:
+                self._added.add(n)
+
+    def update(self, ads_ids: Iterable) -> None:
+        for ads_id in ads_ids:
+            self.add(ads_id)
+
+    @classmethod
+    def from_db(cls, db_file: Path = None, table: str = None,
+                index_file: Optional[Path] = None) -> "KnownIds":
+        """Build the index from the DB. Empty index if the DB is missing or unreadable.
+
+        With `index_file`, reuse a persisted index when it still matches the table
+        and read only rows added since; the refreshed index is written back.
+        """
+        db_file = db_file or config.DB_FILE
+        table = table or config.DB_TABLE
+        if not db_file.exists():
+            return cls()
+        try:
+            with sqlite3.connect(db_file) as conn:
+                known = cls._from_index_file(conn, table, index_file) if index_file else None
+                if known is None:
+                    known = cls._scan(conn, table)
+                else:
+                    known._extend_from(conn, table)
+        except Exception as e:
+            logger.warning(f"Could not load known ads_ids from DB: {e}")
+            return cls()
+        if index_file:
+            try:
+                known.save(index_file)
+            except OSError as e:
+                logger.warning(f"Could not persist known-ids index: {e}")
+        return known
+
+    @classmethod
+    def _scan(cls, conn: sqlite3.Connection, table: str) -> "KnownIds":
+        ids, other = array("q"), set()
+        max_rowid = 0
+        # SQLite does the numeric sort, so ids stream straight into the array.
+        for rowid, ads_id in conn.execute(
+            f"SELECT rowid, ads_id FROM {table} ORDER BY CAST(ads_id AS INTEGER), ads_id"
+        ):
+            max_rowid = max(max_rowid, rowid)
+            n = _as_int(ads_id)
+            if n is None:
+                other.add(str(ads_id))
+            else:
+                ids.append(n)
+        return cls(ids, other, max_rowid)
+
+    def _extend_from(self, conn: sqlite3.Connection, table: str) -> None:
+        """Add rows inserted after max_rowid, then fold them into the sorted array."""
+        for rowid, ads_id in conn.execute(
+            f"SELECT rowid, ads_id FROM {table} WHERE rowid > ?", (self.max_rowid,)
+        ):
+            self.max_rowid = max(self.max_rowid, rowid)
+            self.add(ads_id)
+        self.compact()
+
+    @classmethod
+    def _from_index_file(cls, conn: sqlite3.Connection, table: str,
+                         path: Path) -> Optional["KnownIds"]:
+        """Load a persisted index if the table still holds exactly its rows."""
+        loaded = cls.load(path)
+        if loaded is None:
+            return None
+        known, count = loaded
+        (covered,) = conn.execute(
+            f"SELECT COUNT(*) FROM {table} WHERE rowid <= ?", (known.max_rowid,)
+        ).fetchone()
+        if covered != count:
+            logger.info("Known-ids index is stale (rows deleted or DB rebuilt); rebuilding.")
+            return None
+        return known
+
+    def compact(self) -> None:
+        """Merge incrementally added ids into the sorted array."""
+        with self._lock:
+            if not self._added:
+                return
+            fresh = []
+            for n in sorted(self._added):
+                i = bisect_left(self._sorted, n)
+                if i == len(self._sorted) or self._sorted[i] != n:
+                    fresh.append(n)
+            self._sorted = array("q", heapq.merge(self._sorted, fresh))
+            self._added = set()
+
+    def save(self, path: Path) -> None:
+        """Write the numeric ids + max rowid (non-numeric ids are re-read from the DB)."""
+        self.compact()
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, self.max_rowid, len(self._sorted) + len(self._other)))
+            self._sorted.tofile(f)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional[Tuple["KnownIds", int]]:
+        """Read a persisted index; returns (index, rows it covered) or None if unusable."""
+        if not path.exists():
+            return None
+        try:
+            with open(path, "rb") as f:
+                magic, max_rowid, count = _HEADER.unpack(f.read(_HEADER.size))
+                ids = array("q")
+                ids.frombytes(f.read())
+        except (OSError, struct.error, ValueError):
+            return None
+        if magic != _MAGIC or len(ids) > count:
+            return None
+        if len(ids) < count:
+            # Non-numeric ids aren't persisted; rebuild to pick them up.
+            return None
+        return cls(ids, (), max_rowid), count
@@ -5,10 +5,19 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 import config
 import logging
 import scripts.logger  # noqa: F401  — configures root handlers
+from scripts import aggregates, clean, history, mudah_api, staging
 
 logger = logging.getLogger("load_to_db")
 
+import argparse
+import hashlib
+import re
 import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
 import pandas as pd
 
 
@@ -37,6 +46,7 @@ CREATE TABLE IF NOT EXISTS {config.DB_TABLE} (
     publishedDatetime     TEXT,
     scrape_date           TEXT,
     adviewUrl             TEXT,
+    content_hash          INTEGER,
     first_seen            TEXT,
     last_checked_at       TEXT,
     availability_status   TEXT DEFAULT 'active',
@@ -69,6 +79,8 @@ COLUMN_DEFS = {
     "publishedDatetime": "TEXT",
     "scrape_date": "TEXT",
     "adviewUrl": "TEXT",
+    # Fingerprint of the _DEDUP_COLUMNS values, set on every upsert (content_hash()).
+    "content_hash": "INTEGER",
     # Recheck-managed columns (maintained by scripts/recheck.py).
     "first_seen": "TEXT",
     "last_checked_at": "TEXT",
@@ -83,8 +95,6 @@ RECHECK_COLUMNS = {"first_seen", "last_checked_at", "availability_status", "gone
 SCRAPE_COLUMNS = ['ads_id'] + [c for c in COLUMN_DEFS if c not in RECHECK_COLUMNS]
 
 CREATE_INDEXES_SQL = [
-    f"CREATE INDEX IF NOT EXISTS idx_state ON {config.DB_TABLE}(state);",
-    f"CREATE INDEX IF NOT EXISTS idx_cpi ON {config.DB_TABLE}(CPI);",
     f"CREATE INDEX IF NOT EXISTS idx_monthly_rent ON {config.DB_TABLE}(monthly_rent);",
     f"CREATE INDEX IF NOT EXISTS idx_scrape_date ON {config.DB_TABLE}(scrape_date);",
     f"CREATE INDEX IF NOT EXISTS idx_ad_expiry ON {config.DB_TABLE}(ad_expiry);",
@@ -92,20 +102,145 @@ CREATE_INDEXES_SQL = [
     f"CREATE INDEX IF NOT EXISTS idx_availability_status ON {config.DB_TABLE}(availability_status);",
 ]
 
+# Covers recheck's due-for-check scan: status filter first, then every column the
+# selection reads, so SQLite never touches the table rows for it.
+RECHECK_INDEX_SQL = (
+    f"CREATE INDEX IF NOT EXISTS idx_recheck_due ON {config.DB_TABLE}"
+    f"(availability_status, last_checked_at, first_seen, ads_id, ad_expiry);"
+)
+CREATE_INDEXES_SQL.append(RECHECK_INDEX_SQL)
+
 # Columns used for content-deduplication (same listing posted multiple times).
-_DEDUP_COLS = "monthly_rent, property_type, state, region, rooms, bathroom, size, address, publishedDatetime"
+_DEDUP_COLUMNS = ["monthly_rent", "property_type", "state", "region", "rooms",
+                  "bathroom", "size", "address", "publishedDatetime"]
+_DEDUP_COLS = ", ".join(_DEDUP_COLUMNS)
+
+# Lets _dedup fetch just the groups a load touched instead of grouping the table.
+CONTENT_HASH_INDEX_SQL = (
+    f"CREATE INDEX IF NOT EXISTS idx_content_hash ON {config.DB_TABLE}(content_hash);"
+)
+CREATE_INDEXES_SQL.append(CONTENT_HASH_INDEX_SQL)
+
+# Covers aggregates.refresh(): one dirty (state, region, CPI, rooms, week) group is an
+# index range, and every value it summarises is in the index.
+SUMMARY_GROUP_INDEX_SQL = (
+    f"CREATE INDEX IF NOT EXISTS idx_summary_group ON {config.DB_TABLE}"
+    f"({', '.join(aggregates.GROUP_COLUMNS)}, scrape_date, monthly_rent, size, availability_status);"
+)
+CREATE_INDEXES_SQL.append(SUMMARY_GROUP_INDEX_SQL)
+
+# Read side (scripts/query.py). idx_summary_group already serves area filters
+# (state, region, CPI, rooms); these serve the CPI + rent-range and status +
+# rent-range filters, with the other filter columns in the index so
+# non-matching rows are rejected before the table is touched.
+QUERY_INDEXES_SQL = [
+    f"CREATE INDEX IF NOT EXISTS idx_query_cpi_rent ON {config.DB_TABLE}"
+    f"(CPI, monthly_rent, state, region, rooms, availability_status);",
+    f"CREATE INDEX IF NOT EXISTS idx_query_status_rent ON {config.DB_TABLE}"
+    f"(availability_status, monthly_rent, state, region, CPI, rooms);",
+]
+CREATE_INDEXES_SQL.extend(QUERY_INDEXES_SQL)
+
+# Single-column indexes now served by the leading column of a composite above
+# (state: idx_summary_group, CPI: idx_query_cpi_rent); connect() drops them.
+SUPERSEDED_INDEXES = ["idx_state", "idx_cpi"]
+
+
+def _as_stored(value, sql_type: str):
+    """`value` as SQLite stores it in a column of `sql_type` affinity (REAL/TEXT)."""
+    if value is None:
+        return None
+    if sql_type == "REAL":
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return str(value)  # non-numeric text is kept as text
+    return str(value)
+
+
+def content_hash(values) -> int:
+    """64-bit fingerprint of one row's _DEDUP_COLUMNS values (bound or read back alike).
+
+    Values are first normalised to what SQLite stores under each column's
+    affinity, so '3', 3 and the stored '3' all hash the same. Rows with equal
+    hashes are candidates only — _dedup still groups on the real columns.
+    """
+    return content_hashes([[v] for v in values])[0]
+
+
+def content_hashes(columns: List[list]) -> List[int]:
+    """content_hash() for a chunk of rows given as one list per _DEDUP_COLUMNS column."""
+    stored = []
+    for col, values in zip(_DEDUP_COLUMNS, columns):
+        sql_type = COLUMN_DEFS[col]
+        native = float if sql_type == "REAL" else str
+        stored.append([v if v is None or type(v) is native else _as_stored(v, sql_type)
+                       for v in values])
+    blake2b, from_bytes = hashlib.blake2b, int.from_bytes
+    return [from_bytes(blake2b(repr(row).encode(), digest_size=8).digest(), "big", signed=True)
+            for row in zip(*stored)]
+
+
+def backfill_content_hashes(conn: sqlite3.Connection) -> int:
+    """Fingerprint rows stored before content_hash existed. Returns rows updated."""
+    rows = conn.execute(
+        f"SELECT ads_id, {_DEDUP_COLS} FROM {config.DB_TABLE} WHERE content_hash IS NULL"
+    ).fetchall()
+    conn.executemany(
+        f"UPDATE {config.DB_TABLE} SET content_hash = ? WHERE ads_id = ?",
+        [(content_hash(row[1:]), row[0]) for row in rows],
+    )
+    return len(rows)
+
+
+CREATE_DEDUP_PENDING_SQL = (
+    f"CREATE TABLE IF NOT EXISTS {config.DEDUP_PENDING_TABLE} (content_hash INTEGER PRIMARY KEY)"
+)
+
 
+def _mark_pending(conn: sqlite3.Connection, hashes: Iterable[int]) -> None:
+    """Queue `hashes` for the next _dedup, in the caller's open transaction."""
+    conn.execute(CREATE_DEDUP_PENDING_SQL)
+    conn.executemany(f"INSERT OR IGNORE INTO {config.DEDUP_PENDING_TABLE} VALUES (?)",
+                     ((h,) for h in hashes))
 
-def _dedup(conn: sqlite3.Connection) -> int:
-    """Delete content-duplicate rows, keeping the lowest ads_id per group. Returns rows deleted."""
+
+def _dedup(conn: sqlite3.Connection, hashes: Optional[Iterable[int]] = None) -> int:
+    """Delete content-duplicate rows, keeping the lowest ads_id per group. Returns rows deleted.
+
+    With `hashes` (the content_hash values a load wrote) only those groups are
+    examined, through idx_content_hash — time proportional to the load, not the
+    table — along with any still queued in config.DEDUP_PENDING_TABLE by loads
+    that never reached their dedup. Without, every group in the table is (the
+    original full scan). Either way the queue is emptied in the same commit.
+    """
+    conn.execute(CREATE_DEDUP_PENDING_SQL)
+    if hashes is None:
+        cur = conn.execute(f"""
+            DELETE FROM {config.DB_TABLE}
+            WHERE ads_id NOT IN (
+                SELECT MIN(ads_id)
+                FROM {config.DB_TABLE}
+                GROUP BY {_DEDUP_COLS}
+            )
+        """)
+        conn.execute(f"DELETE FROM {config.DEDUP_PENDING_TABLE}")
+        conn.commit()
+        return cur.rowcount
+
+    _mark_pending(conn, hashes)
+    touched = f"SELECT content_hash FROM {config.DEDUP_PENDING_TABLE}"
     cur = conn.execute(f"""
         DELETE FROM {config.DB_TABLE}
-        WHERE ads_id NOT IN (
+        WHERE content_hash IN ({touched})
+          AND ads_id NOT IN (
             SELECT MIN(ads_id)
             FROM {config.DB_TABLE}
-            GROUP BY {_DEDUP_COLS}
+            WHERE content_hash IN ({touched})
+            GROUP BY content_hash, {_DEDUP_COLS}
         )
     """)
+    conn.execute(f"DELETE FROM {config.DEDUP_PENDING_TABLE}")
     conn.commit()
     return cur.rowcount
 
@@ -115,7 +250,9 @@ def ensure_schema(conn: sqlite3.Connection) -> None:
 
     Idempotent: safe to call on every load/recheck run. Fresh DBs already have all
     columns via CREATE_TABLE_SQL; this migrates DBs created with an older schema
-    (e.g. before the scrape-field expansion or the recheck feature).
+    (e.g. before the scrape-field expansion or the recheck feature). Also installs
+    the listing history and rent summary tables and their triggers
+    (scripts/history.py, scripts/aggregates.py).
     """
     conn.execute(CREATE_TABLE_SQL)  # no-op if table exists; creates it otherwise
     existing = {row[1] for row in conn.execute(f"PRAGMA table_info({config.DB_TABLE})")}
@@ -123,6 +260,10 @@ def ensure_schema(conn: sqlite3.Connection) -> None:
     for col in added:
         conn.execute(f"ALTER TABLE {config.DB_TABLE} ADD COLUMN {col} {COLUMN_DEFS[col]};")
 
+    if "content_hash" in added:
+        backfilled = backfill_content_hashes(conn)
+        logger.info(f"Fingerprinted {backfilled} existing rows for incremental dedup.")
+
     if any(c in RECHECK_COLUMNS for c in added):
         # Seed pre-existing rows: treat already-scraped listings as active,
         # first seen on their scrape_date.
@@ -135,94 +276,334 @@ def ensure_schema(conn: sqlite3.Connection) -> None:
         )
     conn.commit()
 
+    history.ensure(conn)
+    aggregates.ensure(conn)
+
+
+def _column_chunk(values: np.ndarray, idx) -> list:
+    """values[idx] as a Python list, missing (NaN/NA/None) -> None."""
+    chunk = values[idx]
+    if chunk.dtype.kind in "iub":
+        return chunk.tolist()  # can't hold NaN
+    missing = pd.isna(chunk)
+    items = chunk.tolist()
+    if not missing.any():
+        return items
+    return [None if m else v for v, m in zip(items, missing.tolist())]
+
 
-def upsert_dataframe(conn: sqlite3.Connection, df: pd.DataFrame) -> int:
+def _iter_upsert_params(df: pd.DataFrame, positions: Optional[np.ndarray],
+                        chunk_rows: int, hashes: Optional[set] = None) -> Iterator[tuple]:
+    """Stream upsert parameter tuples for the rows of `df` at `positions` (None = all).
+
+    Only one chunk of `chunk_rows` rows is ever converted to Python objects; the
+    frame itself is never copied. content_hash is computed here (any incoming
+    value is ignored) and, with `hashes`, collected for _dedup.
+    """
+    n = len(df) if positions is None else len(positions)
+    columns = [df[c].to_numpy() if c in df.columns and c != 'content_hash' else None
+               for c in SCRAPE_COLUMNS]
+    scrape_date_idx = SCRAPE_COLUMNS.index('scrape_date')
+    hash_idx = SCRAPE_COLUMNS.index('content_hash')
+    dedup_idx = [SCRAPE_COLUMNS.index(c) for c in _DEDUP_COLUMNS]
+
+    for start in range(0, n, chunk_rows):
+        stop = min(start + chunk_rows, n)
+        idx = slice(start, stop) if positions is None else positions[start:stop]
+        cols = [
+            [None] * (stop - start) if values is None else _column_chunk(values, idx)
+            for values in columns
+        ]
+        cols[hash_idx] = content_hashes([cols[i] for i in dedup_idx])
+        if hashes is not None:
+            hashes.update(cols[hash_idx])
+        cols.append(cols[scrape_date_idx])  # first_seen = scrape_date
+        yield from zip(*cols)
+
+
+# Parameters bound per row by upsert_dataframe / the bulk staging insert.
+_INSERT_COLUMNS = SCRAPE_COLUMNS + ['first_seen']
+
+_ON_CONFLICT_SQL = (
+    "ON CONFLICT(ads_id) DO UPDATE SET "
+    + ", ".join(f"{c} = excluded.{c}" for c in SCRAPE_COLUMNS if c != 'ads_id')
+    + ", availability_status = 'active', gone_at = NULL, "
+    "last_checked_at = excluded.scrape_date"
+)
+
+
+def upsert_dataframe(conn: sqlite3.Connection, df: pd.DataFrame,
+                     chunk_rows: Optional[int] = None,
+                     hashes: Optional[set] = None) -> int:
     """Upsert rows by ads_id, preserving recheck-managed columns. Returns row count.
 
     On insert: first_seen = scrape_date, availability_status = 'active'.
     On conflict (existing listing re-scraped): scrape columns are refreshed and the
     listing is re-affirmed live (status -> 'active', gone_at cleared, last_checked_at
     bumped to this scrape_date) — but first_seen is left untouched.
-    """
-    if 'ads_id' not in df.columns:
-        raise ValueError("DataFrame missing 'ads_id' column — cannot upsert.")
-
-    df = df.drop_duplicates(subset='ads_id').copy()
-    for col in SCRAPE_COLUMNS:
-        if col not in df.columns:
-            df[col] = None
-    df = df[SCRAPE_COLUMNS]
 
-    # NaN -> None so SQLite stores NULL.
-    df = df.astype(object).where(pd.notnull(df), None)
-
-    insert_cols = SCRAPE_COLUMNS + ['first_seen']
-    placeholders = ', '.join('?' * len(insert_cols))
-    update_set = ', '.join(
-        f"{c} = excluded.{c}" for c in SCRAPE_COLUMNS if c != 'ads_id'
-    )
+    Rows are streamed into executemany `chunk_rows` (config.LOAD_CHUNK_ROWS) at
+    a time, NaN/NA -> NULL per column, without materialising the whole frame.
+    Each row's content_hash is set; pass a `hashes` set to collect them for
+    _dedup(conn, hashes). They are also queued in config.DEDUP_PENDING_TABLE
+    within the same (uncommitted) transaction, so they outlive a crash before
+    the dedup.
+    """
     sql = (
-        f"INSERT INTO {config.DB_TABLE} ({', '.join(insert_cols)}, "
+        f"INSERT INTO {config.DB_TABLE} ({', '.join(_INSERT_COLUMNS)}, "
         f"availability_status) "
-        f"VALUES ({placeholders}, 'active') "
-        f"ON CONFLICT(ads_id) DO UPDATE SET "
-        f"{update_set}, "
-        f"availability_status = 'active', "
-        f"gone_at = NULL, "
-        f"last_checked_at = excluded.scrape_date"
+        f"VALUES ({', '.join('?' * len(_INSERT_COLUMNS))}, 'active') "
+        f"{_ON_CONFLICT_SQL}"
     )
+    return _stream_rows(conn, sql, df, chunk_rows, hashes)
 
-    scrape_date_idx = SCRAPE_COLUMNS.index('scrape_date')
-    rows = df.values.tolist()
-    params = [row + [row[scrape_date_idx]] for row in rows]  # first_seen = scrape_date
-    conn.executemany(sql, params)
-    return len(df)
 
+def _stream_rows(conn: sqlite3.Connection, sql: str, df: pd.DataFrame,
+                 chunk_rows: Optional[int] = None, hashes: Optional[set] = None) -> int:
+    """executemany `sql` over df's _INSERT_COLUMNS parameters. Returns rows sent."""
+    if 'ads_id' not in df.columns:
+        raise ValueError("DataFrame missing 'ads_id' column — cannot upsert.")
 
-def load_processed_files():
-    processed_files = list(config.PROCESSED_DATA_DIR.glob('*.csv'))
-    if not processed_files:
-        logger.warning("No processed CSV files found.")
-        return
+    # Duplicate ads_ids keep their first row, as drop_duplicates would.
+    dup = df['ads_id'].duplicated().to_numpy()
+    positions = np.flatnonzero(~dup) if dup.any() else None
+    chunk_rows = max(chunk_rows or config.LOAD_CHUNK_ROWS, 1)
+    conn.executemany(sql, _iter_upsert_params(df, positions, chunk_rows, hashes))
+    if hashes is not None:
+        _mark_pending(conn, hashes)
+    return len(df) if positions is None else len(positions)
 
-    conn = sqlite3.connect(config.DB_FILE)
+
+def connect(db_file: Optional[Path] = None, **kwargs) -> sqlite3.Connection:
+    """Open the DB for loading: WAL, schema migrated, indexes in place."""
+    conn = sqlite3.connect(db_file or config.DB_FILE, **kwargs)
     conn.execute("PRAGMA journal_mode=WAL;")
     ensure_schema(conn)
     for idx_sql in CREATE_INDEXES_SQL:
         conn.execute(idx_sql)
+    for name in SUPERSEDED_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    return conn
 
-    total_upserted = 0
 
-    for csv_path in processed_files:
-        try:
-            df = pd.read_csv(csv_path)
-            # ON CONFLICT(ads_id) upsert preserves recheck-managed columns; no DELETE needed.
-            count = upsert_dataframe(conn, df)
-            conn.commit()
+class DirectLoader:
+    """Clean scraped row batches in memory and upsert them straight into the DB.
 
-            # Once loaded, the CSVs are regenerable from the DB — delete, don't archive.
-            csv_path.unlink()
+    The sink for `run_pipeline.py --direct`: replaces the raw CSV -> clean ->
+    processed file -> load round trip with the same clean.clean_raw and
+    upsert_dataframe calls on each batch. Each batch is committed as it lands.
+    Thread-safe — concurrent scrape windows share one loader and connection.
 
-            # Raw file lives in a per-state subdir (data/raw/<state>/<name>.csv).
-            # Search recursively so we find it regardless of nesting depth.
-            raw_file = next(config.RAW_DATA_DIR.rglob(csv_path.name), None)
-            if raw_file:
-                raw_file.unlink()
+    Rows that arrive before their geocode resolved are remembered; call
+    fill_coordinates(cache) once the geocoder has drained, then close().
+    """
 
-            logger.info(f"Loaded {count} rows from {csv_path.name}; processed + raw CSVs removed.")
+    def __init__(self, db_file: Optional[Path] = None, mapping_dict: Optional[dict] = None):
+        self.conn = connect(db_file, check_same_thread=False)
+        self.mapping_dict = clean.load_mapping_dict() if mapping_dict is None else mapping_dict
+        self._lock = threading.Lock()
+        self._uncoded: Dict[str, str] = {}  # ads_id -> address, loaded without lat/lon
+        self._hashes: set = set()
+        self.rows = 0
+
+    def write(self, batch: List[Dict]) -> int:
+        """Clean and upsert one batch of scraped row dicts. Returns rows upserted."""
+        df = clean.clean_raw(pd.DataFrame(batch), self.mapping_dict)
+        if df.empty:
+            return 0
+        with self._lock:
+            try:
+                hashes: set = set()
+                count = upsert_dataframe(self.conn, df, hashes=hashes)
+                self.conn.commit()
+                self._hashes |= hashes
+            except Exception:
+                self.conn.rollback()
+                raise
+            self.rows += count
+            if {'latitude', 'address'} <= set(df.columns):
+                missing = df[df['latitude'].isna() & df['address'].notna()]
+                self._uncoded.update(zip(missing['ads_id'], missing['address']))
+        return count
+
+    def fill_coordinates(self, cache) -> int:
+        """Set lat/lon on rows loaded without them, from `cache`. Returns rows filled."""
+        params = []
+        for ads_id, address in self._uncoded.items():
+            cached = cache.get(mudah_api.geocode_query_for_address(address))
+            if cached and cached[0] is not None:
+                params.append((cached[0], cached[1], ads_id))
+        with self._lock:
+            with self.conn:
+                self.conn.executemany(
+                    f"UPDATE {config.DB_TABLE} SET latitude = ?, longitude = ? "
+                    f"WHERE ads_id = ? AND latitude IS NULL",
+                    params,
+                )
+            self._uncoded.clear()
+        return len(params)
+
+    def close(self) -> int:
+        """Run the content dedup, refresh the rent summaries and close. Returns rows deduped."""
+        deleted = _dedup(self.conn, self._hashes)
+        if deleted:
+            logger.info(f"Dedup removed {deleted} content-duplicate rows (kept lowest ads_id per group).")
+        _refresh_summaries(self.conn)
+        self.conn.close()
+        logger.info(f"Direct load done. Total rows upserted: {self.rows}. DB: {config.DB_FILE}")
+        return deleted
+
+
+def _refresh_summaries(conn: sqlite3.Connection) -> None:
+    groups = aggregates.refresh(conn)
+    if groups:
+        logger.info(f"Refreshed {groups} {config.SUMMARY_TABLE} groups.")
+
+
+def _remove_loaded(staged_path: Path) -> None:
+    """Once loaded, the staged file and its raw CSV are regenerable from the DB — delete both."""
+    staged_path.unlink()
+    # Raw file lives in a per-state subdir (data/raw/<state>/<name>.csv).
+    # Search recursively so we find it regardless of nesting depth.
+    raw_file = next(config.RAW_DATA_DIR.rglob(f"{staged_path.stem}.csv"), None)
+    if raw_file:
+        raw_file.unlink()
+
+
+def _load_per_file(conn: sqlite3.Connection, files: List[Path], hashes: set) -> int:
+    """Default mode: upsert each file in its own transaction."""
+    total_upserted = 0
+    for staged_path in files:
+        try:
+            df = staging.read(staged_path)
+            # ON CONFLICT(ads_id) upsert preserves recheck-managed columns; no DELETE needed.
+            file_hashes: set = set()
+            count = upsert_dataframe(conn, df, hashes=file_hashes)
+            conn.commit()
+            hashes |= file_hashes
+            _remove_loaded(staged_path)
+            logger.info(f"Loaded {count} rows from {staged_path.name}; processed + raw files removed.")
             total_upserted += count
 
         except Exception as e:
             conn.rollback()
-            logger.error(f"Error loading {csv_path.name}: {e}")
+            logger.error(f"Error loading {staged_path.name}: {e}")
             continue
+    return total_upserted
+
+
+_BULK_STAGING_TABLE = "bulk_staging"
+
+
+def _index_names() -> List[str]:
+    return [re.search(r"INDEX IF NOT EXISTS (\w+)", sql).group(1) for sql in CREATE_INDEXES_SQL]
 
-    deleted = _dedup(conn)
-    if deleted:
-        logger.info(f"Dedup removed {deleted} content-duplicate rows (kept lowest ads_id per group).")
 
-    conn.close()
-    logger.info(f"Done. Total rows upserted: {total_upserted}. DB: {config.DB_FILE}")
+def _load_bulk(conn: sqlite3.Connection, files: List[Path], hashes: set) -> int:
+    """Bulk mode: stage every file, then one merge into the table.
+
+    Rows go into an unindexed TEMP table (a savepoint per file, so a bad file
+    is skipped on its own), the secondary indexes are dropped, one
+    INSERT ... SELECT ... ON CONFLICT merges the staged rows — the last file
+    wins for an ads_id seen in several, as per-file loading would — and the
+    indexes are rebuilt once. Everything is one transaction; files are only
+    removed after it commits.
+    """
+    for pragma in config.BULK_LOAD_PRAGMAS:
+        conn.execute(f"PRAGMA {pragma};")
+    conn.execute(f"DROP TABLE IF EXISTS temp.{_BULK_STAGING_TABLE}")
+    conn.execute(f"CREATE TEMP TABLE {_BULK_STAGING_TABLE} ({', '.join(_INSERT_COLUMNS)})")
+    stage_sql = (
+        f"INSERT INTO temp.{_BULK_STAGING_TABLE} ({', '.join(_INSERT_COLUMNS)}) "
+        f"VALUES ({', '.join('?' * len(_INSERT_COLUMNS))})"
+    )
+    # Last staged row per ads_id wins, as the last upsert would per file; an
+    # ads_id new to the table keeps its first file's first_seen and, if later
+    # files re-saw it, their scrape_date as last_checked_at — the same end state
+    # as upserting the files one by one.
+    staged_cols = ', '.join(f"s.{c}" for c in SCRAPE_COLUMNS)
+    merge_sql = (
+        f"WITH grp AS (SELECT MIN(rowid) AS first_row, MAX(rowid) AS last_row, "
+        f"COUNT(*) AS n FROM temp.{_BULK_STAGING_TABLE} GROUP BY ads_id) "
+        f"INSERT INTO {config.DB_TABLE} ({', '.join(SCRAPE_COLUMNS)}, first_seen, "
+        f"last_checked_at, availability_status) "
+        f"SELECT {staged_cols}, f.first_seen, "
+        f"CASE WHEN grp.n > 1 THEN s.scrape_date END, 'active' "
+        f"FROM grp JOIN temp.{_BULK_STAGING_TABLE} s ON s.rowid = grp.last_row "
+        f"JOIN temp.{_BULK_STAGING_TABLE} f ON f.rowid = grp.first_row "
+        f"WHERE true ORDER BY s.ads_id "  # WHERE: disambiguates ON CONFLICT after a join
+        f"{_ON_CONFLICT_SQL}"
+    )
+
+    loaded = []
+    conn.execute("BEGIN")
+    try:
+        for staged_path in files:
+            conn.execute("SAVEPOINT bulk_file")
+            file_hashes: set = set()
+            try:
+                count = _stream_rows(conn, stage_sql, staging.read(staged_path),
+                                     hashes=file_hashes)
+            except Exception as e:
+                conn.execute("ROLLBACK TO bulk_file")
+                logger.error(f"Error loading {staged_path.name}: {e}")
+            else:
+                loaded.append((staged_path, count))
+                hashes |= file_hashes
+                logger.info(f"Staged {count} rows from {staged_path.name}")
+            conn.execute("RELEASE bulk_file")
+
+        for name in _index_names():
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+        merged = conn.execute(
+            f"SELECT COUNT(DISTINCT ads_id) FROM temp.{_BULK_STAGING_TABLE}"
+        ).fetchone()[0]
+        conn.execute(merge_sql)
+        for idx_sql in CREATE_INDEXES_SQL:
+            conn.execute(idx_sql)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute(f"DROP TABLE IF EXISTS temp.{_BULK_STAGING_TABLE}")
+
+    for staged_path, _count in loaded:
+        _remove_loaded(staged_path)
+    logger.info(f"Merged {merged} distinct listings from {len(loaded)} file(s); "
+                f"indexes rebuilt; processed + raw files removed.")
+    return sum(count for _path, count in loaded)
+
+
+def load_processed_files(bulk: bool = False) -> int:
+    """Load every staged processed file into the DB. Returns rows upserted.
+
+    bulk=True (backfills, full rebuilds) stages all files and merges them in one
+    transaction with deferred index builds and config.BULK_LOAD_PRAGMAS; see
+    _load_bulk(). The default upserts file by file.
+    """
+    processed_files = staging.staged_files(config.PROCESSED_DATA_DIR)
+    if not processed_files:
+        logger.warning("No processed files found.")
+        return 0
+
+    start = time.perf_counter()
+    conn = connect()
+    hashes: set = set()
+    try:
+        if bulk:
+            total_upserted = _load_bulk(conn, processed_files, hashes)
+        else:
+            total_upserted = _load_per_file(conn, processed_files, hashes)
+
+        deleted = _dedup(conn, hashes)
+        if deleted:
+            logger.info(f"Dedup removed {deleted} content-duplicate rows (kept lowest ads_id per group).")
+        _refresh_summaries(conn)
+    finally:
+        conn.close()
+    logger.info(f"Done ({'bulk' if bulk else 'per-file'} mode) in {time.perf_counter() - start:.1f}s. "
+                f"Total rows upserted: {total_upserted}. DB: {config.DB_FILE}")
 
     # Sweep combined _ALL_ files from raw subdirs — skipped by clean.py so they
     # never get a processed file and would otherwise accumulate indefinitely.
@@ -230,7 +611,13 @@ def load_processed_files():
         if config.SCRAPED_COMBINED_MARKER in p.name:
             p.unlink()
             logger.info(f"Swept combined file: {p.name}")
+    return total_upserted
 
 
 if __name__ == "__main__":
-    load_processed_files()
+    ap = argparse.ArgumentParser(description="Load processed files into the SQLite DB.")
+    ap.add_argument("--bulk", action="store_true",
+                    help="Backfill / rebuild mode: one transaction, staging table, "
+                         "indexes rebuilt once, relaxed durability PRAGMAs.")
+    args = ap.parse_args()
+    load_processed_files(bulk=args.bulk)
@@ -4,16 +4,21 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 import config
+import json
 import requests
+import threading
 import time
-import random
-from typing import Dict, Iterator, Optional
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import Callable, Dict, Iterator, Optional, Tuple
 
 # Status codes worth retrying: 429 (rate limit), 403 (Mudah's rate-limit response), 5xx
 _RETRYABLE = {403, 429, 500, 502, 503, 504}
 
 
-def _retry_wait(resp: Optional[requests.Response], attempt: int) -> float:
+def _retry_wait(resp: Optional[requests.Response], attempt: int,
+                backoff_base: Optional[float] = None) -> float:
     """Seconds to wait before the next attempt. Honors Retry-After when present."""
     if resp is not None:
         retry_after = resp.headers.get("Retry-After")
@@ -22,27 +27,255 @@ def _retry_wait(resp: Optional[requests.Response], attempt: int) -> float:
                 return min(float(retry_after), config.API_RETRY_MAX_WAIT)
             except ValueError:
                 pass
-    return min(config.API_BACKOFF_BASE * (2 ** attempt), config.API_RETRY_MAX_WAIT)
+    base = config.API_BACKOFF_BASE if backoff_base is None else backoff_base
+    return min(base * (2 ** attempt), config.API_RETRY_MAX_WAIT)
 
 
-def _get_json(params: Dict) -> Dict:
-    """GET the search endpoint with the given params, retrying rate limits / 5xx.
+class TokenBucket:
+    """Thread-safe token bucket capping the aggregate request rate.
 
-    Honors Retry-After and exponential backoff. Returns the parsed JSON body.
+    Holds up to `burst` tokens, refilled at `rate` per second. `acquire()` blocks
+    until a token is available, so every thread sharing the bucket — serial pages,
+    concurrent scrape windows, recheck workers — draws from one global budget.
+    A rate <= 0 disables the cap (pauses from on_throttle are still honored).
     """
-    headers = {"User-Agent": config.API_USER_AGENT}
-    for attempt in range(config.API_MAX_RETRIES + 1):
-        resp = requests.get(
-            config.API_BASE_URL,
-            params=params,
-            timeout=config.API_REQUEST_TIMEOUT,
-            headers=headers,
-        )
-        if resp.status_code in _RETRYABLE and attempt < config.API_MAX_RETRIES:
-            time.sleep(_retry_wait(resp, attempt))
-            continue
-        resp.raise_for_status()
-        return resp.json()
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = float(rate)
+        self.burst = max(int(burst), 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(now - self._updated, 0.0)
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def acquire(self) -> None:
+        """Take one token, sleeping out any global pause and then until a token is free.
+
+        The pause is re-checked on every wake-up, so a caller already waiting for
+        a token also honours an on_throttle() that lands in the meantime.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                pause = self._paused_until - now
+                if pause <= 0 and self.rate <= 0:
+                    return
+                if pause <= 0:
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                wait = max(pause, (1 - self._tokens) / self.rate if self.rate > 0 else 0.0)
+            time.sleep(wait)
+
+    def on_success(self) -> None:
+        """Feedback hook: a request came back clean."""
+
+    def on_throttle(self, wait: float) -> None:
+        """Feedback hook: a request was rate-limited. Pauses every caller for `wait` s."""
+        with self._lock:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + wait)
+            self._tokens = 0.0
+            # No refill until the pause ends, so tokens don't pile up and burst out after it.
+            self._updated = self._paused_until
+
+
+class AdaptiveRateLimiter(TokenBucket):
+    """AIMD rate limiter: speeds up while Mudah answers cleanly, halves on pushback.
+
+    Each clean response adds config.API_RATE_INCREASE req/s (up to API_RATE_MAX);
+    each 403/429/5xx multiplies the rate by API_RATE_DECREASE (down to
+    API_RATE_MIN) and pauses *all* callers for the Retry-After / backoff wait, so
+    one throttled thread slows the whole run instead of just retrying itself.
+    The learned rate is persisted to `state_file` (save()) and picked up by the
+    next run, so nightly jobs start near the last rate Mudah tolerated.
+    """
+
+    def __init__(self, rate: Optional[float] = None, burst: Optional[int] = None,
+                 min_rate: Optional[float] = None, max_rate: Optional[float] = None,
+                 state_file: Optional[Path] = None):
+        self.min_rate = config.API_RATE_MIN if min_rate is None else min_rate
+        self.max_rate = config.API_RATE_MAX if max_rate is None else max_rate
+        self.state_file = state_file
+        if rate is None:
+            rate = self._load_rate() or config.API_RATE_LIMIT
+        rate = min(max(rate, self.min_rate), self.max_rate)
+        super().__init__(rate, config.API_RATE_BURST if burst is None else burst)
+        self.throttles = 0
+
+    def _load_rate(self) -> Optional[float]:
+        if self.state_file is None or not self.state_file.exists():
+            return None
+        try:
+            with open(self.state_file, encoding="utf-8") as f:
+                return float(json.load(f)["rate"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def save(self) -> None:
+        """Persist the current rate to state_file (no-op without one)."""
+        if self.state_file is None:
+            return
+        with open(self.state_file, "w", encoding="utf-8") as f:
+            json.dump({"rate": round(self.rate, 4),
+                       "saved_at": datetime.now().isoformat(timespec="seconds")}, f)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.rate = min(self.rate + config.API_RATE_INCREASE, self.max_rate)
+
+    def on_throttle(self, wait: float) -> None:
+        with self._lock:
+            self.rate = max(self.rate * config.API_RATE_DECREASE, self.min_rate)
+            self.throttles += 1
+        super().on_throttle(wait)
+
+
+class ApiClient:
+    """Pooled, keep-alive HTTP client for the search endpoint.
+
+    One `requests.Session` with a single mounted connection pool, so consecutive
+    pages and lookups reuse TCP+TLS connections. Retry policy defaults to
+    config.API_MAX_RETRIES / API_BACKOFF_BASE (read at call time); pass explicit
+    values to override. Use the module-level client via `get_client()` /
+    `configure()` rather than building one per call.
+
+    Every request (retries included) first takes a token from `limiter` — by
+    default an AdaptiveRateLimiter seeded from config.API_RATE_STATE_FILE — and
+    reports back clean vs throttled responses, so pacing is global: it caps how
+    hard serial pages, concurrent scrape windows and rechecks hit Mudah together.
+    """
+
+    def __init__(self, pool_maxsize: Optional[int] = None,
+                 max_retries: Optional[int] = None,
+                 backoff_base: Optional[float] = None,
+                 limiter: Optional[TokenBucket] = None):
+        self.pool_maxsize = pool_maxsize or config.API_POOL_MAXSIZE
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.limiter = limiter or AdaptiveRateLimiter(state_file=config.API_RATE_STATE_FILE)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "User-Agent": config.API_USER_AGENT,
+            "Accept-Encoding": config.API_ACCEPT_ENCODING,
+            "Connection": "keep-alive",
+        })
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._retries = 0
+        self._baseline = (0, 0)  # (connections, pool requests) at last reset_stats()
+
+    def _pool_counters(self) -> Tuple[int, int]:
+        """Sum (connections opened, requests sent) across the session's urllib3 pools."""
+        opened = sent = 0
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    opened += pool.num_connections
+                    sent += pool.num_requests
+        return opened, sent
+
+    def get_json(self, params: Dict) -> Dict:
+        """GET the search endpoint with the given params, retrying rate limits / 5xx.
+
+        Honors Retry-After and exponential backoff. Returns the parsed JSON body.
+        """
+        max_retries = config.API_MAX_RETRIES if self.max_retries is None else self.max_retries
+        for attempt in range(max_retries + 1):
+            self.limiter.acquire()
+            resp = self.session.get(
+                config.API_BASE_URL,
+                params=params,
+                timeout=config.API_REQUEST_TIMEOUT,
+            )
+            with self._lock:
+                self._requests += 1
+            if resp.status_code in _RETRYABLE:
+                # Global backoff: the limiter pauses every caller, and this thread
+                # sleeps the pause out in acquire() before its next attempt.
+                self.limiter.on_throttle(_retry_wait(resp, attempt, self.backoff_base))
+                if attempt < max_retries:
+                    with self._lock:
+                        self._retries += 1
+                    continue
+            resp.raise_for_status()
+            self.limiter.on_success()
+            return resp.json()
+
+    def stats(self) -> Dict[str, float]:
+        """Per-run counters: requests made, retries, connections opened vs reused,
+        and the limiter's current rate (req/s)."""
+        opened, sent = self._pool_counters()
+        opened -= self._baseline[0]
+        sent -= self._baseline[1]
+        return {
+            "requests": self._requests,
+            "retries": self._retries,
+            "connections_opened": opened,
+            "connections_reused": max(sent - opened, 0),
+            "rate": round(self.limiter.rate, 3),
+        }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._requests = 0
+            self._retries = 0
+            self._baseline = self._pool_counters()
+
+    def save_state(self) -> None:
+        """Persist the limiter's learned rate, if it's adaptive."""
+        if isinstance(self.limiter, AdaptiveRateLimiter):
+            self.limiter.save()
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_CLIENT: Optional[ApiClient] = None
+
+
+def get_client() -> ApiClient:
+    """Return the shared module-level client, creating it on first use."""
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = ApiClient()
+    return _CLIENT
+
+
+def configure(**kwargs) -> ApiClient:
+    """Replace the shared client with one built from `kwargs` (see ApiClient)."""
+    global _CLIENT
+    if _CLIENT is not None:
+        _CLIENT.close()
+    _CLIENT = ApiClient(**kwargs)
+    return _CLIENT
+
+
+def client_stats() -> Dict[str, float]:
+    """Connection/request counters for the shared client since its last reset."""
+    return get_client().stats()
+
+
+def save_rate_state() -> None:
+    """Persist the shared client's learned request rate for the next run."""
+    if _CLIENT is not None:
+        _CLIENT.save_state()
+
+
+def _get_json(params: Dict) -> Dict:
+    """GET the search endpoint through the shared pooled client."""
+    return get_client().get_json(params)
 
 
 def search(region: str, offset: int = 0, property_type_id: Optional[int] = None) -> Dict:
@@ -77,25 +310,86 @@ def lookup(list_id) -> list:
     return body.get("data", [])
 
 
+def _total_results(body: Dict) -> Optional[int]:
+    """The `total-results` count from a search response's meta, or None."""
+    try:
+        return int(body.get("meta", {})["total-results"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _all_older(items: list, stop_before: Optional[int]) -> bool:
+    """True when a watermark is set and no item on the page is newer than it."""
+    if stop_before is None:
+        return False
+    for item in items:
+        try:
+            if int(item.get("attributes", {}).get("list_id")) > stop_before:
+                return False
+        except (TypeError, ValueError):
+            return False
+    return True
+
+
 def iter_listings(
     region: str,
     max_pages: int = 100,
     property_type_id: Optional[int] = None,
+    on_total: Optional[Callable[[int], None]] = None,
+    concurrency: Optional[int] = None,
+    stop_before: Optional[int] = None,
 ) -> Iterator[Dict]:
     """Yield listing dicts for the given region, paginating pages 1..max_pages.
 
-    Stops early when the API returns fewer than API_PAGE_SIZE items.
+    Page one's meta gives the total, so the remaining offsets (multiples of
+    API_PAGE_SIZE below min(total, API_OFFSET_CAP, max_pages pages)) are known up
+    front and fetched `concurrency` at a time (default config.API_PAGE_CONCURRENCY).
+    Items are still yielded in offset order. Stops early on a short page. If the
+    response carries no total, falls back to one page at a time.
+
+    `on_total`, if given, is called once with the number of listings reachable in
+    this window — for progress bars. Pacing comes from the shared client's limiter.
+
+    `stop_before` (a list_id watermark) switches to one page at a time and stops
+    after the first page whose listings are all at or below it — results come
+    newest-first, so nothing further back is new (incremental scrapes).
     """
-    for page in range(1, max_pages + 1):
-        offset = (page - 1) * config.API_PAGE_SIZE
-        body = search(region=region, offset=offset, property_type_id=property_type_id)
-        items = body.get("data", [])
-        for item in items:
-            yield item
-        if len(items) < config.API_PAGE_SIZE:
-            return
-        # Polite delay between API calls
-        time.sleep(random.uniform(config.API_MIN_DELAY, config.API_MAX_DELAY))
+    page_size = config.API_PAGE_SIZE
+    body = search(region=region, offset=0, property_type_id=property_type_id)
+    items = body.get("data", [])
+    total = _total_results(body)
+    limit = max_pages * page_size
+    if total is not None:
+        limit = min(limit, total, config.API_OFFSET_CAP)
+    if on_total is not None:
+        on_total(limit)
+    yield from items
+    if len(items) < page_size or _all_older(items, stop_before):
+        return
+
+    if total is None or stop_before is not None:
+        for offset in range(page_size, limit, page_size):
+            items = search(region=region, offset=offset,
+                           property_type_id=property_type_id).get("data", [])
+            yield from items
+            if len(items) < page_size or _all_older(items, stop_before):
+                return
+        return
+
+    offsets = list(range(page_size, limit, page_size))
+    workers = max(concurrency or config.API_PAGE_CONCURRENCY, 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for i in range(0, len(offsets), workers):
+            batch = offsets[i:i + workers]
+            pages = pool.map(
+                lambda off: search(region=region, offset=off,
+                                   property_type_id=property_type_id).get("data", []),
+                batch,
+            )
+            for items in pages:
+                yield from items
+                if len(items) < page_size:
+                    return
 
 
 def _join(value) -> str:
@@ -161,3 +455,11 @@ def geocode_query(attributes: Dict) -> str:
     if not parts:
         return ""
     return ", ".join(parts) + ", Malaysia"
+
+
+def geocode_query_for_address(address: Optional[str]) -> str:
+    """Rebuild geocode_query() from a CSV row's `address` (same parts, same order)."""
+    parts = [p.strip() for p in str(address or "").split(",") if p.strip()]
+    if not parts:
+        return ""
+    return ", ".join(parts) + ", Malaysia"
@@ -0,0 +1,239 @@
+"""Offline geocoder: answers from a local centroid table before any network call.
+
+Geocode precision is only building/subarea level anyway (the API gives no street
+address), and after a few full runs the cache already holds coordinates for
+almost every subarea. The table is built per run from:
+
+  - every positive geocache entry — grouped by (building, state) and by
+    (subarea, state), each group answering with the mean of its coordinates;
+  - the bundled gazetteer (config.GEO_GAZETTEER_FILE): state reference points,
+    plus any subarea rows added by hand.
+
+A query is parsed back into its parts (mudah_api.geocode_query order:
+building, subarea, state, "Malaysia"). Lookups go building -> subarea; a bare
+"<state>, Malaysia" query is answered from the state row. A query whose
+subarea the table has never seen returns None and goes to the network as before.
+
+A 2-d KD-tree over the subarea/state centroids gives reverse lookups
+(nearest known subarea to a point) without a network call either.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import config
+import logging
+import scripts.logger  # noqa: F401  — configures root handlers
+
+logger = logging.getLogger("offline_geocoder")
+
+import csv
+import math
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+Coords = Tuple[float, float]
+
+# Longitude degrees shrink by cos(latitude); Malaysia spans ~1-7°N, so one
+# scale factor keeps nearest-neighbour distances honest to well under 1%.
+_LON_SCALE = math.cos(math.radians(4.0))
+
+
+def _norm(text: Optional[str]) -> str:
+    return " ".join(str(text or "").split()).casefold()
+
+
+def parse_query(query: str) -> Tuple[str, str, str]:
+    """Split a geocode query into normalised (building, subarea, state).
+
+    Missing leading parts come back as "" (a two-part query is subarea + state).
+    """
+    parts = [p.strip() for p in str(query or "").split(",") if p.strip()]
+    if parts and parts[-1].casefold() == "malaysia":
+        parts = parts[:-1]
+    if not parts:
+        return "", "", ""
+    state = parts[-1]
+    subarea = parts[-2] if len(parts) >= 2 else ""
+    building = ", ".join(parts[:-2])
+    return _norm(building), _norm(subarea), _norm(state)
+
+
+class Place(NamedTuple):
+    subarea: str  # "" for a state-level point
+    state: str
+    latitude: float
+    longitude: float
+
+
+class _Mean:
+    __slots__ = ("lat", "lon", "n")
+
+    def __init__(self):
+        self.lat = self.lon = 0.0
+        self.n = 0
+
+    def add(self, lat: float, lon: float) -> None:
+        self.lat += lat
+        self.lon += lon
+        self.n += 1
+
+    def coords(self) -> Coords:
+        return (self.lat / self.n, self.lon / self.n)
+
+
+class KDTree:
+    """Static 2-d tree over Places for nearest-neighbour queries.
+
+    Built once (O(n log n)); a query visits O(log n) nodes on typical data.
+    Points are projected to (lat, lon * cos 4°) so squared distances compare
+    like ground distances.
+    """
+
+    def __init__(self, places: Iterable[Place]):
+        pts = [((p.latitude, p.longitude * _LON_SCALE), p) for p in places]
+        self._root = self._build(pts, 0)
+        self.size = len(pts)
+
+    def _build(self, pts: list, depth: int):
+        if not pts:
+            return None
+        axis = depth % 2
+        pts.sort(key=lambda item: item[0][axis])
+        mid = len(pts) // 2
+        return (pts[mid], axis,
+                self._build(pts[:mid], depth + 1),
+                self._build(pts[mid + 1:], depth + 1))
+
+    def nearest(self, lat: float, lon: float) -> Optional[Place]:
+        if self._root is None:
+            return None
+        target = (lat, lon * _LON_SCALE)
+        best: List = [None, math.inf]
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            (point, place), axis, left, right = node
+            d = (point[0] - target[0]) ** 2 + (point[1] - target[1]) ** 2
+            if d < best[1]:
+                best[:] = [place, d]
+            diff = target[axis] - point[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            # Visit the far side only if the splitting plane is closer than the best.
+            if diff * diff < best[1]:
+                stack.append(far)
+            stack.append(near)
+        return best[0]
+
+
+class OfflineGeocoder:
+    """Centroid table over cached geocodes + gazetteer. Read-only once built."""
+
+    def __init__(self):
+        self._buildings: Dict[Tuple[str, str], _Mean] = {}
+        self._subareas: Dict[Tuple[str, str], _Mean] = {}
+        self._states: Dict[str, Coords] = {}
+        self._labels: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        self._tree: Optional[KDTree] = None
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def build(cls, cache_items: Iterable[Tuple[str, List]] = (),
+              gazetteer: Optional[Path] = None) -> "OfflineGeocoder":
+        """Build from (query, [lat, lon]) pairs and the gazetteer CSV (if present)."""
+        table = cls()
+        for query, coords in cache_items:
+            if coords and coords[0] is not None:
+                table.add(query, coords[0], coords[1])
+        if gazetteer is not None and gazetteer.exists():
+            table.load_gazetteer(gazetteer)
+        table._tree = KDTree(table.places())
+        logger.info(
+            f"Offline geocoder: {len(table._subareas)} subareas, "
+            f"{len(table._buildings)} buildings, {len(table._states)} states"
+        )
+        return table
+
+    def add(self, query: str, lat: float, lon: float) -> None:
+        """Fold one resolved query into the building and subarea means."""
+        building, subarea, state = parse_query(query)
+        if not state:
+            return
+        if subarea:
+            self._subareas.setdefault((subarea, state), _Mean()).add(lat, lon)
+            self._labels.setdefault((subarea, state), _labels_of(query))
+        if building:
+            self._buildings.setdefault((building, state), _Mean()).add(lat, lon)
+
+    def load_gazetteer(self, path: Path) -> None:
+        """Read `state,region,latitude,longitude` rows (blank region = state point)."""
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                try:
+                    lat, lon = float(row["latitude"]), float(row["longitude"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                state, subarea = _norm(row.get("state")), _norm(row.get("region"))
+                if not state:
+                    continue
+                if subarea:
+                    # Measured data beats hand-entered rows: only fill gaps.
+                    if (subarea, state) not in self._subareas:
+                        mean = self._subareas[(subarea, state)] = _Mean()
+                        mean.add(lat, lon)
+                        self._labels[(subarea, state)] = (row["region"].strip(), row["state"].strip())
+                else:
+                    self._states[state] = (lat, lon)
+                    self._labels.setdefault(("", state), ("", row["state"].strip()))
+
+    def lookup(self, query: str) -> Optional[Coords]:
+        """Coordinates for `query` from the table, or None if it can't answer."""
+        building, subarea, state = parse_query(query)
+        found = None
+        if state:
+            if building and (building, state) in self._buildings:
+                found = self._buildings[(building, state)].coords()
+            elif subarea and (subarea, state) in self._subareas:
+                found = self._subareas[(subarea, state)].coords()
+            elif not subarea and not building:
+                found = self._states.get(state)
+        if found is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return found
+
+    def places(self) -> List[Place]:
+        """Every subarea centroid and state point, with display labels."""
+        out = []
+        for key, mean in self._subareas.items():
+            lat, lon = mean.coords()
+            label_sub, label_state = self._labels.get(key, key)
+            out.append(Place(label_sub, label_state, lat, lon))
+        for state, (lat, lon) in self._states.items():
+            out.append(Place("", self._labels.get(("", state), ("", state))[1], lat, lon))
+        return out
+
+    def reverse(self, lat: float, lon: float) -> Optional[Place]:
+        """Nearest known subarea (or state point) to (lat, lon)."""
+        if self._tree is None:
+            self._tree = KDTree(self.places())
+        return self._tree.nearest(lat, lon)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def _labels_of(query: str) -> Tuple[str, str]:
+    """Original-case (subarea, state) of a query, for display."""
+    parts = [p.strip() for p in query.split(",") if p.strip()]
+    if parts and parts[-1].casefold() == "malaysia":
+        parts = parts[:-1]
+    return (parts[-2] if len(parts) >= 2 else "", parts[-1] if parts else "")
+
+
+def from_cache(cache) -> OfflineGeocoder:
+    """Build the table from a GeoCache or dict plus the bundled gazetteer."""
+    return OfflineGeocoder.build(cache.items(), config.GEO_GAZETTEER_FILE)
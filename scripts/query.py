@@ -0,0 +1,170 @@
+"""Read-side API over the listings DB, for notebooks and dashboards.
+
+    from scripts import query
+    conn = query.connect()
+    query.listings(conn, state="Selangor", cpi="Condominium", max_rent=2500)
+    query.rent_percentiles(conn, "Selangor", cpi="Condominium")
+    query.weekly_summary(conn, "Selangor", region="Shah Alam")
+
+Every query is shaped to be answered from an index — idx_summary_group,
+idx_query_cpi_rent and idx_query_status_rent on the properties table
+(load_to_db.CREATE_INDEXES_SQL), idx_summary_key on rent_summary — and
+tests/test_query.py pins each plan with EXPLAIN QUERY PLAN, so they stay
+index-driven as the table grows. A listings() call filtering on none of
+state, CPI, rent or status is the one exception: it reads the whole table.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import config
+
+import sqlite3
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Columns listings() returns, in order.
+LISTING_COLUMNS = [
+    "ads_id", "monthly_rent", "state", "region", "CPI", "rooms", "bathroom", "size",
+    "address", "latitude", "longitude", "availability_status", "scrape_date", "adviewUrl",
+]
+
+DEFAULT_PERCENTILES = (25, 50, 75)
+
+# Rent columns weekly_summary() returns after the counts.
+WEEKLY_RENT_COLUMNS = ["mean_rent", "mean_rent_psf", "median_rent_wavg"]
+
+
+def connect(db_file: Optional[Path] = None) -> sqlite3.Connection:
+    """Open the DB read-only."""
+    return sqlite3.connect(f"file:{db_file or config.DB_FILE}?mode=ro", uri=True)
+
+
+def _listings_sql(state: Optional[str] = None, region: Optional[str] = None,
+                  cpi: Optional[str] = None, rooms: Optional[str] = None,
+                  min_rent: Optional[float] = None, max_rent: Optional[float] = None,
+                  status: Optional[str] = None,
+                  limit: Optional[int] = None) -> Tuple[str, List]:
+    if region is not None and state is None:
+        # Region names repeat across states, and the area index leads with state.
+        raise ValueError("Filtering by region needs a state as well.")
+    # Most listings are active, so status only drives the index when nothing
+    # more selective is given; otherwise the unary + makes it a plain filter.
+    status_col = "+availability_status" if state is not None or cpi is not None else "availability_status"
+    where, params = [], []
+    for col, value in (("state", state), ("region", region), ("CPI", cpi),
+                       ("rooms", rooms), (status_col, status)):
+        if value is not None:
+            where.append(f"{col} = ?")
+            params.append(value)
+    if min_rent is not None:
+        where.append("monthly_rent >= ?")
+        params.append(min_rent)
+    if max_rent is not None:
+        where.append("monthly_rent <= ?")
+        params.append(max_rent)
+    sql = f"SELECT {', '.join(LISTING_COLUMNS)} FROM {config.DB_TABLE}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    # Unary + keeps the planner from picking an index just to skip this sort; the
+    # filters decide the index, and the matching rows are sorted afterwards.
+    sql += " ORDER BY +monthly_rent, ads_id"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    return sql, params
+
+
+def listings(conn: sqlite3.Connection, state: Optional[str] = None,
+             region: Optional[str] = None, cpi: Optional[str] = None,
+             rooms: Optional[str] = None, min_rent: Optional[float] = None,
+             max_rent: Optional[float] = None, status: Optional[str] = None,
+             limit: Optional[int] = None) -> pd.DataFrame:
+    """Listings matching every given filter, cheapest first (LISTING_COLUMNS).
+
+    rent bounds are inclusive; status is an availability_status ('active',
+    'rented', 'expired'); region requires state.
+    """
+    sql, params = _listings_sql(state, region, cpi, rooms, min_rent, max_rent, status, limit)
+    return pd.read_sql_query(sql, conn, params=params)
+
+
+def _percentiles_sql(state: str, cpi: Optional[str] = None,
+                     rooms: Optional[str] = None,
+                     status: Optional[str] = "active") -> Tuple[str, List]:
+    # Only state is an index term: the unary + keeps the planner from driving the
+    # scan with a nationwide index (status, CPI) instead; the other filters are
+    # checked inside idx_summary_group, which also covers region and rent.
+    where, params = ["state = ?", "+monthly_rent IS NOT NULL"], [state]
+    for col, value in (("CPI", cpi), ("rooms", rooms), ("availability_status", status)):
+        if value is not None:
+            where.append(f"+{col} = ?")
+            params.append(value)
+    sql = (f"SELECT region, monthly_rent FROM {config.DB_TABLE} "
+           f"WHERE {' AND '.join(where)}")
+    return sql, params
+
+
+def rent_percentiles(conn: sqlite3.Connection, state: str, cpi: Optional[str] = None,
+                     rooms: Optional[str] = None, status: Optional[str] = "active",
+                     percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> pd.DataFrame:
+    """Monthly-rent percentiles per region of a state.
+
+    One row per region (index), columns `listings` and `p<N>` per percentile.
+    Only listings with a rent count; status=None includes gone listings too.
+    """
+    sql, params = _percentiles_sql(state, cpi, rooms, status)
+    df = pd.read_sql_query(sql, conn, params=params)
+    columns = ["listings"] + [f"p{p:g}" for p in percentiles]
+    if df.empty:
+        return pd.DataFrame(columns=columns, index=pd.Index([], name="region"))
+    grouped = df.groupby("region", dropna=False)["monthly_rent"]
+    out = grouped.quantile([p / 100 for p in percentiles]).unstack()
+    out.columns = columns[1:]
+    out.insert(0, "listings", grouped.size())
+    return out.sort_index()
+
+
+def _weekly_sql(state: str, region: Optional[str] = None, cpi: Optional[str] = None,
+                since: Optional[str] = None) -> Tuple[str, List]:
+    where, params = ["state = ?"], [state]
+    for col, value in (("region", region), ("CPI", cpi)):
+        if value is not None:
+            where.append(f"{col} = ?")
+            params.append(value)
+    if since is not None:
+        where.append("scrape_week >= ?")
+        params.append(since)
+    sql = (f"SELECT scrape_week, listings, active, rented, expired, rent_sum, rent_count, "
+           f"psf_sum, psf_count, median_rent, region, CPI, rooms "
+           f"FROM {config.SUMMARY_TABLE} WHERE {' AND '.join(where)}")
+    return sql, params
+
+
+def weekly_summary(conn: sqlite3.Connection, state: str, region: Optional[str] = None,
+                   cpi: Optional[str] = None, since: Optional[str] = None) -> pd.DataFrame:
+    """Per-week rollup of the rent_summary groups matching the filters.
+
+    Counts are summed, and `mean_rent` / `mean_rent_psf` are exact: the groups'
+    stored sums over their counts of rows with a rent (and a size). Medians
+    cannot be combined exactly, so there is no weekly median —
+    `median_rent_wavg` is the group medians' mean, weighted by the rows each
+    covers. since is a 'YYYY-MM-DD' week start.
+    """
+    sql, params = _weekly_sql(state, region, cpi, since)
+    df = pd.read_sql_query(sql, conn, params=params)
+    counts = ["listings", "active", "rented", "expired"]
+    if df.empty:
+        return pd.DataFrame(columns=counts + WEEKLY_RENT_COLUMNS,
+                            index=pd.Index([], name="scrape_week"))
+
+    weeks = df.groupby("scrape_week")
+    sums = weeks[["rent_sum", "rent_count", "psf_sum", "psf_count"]].sum()
+    out = weeks[counts].sum()
+    out["mean_rent"] = sums["rent_sum"] / sums["rent_count"].replace(0, np.nan)
+    out["mean_rent_psf"] = sums["psf_sum"] / sums["psf_count"].replace(0, np.nan)
+    weighted = (df["median_rent"] * df["rent_count"]).groupby(df["scrape_week"]).sum(min_count=1)
+    out["median_rent_wavg"] = weighted / sums["rent_count"].replace(0, np.nan)
+    return out.sort_index()
@@ -9,6 +9,10 @@ When a listing disappears it's classified using `ad_expiry`:
 Maintains in-place columns on the `properties` table: first_seen, last_checked_at,
 availability_status, gone_at.
 
+`--mode sweep` first credits listings the latest scrape saw (every scraped window
+records its ids in config.SIGHTINGS_TABLE) and only probes the rest — after a
+full scrape that is typically the few percent that actually left the market.
+
 Optional, standalone pass — NOT part of run_pipeline.py. Back up the DB first:
     cp data/mudah_rent.db data/mudah_rent.db.bak
 """
@@ -19,20 +23,23 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 import config
 import logging
 import scripts.logger  # noqa: F401  — configures root handlers
+from scripts import aggregates
 from scripts import mudah_api
 from scripts import load_to_db
+from scripts import watermarks
 
 logger = logging.getLogger("recheck")
 
-import time
-import random
 import argparse
 import sqlite3
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, date
+from itertools import islice
 from typing import Optional
 from tqdm import tqdm
 
 _DATE_FMT = "%Y-%m-%d"
+RECHECK_MODES = ("probe", "sweep")
 
 
 def _parse_date(value: Optional[str]) -> Optional[date]:
@@ -84,69 +91,247 @@ def classify_gone(ad_expiry: Optional[str], today: date) -> str:
     return "expired"
 
 
-def recheck(limit: Optional[int] = None):
+def covered_by_sighting(first_seen: Optional[str], last_checked_at: Optional[str],
+                        seen_date: Optional[str], today: date) -> bool:
+    """True when a scrape sighting already proves the listing live recently enough.
+
+    The sighting must be newer than the last check and, taken as a check, leave
+    the listing not due under the decay policy — otherwise it still needs a probe.
+    """
+    if not seen_date:
+        return False
+    if last_checked_at and str(seen_date)[:10] <= str(last_checked_at)[:10]:
+        return False
+    return not due_for_check(first_seen, seen_date, today)
+
+
+def _jd(col: str) -> str:
+    """julianday() of a date column's YYYY-MM-DD prefix (NULL if unparseable)."""
+    return f"julianday(substr({col}, 1, 10))"
+
+
+def _interval_sql(first_seen_col: str) -> str:
+    """config.RECHECK_DECAY as a CASE over listing age, mirroring due_for_check."""
+    # Missing/unparseable first_seen counts as seen today (age 0), like _parse_date.
+    age = f"(julianday(:today) - COALESCE({_jd(first_seen_col)}, julianday(:today)))"
+    whens = " ".join(
+        f"WHEN {age} < {age_lt} THEN {days}"
+        for age_lt, days in config.RECHECK_DECAY if age_lt is not None
+    )
+    default = config.RECHECK_DECAY[-1][1]
+    return f"(CASE {whens} ELSE {default} END)" if whens else f"({default})"
+
+
+def due_sql(first_seen_col: str = "first_seen",
+            last_checked_col: str = "last_checked_at") -> str:
+    """SQL predicate equivalent to due_for_check; binds the named param :today (YYYY-MM-DD)."""
+    last = _jd(last_checked_col)
+    return (
+        f"({last_checked_col} IS NULL OR {last} IS NULL "
+        f"OR julianday(:today) - {last} >= {_interval_sql(first_seen_col)})"
+    )
+
+
+def overdue_sql(first_seen_col: str = "first_seen",
+                last_checked_col: str = "last_checked_at") -> str:
+    """Days past due (never-checked rows sort first via a large sentinel)."""
+    last = _jd(last_checked_col)
+    return (
+        f"COALESCE(julianday(:today) - {last} - {_interval_sql(first_seen_col)}, 1e9)"
+    )
+
+
+def _covered_sql() -> str:
+    """SQL twin of covered_by_sighting over p (properties) / s (sightings)."""
+    return (
+        "(s.seen_date IS NOT NULL "
+        "AND (p.last_checked_at IS NULL OR p.last_checked_at = '' "
+        "     OR substr(s.seen_date, 1, 10) > substr(p.last_checked_at, 1, 10)) "
+        f"AND NOT {due_sql('p.first_seen', 's.seen_date')})"
+    )
+
+
+_ACTIVE_SQL = ("(p.availability_status IS NULL "
+               "OR p.availability_status NOT IN ('rented', 'expired'))")
+
+
+def select_due(conn: sqlite3.Connection, today: date, limit: Optional[int] = None) -> list:
+    """Due, non-terminal listings as (ads_id, ad_expiry), most overdue first.
+
+    The decay policy runs in SQL, so only due rows leave SQLite and `limit` keeps
+    the most valuable ones: never-checked first, then by days past due.
+    """
+    sql = (
+        f"SELECT p.ads_id, p.ad_expiry FROM {config.DB_TABLE} p "
+        f"WHERE {_ACTIVE_SQL} AND {due_sql('p.first_seen', 'p.last_checked_at')} "
+        f"ORDER BY {overdue_sql('p.first_seen', 'p.last_checked_at')} DESC, p.first_seen DESC"
+    )
+    params = {"today": today.strftime(_DATE_FMT)}
+    if limit:
+        sql += " LIMIT :limit"
+        params["limit"] = limit
+    return conn.execute(sql, params).fetchall()
+
+
+def recheck(limit: Optional[int] = None, mode: str = "probe",
+            workers: Optional[int] = None, commit_every: Optional[int] = None):
+    """Re-check due listings.
+
+    mode="probe": one `lookup` per due listing.
+    mode="sweep": listings the latest scrape saw (config.SIGHTINGS_TABLE) are
+    marked live from that sighting with no API call; only the rest are probed.
+    Per-id probing is the only fallback — the endpoint ignores multi-id lookups.
+
+    Due listings are selected in SQL (select_due), most overdue first, so `limit`
+    caps the run at the listings that most need a check.
+
+    Probes run on `workers` threads (default config.RECHECK_WORKERS) under the
+    shared API rate limiter; results are written by this thread in transactions
+    of `commit_every` rows (default config.RECHECK_COMMIT_EVERY).
+    """
+    if mode not in RECHECK_MODES:
+        raise ValueError(f"Unknown recheck mode {mode!r}. Known: {RECHECK_MODES}")
+    workers = workers or config.RECHECK_WORKERS
     conn = sqlite3.connect(config.DB_FILE)
     load_to_db.ensure_schema(conn)
-
-    rows = conn.execute(
-        f"""
-        SELECT ads_id, first_seen, last_checked_at, ad_expiry
-        FROM {config.DB_TABLE}
-        WHERE availability_status IS NULL
-           OR availability_status NOT IN ('rented', 'expired')
-        """
-    ).fetchall()
+    conn.execute(load_to_db.RECHECK_INDEX_SQL)
+    conn.execute(watermarks.CREATE_SIGHTINGS_SQL)
 
     today = date.today()
-    due = [r for r in rows if due_for_check(r[1], r[2], today)]
-    if limit:
-        due = due[:limit]
+    today_str = today.strftime(_DATE_FMT)
+
+    if mode == "sweep":
+        with conn:
+            cur = conn.execute(
+                f"""
+                UPDATE {config.DB_TABLE}
+                SET last_checked_at = (
+                    SELECT substr(seen_date, 1, 10) FROM {config.SIGHTINGS_TABLE}
+                    WHERE ads_id = {config.DB_TABLE}.ads_id)
+                WHERE ads_id IN (
+                    SELECT p.ads_id FROM {config.DB_TABLE} p
+                    JOIN {config.SIGHTINGS_TABLE} s ON s.ads_id = p.ads_id
+                    WHERE {_ACTIVE_SQL}
+                      AND {due_sql('p.first_seen', 'p.last_checked_at')}
+                      AND {_covered_sql()})
+                """,
+                {"today": today_str},
+            )
+        covered = cur.rowcount
+
+    due = select_due(conn, today, limit=limit)
+
+    if mode == "sweep":
+        logger.info(
+            f"Sweep: {covered} due listings confirmed live by scrape sightings "
+            f"— {covered} probes saved; {len(due)} left to probe."
+        )
 
     if not due:
         logger.info("No listings due for re-check.")
         conn.close()
         return
 
-    logger.info(f"Re-checking {len(due)} of {len(rows)} active listings.")
-    today_str = today.strftime(_DATE_FMT)
-    alive = gone = failed = 0
+    logger.info(f"Re-checking {len(due)} due listings with {workers} workers.")
+    writer = _ResultWriter(conn, today, commit_every or config.RECHECK_COMMIT_EVERY)
+    failed = 0
 
-    for ads_id, first_seen, last_checked_at, ad_expiry in tqdm(due, desc="Re-checking"):
-        try:
-            data = mudah_api.lookup(ads_id)
-        except Exception as e:
-            failed += 1
-            logger.warning(f"Lookup failed for {ads_id}: {e}")
-            time.sleep(random.uniform(config.API_MIN_DELAY, config.API_MAX_DELAY))
-            continue
-
-        if data:
-            conn.execute(
-                f"""UPDATE {config.DB_TABLE}
-                    SET last_checked_at = ?
-                    WHERE ads_id = ?""",
-                (today_str, ads_id),
-            )
-            alive += 1
-        else:
-            status = classify_gone(ad_expiry, today)
-            conn.execute(
-                f"""UPDATE {config.DB_TABLE}
-                    SET availability_status = ?, gone_at = ?, last_checked_at = ?
-                    WHERE ads_id = ?""",
-                (status, today_str, today_str, ads_id),
-            )
-            gone += 1
+    def _probe(row):
+        return row, mudah_api.lookup(row[0])
 
-        conn.commit()
-        time.sleep(random.uniform(config.API_MIN_DELAY, config.API_MAX_DELAY))
+    # Workers only do I/O (pacing comes from the shared API limiter); this thread
+    # is the single DB writer. At most 2 * workers lookups are in flight, so an
+    # error or Ctrl-C only waits for those, and every finished result is flushed.
+    workers = max(workers, 1)
+    rows = iter(due)
+    pool = ThreadPoolExecutor(max_workers=workers)
+    progress = tqdm(total=len(due), desc="Re-checking")
+    pending = {pool.submit(_probe, row): row[0] for row in islice(rows, 2 * workers)}
+    try:
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                list_id = pending.pop(fut)
+                progress.update()
+                row = next(rows, None)
+                if row is not None:
+                    pending[pool.submit(_probe, row)] = row[0]
+                try:
+                    (ads_id, ad_expiry), data = fut.result()
+                except Exception as e:
+                    failed += 1
+                    logger.warning(f"Lookup failed for {list_id}: {e}")
+                    continue
+                writer.add(ads_id, bool(data), ad_expiry)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        progress.close()
+        writer.flush()
+    # Status changes move listings between the active/rented/expired counts.
+    aggregates.refresh(conn)
 
     conn.close()
-    logger.info(f"Done. Still active: {alive}, gone: {gone}, failed: {failed}.")
+    logger.info(f"Done. Still active: {writer.alive}, gone: {writer.gone}, failed: {failed}.")
+    logger.info(f"API client: {mudah_api.client_stats()}")
+    mudah_api.save_rate_state()
+
+
+class _ResultWriter:
+    """Buffers probe results and applies them with executemany, N rows per transaction.
+
+    Progress is durable every `commit_every` results, so a crash loses at most that
+    many checks (those listings are simply due again next run).
+    """
+
+    def __init__(self, conn: sqlite3.Connection, today: date, commit_every: int):
+        self.conn = conn
+        self.today = today
+        self.today_str = today.strftime(_DATE_FMT)
+        self.commit_every = max(commit_every, 1)
+        self._alive: list = []
+        self._gone: list = []
+        self.alive = self.gone = 0
+
+    def add(self, ads_id: str, live: bool, ad_expiry: Optional[str]) -> None:
+        if live:
+            self._alive.append((self.today_str, ads_id))
+            self.alive += 1
+        else:
+            status = classify_gone(ad_expiry, self.today)
+            self._gone.append((status, self.today_str, self.today_str, ads_id))
+            self.gone += 1
+        if len(self._alive) + len(self._gone) >= self.commit_every:
+            self.flush()
+
+    def flush(self) -> None:
+        with self.conn:  # one transaction per batch
+            if self._alive:
+                self.conn.executemany(
+                    f"""UPDATE {config.DB_TABLE}
+                        SET last_checked_at = ?
+                        WHERE ads_id = ?""",
+                    self._alive,
+                )
+            if self._gone:
+                self.conn.executemany(
+                    f"""UPDATE {config.DB_TABLE}
+                        SET availability_status = ?, gone_at = ?, last_checked_at = ?
+                        WHERE ads_id = ?""",
+                    self._gone,
+                )
+        self._alive, self._gone = [], []
 
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser(description="Re-check listing availability.")
     ap.add_argument("--limit", type=int, default=None, help="Max listings to check (for testing).")
+    ap.add_argument("--mode", choices=RECHECK_MODES, default="probe",
+                    help="probe: lookup every due listing. sweep: trust sightings from "
+                         "the latest scrape, lookup only the listings it didn't see.")
+    ap.add_argument("--workers", type=int, default=config.RECHECK_WORKERS,
+                    help="Concurrent lookups (they share the API rate limiter).")
+    ap.add_argument("--commit-every", type=int, default=config.RECHECK_COMMIT_EVERY,
+                    help="Results written per DB transaction.")
     args = ap.parse_args()
-    recheck(limit=args.limit)
+    recheck(limit=args.limit, mode=args.mode, workers=args.workers,
+            commit_every=args.commit_every)
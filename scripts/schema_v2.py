@@ -0,0 +1,167 @@
+"""Compact v2 layout of the properties table, exported on demand to its own DB file.
+
+v1 `properties` stores every value as TEXT or REAL on every row — ids, dates and
+a dozen long repeated strings. v2 (`properties_v2`) is the same listings in
+integer form:
+
+  - ads_id INTEGER PRIMARY KEY (the rowid itself — no separate PK index);
+  - property_type_id / subarea_id as INTEGER;
+  - dates as integer days since 1970-01-01 (`*_day`), ad_expiry as epoch seconds;
+  - low-cardinality strings (state, region, CPI, rooms, ...) as ids into one
+    `lk_<column>(id, name)` lookup table each, referenced as `<column>_code`.
+
+`properties_v2_view` decodes it back to v1's column names and formats, so
+analytical queries can switch tables without changing shape.
+
+v1 stays the table the pipeline writes and reads (upsert, recheck, dedup, known
+ids); nothing keeps v2 in sync. export() writes a fresh copy into a separate
+file (config.DB_V2_FILE) in one set-based pass — the main DB doesn't grow, and
+each export rebuilds the lookup tables, so names gone from v1 go from them too.
+Run it before an analysis session that wants the smaller table:
+
+    python scripts/schema_v2.py            # config.DB_FILE -> config.DB_V2_FILE
+
+Rows whose ads_id is not all digits (never the case for Mudah list_ids) are
+not exported.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import config
+import logging
+import scripts.logger  # noqa: F401  — configures root handlers
+
+logger = logging.getLogger("schema_v2")
+
+import argparse
+import sqlite3
+from typing import List, Optional
+
+V2_TABLE = "properties_v2"
+V2_VIEW = "properties_v2_view"
+
+# Dictionary-encoded columns: each gets lk_<column>(id, name) and <column>_code in v2.
+# (_code, not _id: property_type_id is already a v1 column.)
+LOOKUP_COLUMNS = [
+    "property_type", "category_id", "CPI", "state", "region", "rooms", "bathroom",
+    "company_ad", "ad_seller_type", "store_verified", "availability_status",
+]
+INTEGER_COLUMNS = ["property_type_id", "subarea_id"]
+REAL_COLUMNS = ["monthly_rent", "size", "latitude", "longitude"]
+TEXT_COLUMNS = ["address", "seller_name", "adviewUrl"]
+# 'YYYY-MM-DD' (or datetime) text -> days since the epoch.
+DAY_COLUMNS = ["scrape_date", "first_seen", "last_checked_at", "gone_at"]
+
+_UNIX_EPOCH_JD = 2440587.5
+_DIGITS = "{x} GLOB '[0-9]*' AND {x} NOT GLOB '*[^0-9]*'"
+
+
+def _lookup(col: str) -> str:
+    return f"lk_{col.lower()}"
+
+
+def _day(expr: str) -> str:
+    return f"CAST(julianday({expr}) - {_UNIX_EPOCH_JD} AS INTEGER)"
+
+
+def _encoded(src: str) -> List[str]:
+    """v2 column values for the v1 row aliased `src`."""
+    c = lambda col: f"{src}.{col}"  # noqa: E731
+    values = [f"CAST({c('ads_id')} AS INTEGER)"]
+    values += [c(col) for col in REAL_COLUMNS]
+    values += [f"CASE WHEN {c(col)} GLOB '[0-9]*' THEN CAST({c(col)} AS INTEGER) END"
+               for col in INTEGER_COLUMNS]
+    values += [f"(SELECT id FROM {_lookup(col)} WHERE name = {c(col)})" for col in LOOKUP_COLUMNS]
+    values += [c(col) for col in TEXT_COLUMNS]
+    values += [_day(c(col)) for col in DAY_COLUMNS]
+    # clean.py writes publishedDatetime as mm/dd/YYYY.
+    p = c("publishedDatetime")
+    values.append(_day(f"substr({p}, 7, 4) || '-' || substr({p}, 1, 2) || '-' || substr({p}, 4, 2)"))
+    values.append(f"CAST(strftime('%s', {c('ad_expiry')}) AS INTEGER)")
+    values.append(c("content_hash"))
+    return values
+
+
+def _v2_columns() -> List[str]:
+    return (["ads_id"] + REAL_COLUMNS + INTEGER_COLUMNS
+            + [f"{col}_code" for col in LOOKUP_COLUMNS] + TEXT_COLUMNS
+            + [f"{col}_day" for col in DAY_COLUMNS]
+            + ["published_day", "ad_expiry_ts", "content_hash"])
+
+
+def create_sql() -> List[str]:
+    """DDL for the lookup tables, properties_v2 and the decoding view (idempotent)."""
+    statements = [
+        f"CREATE TABLE IF NOT EXISTS {_lookup(col)} "
+        f"(id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);"
+        for col in LOOKUP_COLUMNS
+    ]
+    types = (["INTEGER PRIMARY KEY"] + ["REAL"] * len(REAL_COLUMNS)
+             + ["INTEGER"] * len(INTEGER_COLUMNS)
+             + [f"INTEGER REFERENCES {_lookup(col)}(id)" for col in LOOKUP_COLUMNS]
+             + ["TEXT"] * len(TEXT_COLUMNS)
+             + ["INTEGER"] * (len(DAY_COLUMNS) + 3))
+    columns = ",\n    ".join(f"{name:<25}{t}" for name, t in zip(_v2_columns(), types))
+    statements.append(f"CREATE TABLE IF NOT EXISTS {V2_TABLE} (\n    {columns}\n);")
+
+    decoded = ["CAST(v.ads_id AS TEXT) AS ads_id"]
+    decoded += [f"v.{col}" for col in REAL_COLUMNS]
+    decoded += [f"CAST(v.{col} AS TEXT) AS {col}" for col in INTEGER_COLUMNS]
+    decoded += [f"{_lookup(col)}.name AS {col}" for col in LOOKUP_COLUMNS]
+    decoded += [f"v.{col}" for col in TEXT_COLUMNS]
+    decoded += [f"date(v.{col}_day * 86400, 'unixepoch') AS {col}" for col in DAY_COLUMNS]
+    decoded.append("strftime('%m/%d/%Y', v.published_day * 86400, 'unixepoch') AS publishedDatetime")
+    decoded.append("datetime(v.ad_expiry_ts, 'unixepoch') AS ad_expiry")
+    decoded.append("v.content_hash")
+    joins = "\n".join(
+        f"LEFT JOIN {_lookup(col)} ON {_lookup(col)}.id = v.{col}_code" for col in LOOKUP_COLUMNS
+    )
+    statements.append(
+        f"CREATE VIEW IF NOT EXISTS {V2_VIEW} AS\nSELECT " + ",\n       ".join(decoded)
+        + f"\nFROM {V2_TABLE} v\n{joins};"
+    )
+    return statements
+
+
+def export(db_file: Optional[Path] = None, out_file: Optional[Path] = None) -> int:
+    """Write v2 of db_file's listings to out_file, replacing it. Returns rows exported.
+
+    Built in a temporary file next to out_file and moved into place once
+    complete, so readers never see a half-written export.
+    """
+    db_file = Path(db_file or config.DB_FILE)
+    out_file = Path(out_file or config.DB_V2_FILE)
+    tmp = out_file.with_name(out_file.name + ".tmp")
+    tmp.unlink(missing_ok=True)
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.execute("ATTACH DATABASE ? AS src", (str(db_file),))
+        for sql in create_sql():
+            conn.execute(sql)
+        source = f"src.{config.DB_TABLE}"
+        with conn:
+            for col in LOOKUP_COLUMNS:
+                conn.execute(
+                    f"INSERT INTO {_lookup(col)}(name) "
+                    f"SELECT DISTINCT {col} FROM {source} WHERE {col} IS NOT NULL"
+                )
+            cur = conn.execute(
+                f"INSERT INTO {V2_TABLE} ({', '.join(_v2_columns())})\n"
+                f"SELECT {', '.join(_encoded('p'))}\nFROM {source} p\n"
+                f"WHERE {_DIGITS.format(x='p.ads_id')}"
+            )
+        conn.execute("DETACH DATABASE src")
+    finally:
+        conn.close()
+    tmp.replace(out_file)
+    return cur.rowcount
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Export the properties table into the compact v2 layout.")
+    ap.add_argument("--db", type=Path, default=config.DB_FILE)
+    ap.add_argument("--out", type=Path, default=config.DB_V2_FILE)
+    args = ap.parse_args()
+    rows = export(args.db, args.out)
+    logger.info(f"Exported {rows} rows into {V2_TABLE} in {args.out}.")
@@ -4,132 +4,316 @@ Fetches property rental listings via Mudah's public search API,
 geocodes the resulting addresses, and writes a CSV.
 """
 import sys
-import sqlite3
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 import config
 import logging
 import scripts.logger  # noqa: F401  — configures root handlers
-from scripts import mudah_api
+from scripts import geocoder as geocoders, mudah_api, offline_geocoder, watermarks
+from scripts.geocache import GeoCache
+from scripts.geocode_worker import GeocodeWorker
+from scripts.known_ids import KnownIds
 
 logger = logging.getLogger("webscrape")
 
 import re
-import json
+import asyncio
+import threading
 import pandas as pd
 from tqdm import tqdm
-from typing import List, Tuple, Optional
-from geopy.geocoders import Nominatim
-from geopy.extra.rate_limiter import RateLimiter
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+from typing import Dict, Iterable, Iterator, List, Tuple, Optional
 from datetime import datetime
 
-_GEOLOCATOR = Nominatim(
-    user_agent=config.GEOLOCATOR_USER_AGENT,
-    timeout=config.GEOLOCATION_TIMEOUT,
-)
-_GEOCODE = RateLimiter(
-    _GEOLOCATOR.geocode,
-    min_delay_seconds=1,
-    max_retries=3,
-    error_wait_seconds=5,
-    swallow_exceptions=True,
-)
 
+class ScrapeError(RuntimeError):
+    """Some concurrent scrape windows failed; the rest completed.
 
-def _load_geocache() -> dict:
-    if config.GEO_CACHE_FILE.exists():
-        with open(config.GEO_CACHE_FILE, encoding="utf-8") as f:
-            return json.load(f)
-    return {}
+    `failures` is [(state, property type name, exception)]; `counts` maps each
+    state to its unique rows written (rows handed to the sink, with one).
+    """
 
+    def __init__(self, failures: List[Tuple[str, str, Exception]], counts: Dict[str, int]):
+        self.failures = failures
+        self.counts = counts
+        super().__init__(f"{len(failures)} scrape window(s) failed: " + "; ".join(
+            f"{state} / {name}: {e}" for state, name, e in failures
+        ))
 
-def _save_geocache(cache: dict) -> None:
-    with open(config.GEO_CACHE_FILE, "w", encoding="utf-8") as f:
-        json.dump(cache, f, ensure_ascii=False)
 
+def _load_geocache() -> GeoCache:
+    """Open the persistent geocode cache (migrates geocache.json on first use)."""
+    return GeoCache(config.GEO_CACHE_DB)
 
-def _load_known_ads_ids() -> set:
-    """Return set of ads_id strings already in DB. Empty set if DB missing or inaccessible."""
-    if not config.DB_FILE.exists():
-        return set()
-    try:
-        with sqlite3.connect(config.DB_FILE) as conn:
-            rows = conn.execute(f"SELECT ads_id FROM {config.DB_TABLE}").fetchall()
-        return {r[0] for r in rows}
-    except Exception as e:
-        logger.warning(f"Could not load known ads_ids from DB: {e}")
-        return set()
 
+def _save_geocache(cache) -> None:
+    """Persist `cache`. GeoCache commits each entry as it is stored, so this only
+    flushes and logs its counters; a plain dict (tests, ad hoc) is in-memory only."""
+    if isinstance(cache, GeoCache):
+        cache.flush()
+        logger.info(f"Geocache: {cache.stats()}")
 
-def geocode(query: str, cache: dict) -> Tuple[Optional[float], Optional[float]]:
-    """Geocode `query` with cache. Returns (None, None) on miss/fail."""
-    if not query:
-        return (None, None)
-    if query in cache:
-        return tuple(cache[query])
-    try:
-        location = _GEOCODE(query)
-    except (GeocoderTimedOut, GeocoderServiceError) as e:
-        logger.warning(f"Geocode error for {query!r}: {e}")
-        return (None, None)
-    if not location:
-        cache[query] = [None, None]
-        return (None, None)
-    result = (location.latitude, location.longitude)
-    cache[query] = list(result)
-    return result
 
+def _load_offline(cache) -> Optional[offline_geocoder.OfflineGeocoder]:
+    """Offline centroid table over `cache`, or None when config.GEO_OFFLINE is off."""
+    return offline_geocoder.from_cache(cache) if config.GEO_OFFLINE else None
 
-def scrape(state: str, max_pages: int = 500,
-           property_type_id: Optional[int] = None,
-           skip_known: bool = True) -> pd.DataFrame:
-    """Scrape rental listings for `state` (URL slug), paginating up to max_pages.
 
-    Pass property_type_id to scrape a single property type (its own depth window).
-    Pass skip_known=False to re-scrape listings already in the DB.
+def start_geocoder(geocache=None) -> GeocodeWorker:
+    """Background geocoder for one run, over the persisted cache unless one is given.
+
+    Cache misses are answered from the offline centroid table when it can;
+    only the rest are queued for the configured backend (config.GEOCODER_BACKEND),
+    in batches through its geocode_many.
+    """
+    cache = _load_geocache() if geocache is None else geocache
+    return GeocodeWorker(cache, geocode_many, offline=_load_offline(cache))
+
+
+def finish_geocoder(worker: GeocodeWorker) -> int:
+    """Drain `worker`, back-fill the CSVs it tracked and persist the cache.
+
+    Returns rows back-filled.
+    """
+    worker.close()
+    filled = worker.backfill()
+    _save_geocache(worker.cache)
+    offline = f"; offline table: {worker.offline.stats()}" if worker.offline else ""
+    backend = geocoders.get_geocoder()
+    logger.info(
+        f"Geocoded {worker.resolved} distinct new queries in the background "
+        f"via {backend.name} {backend.stats()} "
+        f"({worker.failed} failed); back-filled {filled} rows. "
+        f"Geocache holds {len(worker.cache)} entries{offline}"
+    )
+    return filled
+
+
+def _load_known_ads_ids() -> KnownIds:
+    """Return the index of ads_ids already in DB. Empty if DB missing or inaccessible.
+
+    Built once per run and shared across windows; persisted to
+    config.KNOWN_IDS_FILE (when set) so the next run only reads new rows.
+    """
+    return KnownIds.from_db(config.DB_FILE, config.DB_TABLE,
+                            index_file=config.KNOWN_IDS_FILE)
+
+
+def geocode_many(queries: Iterable[str], cache, offline=None) -> Dict[str, Tuple[Optional[float], Optional[float]]]:
+    """Geocode distinct `queries`: cache, then the `offline` table, then the backend.
+
+    Backend answers are stored in `cache` (authoritative misses as [None, None]);
+    offline answers are not — the table is derived from the cache. Queries the
+    backend could not answer this time map to (None, None) and stay uncached.
+    """
+    out: Dict[str, Tuple[Optional[float], Optional[float]]] = {}
+    todo = []
+    for query in dict.fromkeys(queries):
+        if not query:
+            continue
+        cached = cache.get(query)
+        if cached is not None:
+            out[query] = tuple(cached)
+            continue
+        found = offline.lookup(query) if offline is not None else None
+        if found is not None:
+            out[query] = found
+            continue
+        todo.append(query)
+    if todo:
+        answered = geocoders.get_geocoder().geocode_many(todo)
+        for query in todo:
+            if query not in answered:
+                out[query] = (None, None)
+                continue
+            found = answered[query]
+            cache[query] = list(found) if found is not None else [None, None]
+            out[query] = tuple(found) if found is not None else (None, None)
+    return out
+
+
+def geocode(query: str, cache, offline=None) -> Tuple[Optional[float], Optional[float]]:
+    """Geocode `query` with cache (a GeoCache or dict). Returns (None, None) on miss/fail.
+
+    With an `offline` table, a cache miss it can answer skips the backend (and
+    is not cached — the table is derived from the cache).
     """
+    if not query:
+        return (None, None)
+    return geocode_many([query], cache, offline)[query]
+
+
+def _region_for(state: str) -> Tuple[str, str]:
+    """Validate a state URL slug; return (state_key, Mudah region id)."""
     state_key = (state or "").strip().lower()
     if state_key not in config.REGION_CODES:
         raise ValueError(
             f"Unknown state {state_key!r}. Known: {sorted(config.REGION_CODES)}"
         )
-    region = config.REGION_CODES[state_key]
+    return state_key, config.REGION_CODES[state_key]
 
-    geocache = _load_geocache()
-    rows = []
-    today = datetime.now().strftime("%Y-%m-%d")
 
-    logger.info(f"Fetching listings: state={state_key} region={region} max_pages={max_pages} property_type_id={property_type_id}")
-    items = list(tqdm(
+# --- Streaming stages -------------------------------------------------------
+# fetch -> drop known -> transform -> geocode -> batch. Each stage is a generator
+# holding at most one item (the fetch holds API_PAGE_CONCURRENCY pages), so memory
+# stays flat however large a state's window is. With a GeocodeWorker the geocode
+# stage only reads the cache and queues misses, so it never waits on Nominatim.
+
+def _fetch(region: str, max_pages: int, property_type_id: Optional[int],
+           progress: bool, stop_before: Optional[int] = None,
+           tracker: Optional[watermarks.WindowTracker] = None) -> Iterator[Dict]:
+    def _set_total(total: int) -> None:
+        bar.total = total
+        bar.refresh()
+
+    bar = tqdm(
         mudah_api.iter_listings(
             region=region, max_pages=max_pages,
-            property_type_id=property_type_id,
+            property_type_id=property_type_id, on_total=_set_total,
+            stop_before=stop_before,
         ),
         desc="Fetching listings",
-        total=max_pages * config.API_PAGE_SIZE,
         unit=" listing",
-    ))
-    logger.info(f"API returned {len(items)} listings")
+        disable=not progress,
+    )
+    for item in bar:
+        if tracker is not None:
+            tracker.observe(item)
+        yield item
+    logger.info(f"API returned {bar.n} listings")
+
+
+def _drop_known(items: Iterable[Dict], known) -> Iterator[Dict]:
+    skipped = 0
+    for item in items:
+        if str(item.get("attributes", {}).get("list_id", "")) in known:
+            skipped += 1
+            continue
+        yield item
+    logger.info(f"Skipped {skipped} known listings.")
 
-    if skip_known:
-        known = _load_known_ads_ids()
-        if known:
-            before = len(items)
-            items = [i for i in items if str(i.get("attributes", {}).get("list_id", "")) not in known]
-            logger.info(f"Skipping {before - len(items)} known listings. {len(items)} to scrape.")
 
-    for item in tqdm(items, desc="Transform + geocode"):
+def _transform(items: Iterable[Dict], today: str) -> Iterator[Tuple[Dict, str]]:
+    """API item -> (CSV row, geocode query)."""
+    for item in items:
         row = mudah_api.to_csv_row(item)
         row["scrape_date"] = today
-        query = mudah_api.geocode_query(item.get("attributes", {}))
-        lat, lon = geocode(query, geocache)
+        yield row, mudah_api.geocode_query(item.get("attributes", {}))
+
+
+def _geocode_rows(pairs: Iterable[Tuple[Dict, str]], geocache: dict,
+                  geocoder: Optional[GeocodeWorker] = None) -> Iterator[Dict]:
+    for row, query in pairs:
+        if geocoder is not None:
+            lat, lon = geocoder.coords(query)
+        else:
+            lat, lon = geocode(query, geocache)
         row["latitude"] = lat
         row["longitude"] = lon
-        rows.append(row)
+        yield row
+
 
-    _save_geocache(geocache)
-    logger.info(f"Saved geocache with {len(geocache)} entries")
+def _batched(rows: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_row_batches(state: str, max_pages: int = 500,
+                     property_type_id: Optional[int] = None,
+                     skip_known: bool = True,
+                     geocache: Optional[dict] = None,
+                     batch_size: Optional[int] = None,
+                     progress: bool = True,
+                     known: Optional[KnownIds] = None,
+                     incremental: bool = False,
+                     full_sweep: bool = False,
+                     geocoder: Optional[GeocodeWorker] = None) -> Iterator[List[Dict]]:
+    """Stream one window's scraped rows in batches of `batch_size` row dicts.
+
+    Same rows as scrape(), but produced lazily (default batch size
+    config.SCRAPE_BATCH_SIZE). The caller owns `geocache` persistence; pass None
+    to geocode against an empty in-memory cache. With a `geocoder`, uncached
+    queries are queued to it and the rows are emitted without coordinates (the
+    caller back-fills them, see finish_geocoder). Pass a shared `known` index to
+    avoid rebuilding it per window; emitted ids are added to it, so later windows
+    skip listings this run already scraped.
+
+    incremental=True stops paging at the window's watermark (see
+    scripts/watermarks.py) unless a full sweep is due or `full_sweep` forces one.
+    Once the window has been read to the end its sightings are recorded (every
+    id returned, known or not — recheck's sweep mode uses them) and, when
+    incremental, its mark is advanced.
+    """
+    state_key, region = _region_for(state)
+    geocache = {} if geocache is None else geocache
+    now = datetime.now()
+    today = now.strftime("%Y-%m-%d")
+
+    stop_before = None
+    sweeping = True
+    if incremental:
+        with watermarks.connect() as conn:
+            mark = watermarks.get(conn, region, property_type_id)
+        sweeping = full_sweep or watermarks.needs_full_sweep(mark, now.date())
+        if not sweeping:
+            stop_before = mark.newest_list_id
+    tracker = watermarks.WindowTracker()
+
+    logger.info(f"Fetching listings: state={state_key} region={region} max_pages={max_pages} "
+                f"property_type_id={property_type_id} "
+                f"mode={'full' if sweeping else f'incremental (> {stop_before})'}")
+    items = _fetch(region, max_pages, property_type_id, progress, stop_before, tracker)
+    if skip_known:
+        if known is None:
+            known = _load_known_ads_ids()
+        items = _drop_known(items, known)
+    rows = _geocode_rows(_transform(items, today), geocache, geocoder)
+    for batch in _batched(rows, batch_size or config.SCRAPE_BATCH_SIZE):
+        yield batch
+        if known is not None:
+            known.update(row["ads_id"] for row in batch)
+
+    with watermarks.connect() as conn:
+        watermarks.record_sightings(conn, region, property_type_id, tracker, now.date())
+        if incremental:
+            watermarks.record(conn, region, property_type_id, tracker, sweeping, now.date())
+
+
+def scrape(state: str, max_pages: int = 500,
+           property_type_id: Optional[int] = None,
+           skip_known: bool = True,
+           geocache: Optional[dict] = None,
+           progress: bool = True) -> pd.DataFrame:
+    """Scrape rental listings for `state` (URL slug), paginating up to max_pages.
+
+    Pass property_type_id to scrape a single property type (its own depth window).
+    Pass skip_known=False to re-scrape listings already in the DB.
+    Pass a shared `geocache` (GeoCache or dict) to skip opening the persistent
+    cache here (the caller owns it); progress=False silences the tqdm bars.
+
+    Materialises the window into one DataFrame — fine for ad-hoc use; the
+    pipeline streams via iter_row_batches() instead. Distinct uncached addresses
+    are geocoded in the background while the API is paged, then filled in.
+    """
+    _region_for(state)
+    owns_cache = geocache is None
+    worker = start_geocoder(geocache)
+
+    rows = [row for batch in iter_row_batches(
+        state, max_pages=max_pages, property_type_id=property_type_id,
+        skip_known=skip_known, geocache=worker.cache, progress=progress,
+        geocoder=worker,
+    ) for row in batch]
+
+    worker.close()
+    worker.fill_rows(rows)
+    if owns_cache:
+        _save_geocache(worker.cache)
     return pd.DataFrame(rows)
 
 
@@ -139,9 +323,139 @@ def _slug(text: str) -> str:
     return s.strip("_") or "type"
 
 
+def _type_items(property_type_ids: Optional[List[int]]) -> List[Tuple[int, str]]:
+    """(id, name) pairs for the selected residential types; None = every type."""
+    if property_type_ids is None:
+        return list(config.RESIDENTIAL_PROPERTY_TYPE_IDS.items())
+    return [(pid, config.RESIDENTIAL_PROPERTY_TYPE_IDS[pid]) for pid in property_type_ids]
+
+
+def _state_out_dir(state: str) -> Tuple[str, Path]:
+    state_slug = (state or "malaysia").strip().lower()
+    out_dir = config.RAW_DATA_DIR / state_slug
+    out_dir.mkdir(parents=True, exist_ok=True)
+    return state_slug, out_dir
+
+
+class _ChunkWriter:
+    """Append row batches to one CSV, writing the header with the first batch.
+
+    The file is only created once there is a row to write, so empty types leave
+    nothing behind. With dedup_key, rows whose key was already written are dropped
+    (only the keys are kept in memory). Thread-safe: concurrent windows of one
+    state share its combined writer.
+    """
+
+    def __init__(self, path: Path, dedup_key: Optional[str] = None):
+        self.path = path
+        self.rows = 0
+        self.dropped = 0
+        self._columns: Optional[List[str]] = None
+        self._dedup_key = dedup_key
+        self._seen: set = set()
+        self._lock = threading.Lock()
+
+    def write(self, batch: List[Dict]) -> int:
+        with self._lock:
+            if self._dedup_key is not None:
+                fresh = []
+                for row in batch:
+                    key = row.get(self._dedup_key)
+                    if key in self._seen:
+                        self.dropped += 1
+                        continue
+                    self._seen.add(key)
+                    fresh.append(row)
+                batch = fresh
+            if not batch:
+                return 0
+            df = pd.DataFrame(batch, columns=self._columns)
+            if self._columns is None:
+                self._columns = list(df.columns)
+            df.to_csv(self.path, mode="a", header=self.rows == 0, index=False)
+            self.rows += len(df)
+            return len(df)
+
+
+def _type_path(out_dir: Path, state_slug: str, pt_id: int, name: str,
+               timestamp: str) -> Path:
+    return out_dir / config.SCRAPED_TYPE_FILENAME_TEMPLATE.format(
+        state=state_slug, type_id=pt_id, type_slug=_slug(name), timestamp=timestamp,
+    )
+
+
+def _combined_writer(out_dir: Path, state_slug: str, timestamp: str) -> _ChunkWriter:
+    return _ChunkWriter(
+        out_dir / config.SCRAPED_COMBINED_FILENAME_TEMPLATE.format(
+            state=state_slug, timestamp=timestamp,
+        ),
+        dedup_key="ads_id",
+    )
+
+
+def _scrape_type(state: str, pt_id: int, name: str, combined: Optional[_ChunkWriter],
+                 timestamp: str, max_pages: int, skip_known: bool,
+                 geocoder: GeocodeWorker, known: Optional[KnownIds],
+                 progress: bool = True, incremental: bool = False,
+                 full_sweep: bool = False, sink=None, checkpoint: bool = True) -> int:
+    """Stream one property type into its per-type CSV and the state's combined CSV.
+
+    Each batch is appended to the per-type checkpoint as soon as it is ready, so
+    a crash mid-type keeps everything scraped so far. Both files are tracked by
+    `geocoder` for back-filling.
+
+    With a `sink` (load_to_db.DirectLoader) each batch also goes to sink.write().
+    checkpoint=False then skips the per-type CSV; otherwise it is deleted once the
+    whole window has reached the sink, so only an interrupted window leaves one
+    behind (for the regular clean + load). Returns rows scraped.
+    """
+    state_slug, out_dir = _state_out_dir(state)
+    writer = None
+    if checkpoint or sink is None:
+        writer = _ChunkWriter(_type_path(out_dir, state_slug, pt_id, name, timestamp))
+        geocoder.track(writer.path)
+    if combined is not None:
+        geocoder.track(combined.path)
+    rows = 0
+    for batch in iter_row_batches(
+        state, max_pages=max_pages, property_type_id=pt_id,
+        skip_known=skip_known, geocache=geocoder.cache, progress=progress,
+        known=known, incremental=incremental, full_sweep=full_sweep,
+        geocoder=geocoder,
+    ):
+        if writer is not None:
+            writer.write(batch)
+        if combined is not None:
+            combined.write(batch)
+        if sink is not None:
+            sink.write(batch)
+        rows += len(batch)
+    if writer is not None and writer.rows:
+        if sink is not None:
+            writer.path.unlink()
+        else:
+            logger.info(f"  Saved {writer.rows} rows -> {writer.path}")
+    return rows
+
+
+def _log_combined(combined: _ChunkWriter, state_slug: str) -> None:
+    if not combined.rows:
+        logger.warning(f"No rows scraped for any selected type in {state_slug}.")
+        return
+    logger.info(
+        f"Saved combined {combined.rows} unique rows "
+        f"({combined.dropped} cross-type duplicates dropped) -> {combined.path}"
+    )
+
+
 def scrape_all_types(state: str, max_pages: int = 500,
                      skip_known: bool = True,
-                     property_type_ids: Optional[List[int]] = None) -> pd.DataFrame:
+                     property_type_ids: Optional[List[int]] = None,
+                     known: Optional[KnownIds] = None,
+                     incremental: bool = False,
+                     full_sweep: bool = False,
+                     geocoder: Optional[GeocodeWorker] = None,
+                     sink=None, checkpoint: bool = True) -> int:
     """Scrape residential property types for `state`, one filtered query each.
 
     The API caps pagination at ~9,984 results per query (API_OFFSET_CAP), but each
@@ -151,57 +465,145 @@ def scrape_all_types(state: str, max_pages: int = 500,
 
     Pass property_type_ids to scrape only a subset; None = every residential type.
 
-    Results are saved under data/raw/<state>/:
-      - one CSV per property type, written immediately after that type finishes
-        (a crash-safe checkpoint — a mid-run failure keeps completed types), and
-      - a combined deduped CSV (<state>_ALL_<ts>.csv) once all types are done.
-    Returns the combined DataFrame (deduped by ads_id).
+    Results are streamed under data/raw/<state>/ in batches of SCRAPE_BATCH_SIZE:
+      - one CSV per property type, appended batch by batch (a crash-safe
+        checkpoint — a mid-run failure keeps everything scraped so far), and
+      - a combined CSV (<state>_ALL_<ts>.csv), deduped by ads_id as it is written.
+    Pass a `known` index to share one across states (run_pipeline does); otherwise
+    it is built once here when skip_known is set. incremental / full_sweep: see
+    iter_row_batches().
+
+    Geocoding runs on a background GeocodeWorker. Pass a shared `geocoder`
+    (start_geocoder) to dedup queries across states — the caller then drains it
+    with finish_geocoder(); otherwise one is started and finished here.
+
+    With a `sink`, rows are handed to sink.write() batch by batch instead
+    (run_pipeline --direct); no combined file is written and the per-type
+    checkpoints are optional (see _scrape_type).
+    Returns the number of unique rows in the combined file (rows handed to the
+    sink, with one).
     """
-    if property_type_ids is None:
-        type_items = list(config.RESIDENTIAL_PROPERTY_TYPE_IDS.items())
-    else:
-        type_items = [(pid, config.RESIDENTIAL_PROPERTY_TYPE_IDS[pid])
-                      for pid in property_type_ids]
-
-    state_slug = (state or "malaysia").strip().lower()
+    _region_for(state)
+    state_slug, out_dir = _state_out_dir(state)
     timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    out_dir = config.RAW_DATA_DIR / state_slug
-    out_dir.mkdir(parents=True, exist_ok=True)
+    combined = _combined_writer(out_dir, state_slug, timestamp) if sink is None else None
+    owns_geocoder = geocoder is None
+    if owns_geocoder:
+        geocoder = start_geocoder()
+    if skip_known and known is None:
+        known = _load_known_ads_ids()
 
-    frames = []
-    for pt_id, name in type_items:
-        logger.info(f"Scraping type {pt_id} ({name})")
-        df = scrape(state, max_pages=max_pages,
-                    property_type_id=pt_id, skip_known=skip_known)
-        logger.info(f"  {name}: {len(df)} rows")
-        if df.empty:
-            continue
-        frames.append(df)
-        fname = config.SCRAPED_TYPE_FILENAME_TEMPLATE.format(
-            state=state_slug, type_id=pt_id, type_slug=_slug(name),
-            timestamp=timestamp,
-        )
-        type_path = out_dir / fname
-        df.to_csv(type_path, index=False)
-        logger.info(f"  Saved {len(df)} rows -> {type_path}")
-
-    if not frames:
-        logger.warning("No rows scraped for any selected type.")
-        return pd.DataFrame()
-
-    combined = pd.concat(frames, ignore_index=True)
-    if "ads_id" in combined.columns:
-        before = len(combined)
-        combined = combined.drop_duplicates(subset="ads_id").reset_index(drop=True)
-        logger.info(f"Combined {before} rows -> {len(combined)} unique after dedup")
-
-    combined_path = out_dir / config.SCRAPED_COMBINED_FILENAME_TEMPLATE.format(
-        state=state_slug, timestamp=timestamp,
-    )
-    combined.to_csv(combined_path, index=False)
-    logger.info(f"Saved combined {len(combined)} rows -> {combined_path}")
+    total = 0
+    try:
+        for pt_id, name in _type_items(property_type_ids):
+            logger.info(f"Scraping type {pt_id} ({name})")
+            count = _scrape_type(state, pt_id, name, combined, timestamp,
+                                 max_pages, skip_known, geocoder, known,
+                                 incremental=incremental, full_sweep=full_sweep,
+                                 sink=sink, checkpoint=checkpoint)
+            logger.info(f"  {name}: {count} rows")
+            total += count
+    finally:
+        if owns_geocoder:
+            finish_geocoder(geocoder)
+
+    if combined is None:
+        return total
+    _log_combined(combined, state_slug)
+    return combined.rows
+
+
+async def _scrape_windows(states: List[str], type_items: List[Tuple[int, str]],
+                          concurrency: int, max_pages: int, skip_known: bool,
+                          geocoder: GeocodeWorker, known: Optional[KnownIds],
+                          incremental: bool = False,
+                          full_sweep: bool = False,
+                          sink=None, checkpoint: bool = True) -> Dict[str, int]:
+    """Run every (state, property type) window under a shared concurrency cap.
+
+    Each window is the same blocking streaming scrape as the serial path, run in
+    a worker thread; the pooled API client's limiter caps the aggregate request
+    rate. Windows of one state append to its shared combined writer (or, with a
+    `sink`, hand their batches to it).
+
+    A failed window doesn't stop the others. Once all are done, the combined
+    file of every state with a failed window is deleted — it would pass for a
+    complete snapshot — and ScrapeError is raised. The per-type checkpoints stay
+    for the regular clean + load.
+    """
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    sem = asyncio.Semaphore(max(concurrency, 1))
+    combined = {}
+    counts = {state: 0 for state in states}
+    failures = []
+    for state in states:
+        state_slug, out_dir = _state_out_dir(state)
+        combined[state] = (_combined_writer(out_dir, state_slug, timestamp)
+                           if sink is None else None)
+
+    async def _window(state: str, pt_id: int, name: str) -> None:
+        async with sem:
+            logger.info(f"Scraping {state} type {pt_id} ({name})")
+            try:
+                count = await asyncio.to_thread(
+                    _scrape_type, state, pt_id, name, combined[state], timestamp,
+                    max_pages, skip_known, geocoder, known, False,
+                    incremental, full_sweep, sink, checkpoint,
+                )
+            except Exception as e:
+                logger.error(f"  {state} / {name} failed: {e}")
+                failures.append((state, name, e))
+                return
+            counts[state] += count
+            logger.info(f"  {state} / {name}: {count} rows")
+
+    await asyncio.gather(*(
+        _window(state, pt_id, name) for state in states for pt_id, name in type_items
+    ))
 
-    return combined
+    failed = {state for state, _, _ in failures}
+    if sink is None:
+        for state in states:
+            if state in failed:
+                combined[state].path.unlink(missing_ok=True)
+                logger.warning(f"Dropped the combined file of {state}: not every window finished.")
+            else:
+                _log_combined(combined[state], _state_out_dir(state)[0])
+        counts = {state: combined[state].rows for state in states}
+    if failures:
+        raise ScrapeError(failures, counts)
+    return counts
+
+
+def scrape_states_concurrent(states: List[str],
+                             concurrency: int = config.SCRAPE_CONCURRENCY,
+                             max_pages: int = 500, skip_known: bool = True,
+                             property_type_ids: Optional[List[int]] = None,
+                             incremental: bool = False,
+                             full_sweep: bool = False,
+                             sink=None, checkpoint: bool = True) -> Dict[str, int]:
+    """Scrape many states' property-type windows concurrently.
+
+    Same output layout as calling scrape_all_types() per state (per-type
+    checkpoints + a combined _ALL_ CSV each), but up to `concurrency` windows
+    are in flight at once. One background geocoder serves every window (each
+    distinct address is geocoded once per run); it is drained, the CSVs are
+    back-filled and the cache saved at the end. `sink` / `checkpoint`: see
+    scrape_all_types(). Returns {state: unique rows written}; raises ScrapeError
+    (after the rest have finished) if any window failed.
+    """
+    for state in states:
+        _region_for(state)
+    geocoder = start_geocoder()
+    known = _load_known_ads_ids() if skip_known else None
+    try:
+        return asyncio.run(_scrape_windows(
+            states, _type_items(property_type_ids), concurrency,
+            max_pages, skip_known, geocoder, known, incremental, full_sweep,
+            sink, checkpoint,
+        ))
+    finally:
+        finish_geocoder(geocoder)
 
 
 def _prompt_state() -> Optional[str]:
@@ -298,17 +700,24 @@ def main():
 
     all_states = sorted(config.REGION_CODES) if state_choice is None else [state_choice]
     total_rows = 0
+    known = _load_known_ads_ids()
+    geocoder = start_geocoder()  # one background geocoder for the whole run
 
-    for i, state in enumerate(all_states, 1):
-        if len(all_states) > 1:
-            print(f"\n[{i}/{len(all_states)}] Scraping state: {state}")
-        # scrape_all_types writes per-type checkpoints + a combined CSV under
-        # data/raw/<state>/ as it goes, so no extra write is needed here.
-        df = scrape_all_types(state, property_type_ids=pt_ids)
-        out_dir = config.RAW_DATA_DIR / state.strip().lower()
-        total_rows += len(df)
-        print(f"  {state}: {len(df)} unique rows → {out_dir}")
-
+    try:
+        for i, state in enumerate(all_states, 1):
+            if len(all_states) > 1:
+                print(f"\n[{i}/{len(all_states)}] Scraping state: {state}")
+            # scrape_all_types writes per-type checkpoints + a combined CSV under
+            # data/raw/<state>/ as it goes, so no extra write is needed here.
+            count = scrape_all_types(state, property_type_ids=pt_ids, known=known,
+                                     geocoder=geocoder)
+            out_dir = config.RAW_DATA_DIR / state.strip().lower()
+            total_rows += count
+            print(f"  {state}: {count} unique rows → {out_dir}")
+    finally:
+        finish_geocoder(geocoder)
+
+    mudah_api.save_rate_state()
     if len(all_states) > 1:
         print(f"\nDone. {total_rows} total unique rows across {len(all_states)} states.")
     else:
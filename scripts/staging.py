@@ -0,0 +1,118 @@
+"""Processed-data staging files (clean.py → load_to_db.py), as CSV or Parquet.
+
+config.STAGING_FORMAT picks how clean.py writes data/processed/; load_to_db.py
+reads whichever format it finds, so switching formats never strands files.
+Both formats carry the same explicit schema, derived from load_to_db.COLUMN_DEFS:
+REAL columns are float64, everything else (ads_id included) is a nullable
+string — a CSV round trip no longer turns ads_id into int64 or "3" into 3.0.
+
+Parquet needs pyarrow (optional: `pip install pyarrow`); it is imported only
+when a Parquet file is read or written. CSV stays the default and is what you
+want for ad-hoc inspection.
+
+Raw scrape output stays CSV regardless: it is appended batch by batch as a
+crash-safe checkpoint and back-filled in place, and a Parquet file is
+unreadable until its footer is written.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import config
+import logging
+import scripts.logger  # noqa: F401  — configures root handlers
+
+logger = logging.getLogger("staging")
+
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+STAGING_FORMATS = {"csv": ".csv", "parquet": ".parquet"}
+
+
+def staging_format(fmt: Optional[str] = None) -> str:
+    fmt = fmt or config.STAGING_FORMAT
+    if fmt not in STAGING_FORMATS:
+        raise ValueError(f"Unknown staging format {fmt!r}. Known: {tuple(STAGING_FORMATS)}")
+    return fmt
+
+
+def suffix(fmt: Optional[str] = None) -> str:
+    return STAGING_FORMATS[staging_format(fmt)]
+
+
+def staged_path(directory: Path, source: Path, fmt: Optional[str] = None) -> Path:
+    """Where the staged copy of `source` (any extension) goes in `directory`."""
+    return directory / (source.stem + suffix(fmt))
+
+
+def existing_staged(directory: Path, source: Path) -> Optional[Path]:
+    """The staged copy of `source` in `directory`, in whichever format it was written."""
+    for ext in STAGING_FORMATS.values():
+        path = directory / (source.stem + ext)
+        if path.exists():
+            return path
+    return None
+
+
+def staged_files(directory: Path) -> List[Path]:
+    """Every staged file in `directory`, any format, sorted."""
+    return sorted(p for ext in STAGING_FORMATS.values() for p in directory.glob(f"*{ext}"))
+
+
+def column_dtypes() -> Dict[str, str]:
+    """pandas dtype per staged column: REAL -> float64, else nullable string."""
+    from scripts.load_to_db import COLUMN_DEFS  # deferred: load_to_db imports this module
+    dtypes = {"ads_id": "string"}
+    for col, sql_type in COLUMN_DEFS.items():
+        dtypes[col] = "float64" if sql_type.split()[0] == "REAL" else "string"
+    return dtypes
+
+
+def conform(df: pd.DataFrame) -> pd.DataFrame:
+    """Cast `df` to the staging schema. Columns outside it are kept, as strings.
+
+    Empty strings become missing, as they would after a CSV round trip.
+    """
+    dtypes = column_dtypes()
+    out = df.copy()
+    for col in out.columns:
+        dtype = dtypes.get(col, "string")
+        if dtype == "float64":
+            out[col] = pd.to_numeric(out[col], errors="coerce").astype("float64")
+        else:
+            out[col] = out[col].astype("string").replace("", pd.NA)
+    return out
+
+
+def _require_pyarrow() -> None:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError(
+            "Parquet staging needs pyarrow (pip install pyarrow), "
+            "or set config.STAGING_FORMAT = 'csv'."
+        ) from e
+
+
+def write(df: pd.DataFrame, path: Path) -> None:
+    """Write `df` to `path` in the format its extension names, conformed to the schema."""
+    df = conform(df)
+    if path.suffix == STAGING_FORMATS["parquet"]:
+        _require_pyarrow()
+        df.to_parquet(path, engine="pyarrow", index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def read(path: Path) -> pd.DataFrame:
+    """Read a staged file back with the staging schema."""
+    if path.suffix == STAGING_FORMATS["parquet"]:
+        _require_pyarrow()
+        return conform(pd.read_parquet(path, engine="pyarrow"))
+    header = pd.read_csv(path, nrows=0).columns
+    dtypes = column_dtypes()
+    # Only an empty cell is missing: a seller named "NA" stays text.
+    return pd.read_csv(path, dtype={c: dtypes.get(c, "string") for c in header},
+                       keep_default_na=False, na_values=[""])
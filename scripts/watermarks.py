@@ -0,0 +1,160 @@
+"""Per-window scrape bookkeeping: high-water marks and listing sightings.
+
+A window is one (region, property_type_id) query. After each completed window the
+scraper records the newest list_id / published date it saw; the next incremental
+run pages that window newest-first and stops at the first page holding nothing
+newer than the mark (mudah_api.iter_listings `stop_before`), instead of re-reading
+every page only to drop known listings.
+
+Mudah can re-surface older ads (bumps/edits), which an early stop would miss — so
+a window falls back to a full sweep when its last one is older than
+config.SCRAPE_FULL_SWEEP_DAYS (or when forced).
+
+Every window also records which listings it saw and when (table
+config.SIGHTINGS_TABLE) — including known ones the scraper skips. A sighting is
+positive evidence the listing was live that day, which `recheck.py --mode sweep`
+uses instead of a per-listing lookup.
+
+Stored in the main DB, tables config.WATERMARK_TABLE and config.SIGHTINGS_TABLE.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import config
+
+import sqlite3
+from array import array
+from datetime import date, datetime, timedelta
+from typing import Dict, NamedTuple, Optional
+
+CREATE_WATERMARKS_SQL = f"""
+CREATE TABLE IF NOT EXISTS {config.WATERMARK_TABLE} (
+    region             TEXT NOT NULL,
+    property_type_id   INTEGER NOT NULL,
+    newest_list_id     INTEGER,
+    newest_published   TEXT,
+    last_full_sweep    TEXT,
+    updated_at         TEXT,
+    PRIMARY KEY (region, property_type_id)
+);
+"""
+
+CREATE_SIGHTINGS_SQL = f"""
+CREATE TABLE IF NOT EXISTS {config.SIGHTINGS_TABLE} (
+    ads_id             TEXT PRIMARY KEY,
+    region             TEXT,
+    property_type_id   INTEGER,
+    seen_date          TEXT
+);
+"""
+
+
+class Watermark(NamedTuple):
+    newest_list_id: Optional[int]
+    newest_published: Optional[str]
+    last_full_sweep: Optional[str]
+
+
+def connect(db_file: Path = None) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_file or config.DB_FILE, timeout=30)
+    conn.execute(CREATE_WATERMARKS_SQL)
+    conn.execute(CREATE_SIGHTINGS_SQL)
+    return conn
+
+
+def get(conn: sqlite3.Connection, region: str,
+        property_type_id: Optional[int]) -> Optional[Watermark]:
+    row = conn.execute(
+        f"SELECT newest_list_id, newest_published, last_full_sweep "
+        f"FROM {config.WATERMARK_TABLE} WHERE region = ? AND property_type_id = ?",
+        (str(region), _type_key(property_type_id)),
+    ).fetchone()
+    return Watermark(*row) if row else None
+
+
+def needs_full_sweep(mark: Optional[Watermark], today: date,
+                     every_days: Optional[int] = None) -> bool:
+    """True when the window has no usable mark or its last full sweep is too old."""
+    every_days = config.SCRAPE_FULL_SWEEP_DAYS if every_days is None else every_days
+    if mark is None or mark.newest_list_id is None or not mark.last_full_sweep:
+        return True
+    try:
+        last = datetime.strptime(mark.last_full_sweep[:10], "%Y-%m-%d").date()
+    except ValueError:
+        return True
+    return today - last >= timedelta(days=every_days)
+
+
+def record(conn: sqlite3.Connection, region: str, property_type_id: Optional[int],
+           tracker: "WindowTracker", full_sweep: bool, today: date) -> None:
+    """Advance the window's mark to the newest listing seen (never moves backwards)."""
+    today_str = today.strftime("%Y-%m-%d")
+    conn.execute(
+        f"""
+        INSERT INTO {config.WATERMARK_TABLE}
+            (region, property_type_id, newest_list_id, newest_published,
+             last_full_sweep, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(region, property_type_id) DO UPDATE SET
+            newest_list_id = NULLIF(MAX(COALESCE(newest_list_id, 0),
+                                        COALESCE(excluded.newest_list_id, 0)), 0),
+            newest_published = NULLIF(MAX(COALESCE(newest_published, ''),
+                                          COALESCE(excluded.newest_published, '')), ''),
+            last_full_sweep = COALESCE(excluded.last_full_sweep, last_full_sweep),
+            updated_at = excluded.updated_at
+        """,
+        (str(region), _type_key(property_type_id), tracker.newest_list_id,
+         tracker.newest_published, today_str if full_sweep else None, today_str),
+    )
+    conn.commit()
+
+
+def record_sightings(conn: sqlite3.Connection, region: str,
+                     property_type_id: Optional[int], tracker: "WindowTracker",
+                     today: date) -> int:
+    """Upsert every listing id the window returned as seen today. Returns rows written."""
+    today_str = today.strftime("%Y-%m-%d")
+    type_key = _type_key(property_type_id)
+    conn.executemany(
+        f"""
+        INSERT INTO {config.SIGHTINGS_TABLE} (ads_id, region, property_type_id, seen_date)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(ads_id) DO UPDATE SET
+            region = excluded.region,
+            property_type_id = excluded.property_type_id,
+            seen_date = excluded.seen_date
+        """,
+        ((str(i), str(region), type_key, today_str) for i in tracker.ids),
+    )
+    conn.commit()
+    return len(tracker.ids)
+
+
+def _type_key(property_type_id: Optional[int]) -> int:
+    # Unfiltered windows are keyed as type 0 (no real type uses it).
+    return int(property_type_id) if property_type_id is not None else 0
+
+
+class WindowTracker:
+    """Watermark bookkeeping for one window while its listings stream past."""
+
+    def __init__(self):
+        self.newest_list_id: Optional[int] = None
+        self.newest_published: Optional[str] = None
+        self.seen = 0
+        self.ids = array("q")  # every list_id returned, for sightings
+
+    def observe(self, item: Dict) -> None:
+        a = item.get("attributes", {})
+        self.seen += 1
+        try:
+            list_id = int(a.get("list_id"))
+        except (TypeError, ValueError):
+            return
+        self.ids.append(list_id)
+        if self.newest_list_id is None or list_id > self.newest_list_id:
+            self.newest_list_id = list_id
+        published = a.get("published_date") or a.get("date")
+        if published and (self.newest_published is None or str(published) > self.newest_published):
+            self.newest_published = str(published)
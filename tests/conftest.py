@@ -29,3 +29,45 @@ def sample_mapping_dict():
         'Service Residence': 'Condominium',
         '2-storey Terraced House': 'Terraced House',
     }
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    return tmp_path / "rent.db"
+
+
+@pytest.fixture
+def conn(db_file):
+    """A loader connection to a fresh DB file: schema migrated, indexes in place."""
+    from scripts import load_to_db
+    conn = load_to_db.connect(db_file)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture(autouse=True)
+def api_client():
+    """Fresh shared API client per test, with the global rate cap disabled.
+
+    Tests stub time.sleep, so a depleted token bucket would otherwise spin.
+    """
+    from scripts import mudah_api
+    client = mudah_api.configure(limiter=mudah_api.TokenBucket(rate=0))
+    yield client
+    mudah_api.configure()
+
+
+@pytest.fixture(autouse=True)
+def no_persisted_known_ids(monkeypatch):
+    """Keep the scraper's known-ids index in memory (don't write into data/)."""
+    import config
+    monkeypatch.setattr(config, "KNOWN_IDS_FILE", None)
+
+
+@pytest.fixture(autouse=True)
+def null_geocoder():
+    """No test geocodes against the network; tests that need answers install a fake."""
+    from scripts import geocoder
+    geocoder.configure(geocoder.NullGeocoder())
+    yield
+    geocoder.configure(geocoder.NullGeocoder())
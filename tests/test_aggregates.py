@@ -0,0 +1,142 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import config
+from scripts import aggregates, load_to_db
+
+SUMMARY_COLUMNS = ['state', 'region', 'CPI', 'rooms', 'scrape_week', 'listings', 'active',
+                   'rented', 'expired', 'mean_rent', 'median_rent', 'mean_rent_psf',
+                   'rent_sum', 'rent_count', 'psf_sum', 'psf_count']
+
+
+def _listing(ads_id, rent, state='Selangor', region='Shah Alam', rooms='3',
+             size=1000.0, scrape_date='2026-05-04', **extra):
+    row = {'ads_id': ads_id, 'monthly_rent': rent, 'state': state, 'region': region,
+           'CPI': 'Condominium', 'rooms': rooms, 'size': size, 'address': f'Jalan {ads_id}',
+           'scrape_date': scrape_date}
+    row.update(extra)
+    return row
+
+
+def _upsert(conn, *rows):
+    load_to_db.upsert_dataframe(conn, pd.DataFrame(list(rows)))
+    conn.commit()
+
+
+def _summary(conn):
+    rows = conn.execute(f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM {config.SUMMARY_TABLE}").fetchall()
+    return pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+
+
+def _expected(conn):
+    """The summary computed from scratch in pandas."""
+    df = pd.read_sql(f"SELECT * FROM {config.DB_TABLE}", conn)
+    df['scrape_week'] = (pd.to_datetime(df['scrape_date'])
+                         - pd.to_timedelta(pd.to_datetime(df['scrape_date']).dt.weekday, unit='D')
+                         ).dt.strftime('%Y-%m-%d')
+    status = df['availability_status'].fillna('active')
+    df['active'], df['rented'], df['expired'] = (status == 'active'), (status == 'rented'), (status == 'expired')
+    df['psf'] = (df['monthly_rent'] / df['size']).where(df['size'] > 0)
+    keys = aggregates.GROUP_COLUMNS + ['scrape_week']
+    out = df.groupby(keys, dropna=False).agg(
+        listings=('ads_id', 'size'), active=('active', 'sum'), rented=('rented', 'sum'),
+        expired=('expired', 'sum'), mean_rent=('monthly_rent', 'mean'),
+        median_rent=('monthly_rent', 'median'), mean_rent_psf=('psf', 'mean'),
+        rent_sum=('monthly_rent', lambda s: s.sum(min_count=1)), rent_count=('monthly_rent', 'count'),
+        psf_sum=('psf', lambda s: s.sum(min_count=1)), psf_count=('psf', 'count'),
+    ).reset_index()
+    return out[SUMMARY_COLUMNS]
+
+
+def _assert_matches(conn):
+    def norm(df):
+        df = df.astype(object).where(df.notna(), None)
+        return df.sort_values(SUMMARY_COLUMNS[:5], key=lambda s: s.astype(str)).reset_index(drop=True)
+    got, want = norm(_summary(conn)), norm(_expected(conn))
+    for col in ['listings', 'active', 'rented', 'expired', 'rent_count', 'psf_count']:
+        got[col], want[col] = got[col].astype(int), want[col].astype(int)
+    pd.testing.assert_frame_equal(got, want, check_dtype=False)
+
+
+def test_summary_matches_a_full_recompute(conn):
+    _upsert(conn,
+            _listing('1', 1000.0), _listing('2', 2000.0), _listing('3', 4000.0),
+            _listing('4', None, rooms=None), _listing('5', 1500.0, size=0.0),
+            _listing('6', 900.0, state='Johor', region='Johor Bahru', scrape_date='2026-05-10'))
+    assert aggregates.refresh(conn) == 3
+    _assert_matches(conn)
+
+
+def test_refresh_only_touches_dirty_groups(conn):
+    _upsert(conn, _listing('1', 1000.0), _listing('2', 2000.0),
+            _listing('3', 900.0, state='Johor', region='Johor Bahru'))
+    assert aggregates.refresh(conn) == 2
+    _assert_matches(conn)
+
+    # Unchanged re-scrape in the same week: nothing to refresh.
+    _upsert(conn, _listing('1', 1000.0, scrape_date='2026-05-05'))
+    assert aggregates.refresh(conn) == 0
+
+    # Price cut, a listing moving state, a recheck status change and a dedup delete.
+    _upsert(conn, _listing('2', 1800.0), _listing('3', 950.0, state='Selangor'))
+    conn.execute(f"UPDATE {config.DB_TABLE} SET availability_status = 'rented' WHERE ads_id = '1'")
+    assert aggregates.refresh(conn) == 2
+    _assert_matches(conn)
+    conn.execute(f"DELETE FROM {config.DB_TABLE} WHERE ads_id IN ('1', '2', '3')")
+    assert aggregates.refresh(conn) == 1
+    assert _summary(conn).empty
+
+
+def test_existing_db_gets_a_full_build(conn):
+    _upsert(conn, _listing('1', 1000.0), _listing('2', 3000.0, scrape_date='2026-05-11'))
+    aggregates.refresh(conn)
+    conn.execute(f"DROP TABLE {config.SUMMARY_TABLE}")
+    conn.execute(f"DELETE FROM {config.SUMMARY_DIRTY_TABLE}")
+    aggregates.ensure(conn)
+    _assert_matches(conn)
+    assert _summary(conn)['scrape_week'].tolist() == ['2026-05-04', '2026-05-11']
+
+
+def test_old_layout_is_rebuilt(conn):
+    _upsert(conn, _listing('1', 1000.0), _listing('2', None))
+    aggregates.refresh(conn)
+    conn.execute(f"DROP TABLE {config.SUMMARY_TABLE}")
+    conn.execute(f"CREATE TABLE {config.SUMMARY_TABLE} (state TEXT, listings INTEGER)")
+    aggregates.ensure(conn)
+    _assert_matches(conn)
+    assert _summary(conn)[['rent_sum', 'rent_count']].values.tolist() == [[1000.0, 1]]
+
+
+def test_load_refreshes_summaries(tmp_path, monkeypatch):
+    from scripts import staging
+    monkeypatch.setattr(config, "PROCESSED_DATA_DIR", tmp_path / "processed")
+    monkeypatch.setattr(config, "RAW_DATA_DIR", tmp_path / "raw")
+    monkeypatch.setattr(config, "DB_FILE", tmp_path / "rent.db")
+    config.PROCESSED_DATA_DIR.mkdir()
+    config.RAW_DATA_DIR.mkdir()
+    staging.write(pd.DataFrame([_listing('1', 1000.0), _listing('2', 3000.0)]),
+                  config.PROCESSED_DATA_DIR / "a.csv")
+    load_to_db.load_processed_files()
+    conn = sqlite3.connect(config.DB_FILE)
+    assert conn.execute(f"SELECT listings, median_rent FROM {config.SUMMARY_TABLE}").fetchall() == [(2, 2000.0)]
+    assert conn.execute(f"SELECT COUNT(*) FROM {config.SUMMARY_DIRTY_TABLE}").fetchone() == (0,)
+    conn.close()
+
+
+def test_refresh_reads_only_the_covering_index(conn):
+    plan = " ".join(r[-1] for r in conn.execute(f"EXPLAIN QUERY PLAN {aggregates._refresh_sql()}"))
+    assert "COVERING INDEX idx_summary_group" in plan
+    assert "SCAN p" not in plan
+
+
+def test_median_even_and_odd(conn):
+    rents = [1000.0, 1200.0, 5000.0, np.nan]
+    _upsert(conn, *[_listing(str(i), r) for i, r in enumerate(rents)])
+    aggregates.refresh(conn)
+    assert _summary(conn)['median_rent'].tolist() == [1200.0]
+    _upsert(conn, _listing('9', 1100.0))
+    aggregates.refresh(conn)
+    assert _summary(conn)['median_rent'].tolist() == [1150.0]
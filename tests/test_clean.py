@@ -128,3 +128,128 @@ def test_create_mapping_dict_skips_nan():
     result = clean.create_mapping_dict(mapping_df)
     assert "Should be skipped" not in result.values()
     assert result["House"] == "Terrace"
+
+
+class TestVectorisedMatchesScalar:
+    """The vectorised column cleaners must equal .apply of the scalar reference."""
+
+    @staticmethod
+    def _cells(seed, n=3000):
+        import random
+        rng = random.Random(seed)
+        forms = [
+            lambda: f"RM {rng.randint(0, 99999):,} per month",
+            lambda: f"RM {rng.uniform(0, 9999):.2f} per month",
+            lambda: f"{rng.randint(0, 9999):,} sq.ft.",
+            lambda: f"{rng.uniform(0, 99):.1f}",
+            lambda: str(rng.randint(-5, 20)),
+            lambda: rng.choice(["", " ", "invalid", "unknown", "More than 10", "Studio",
+                                "nan", "NaN", "1e3", "+7", " 12 ", "0x10", "1_000",
+                                "True", "RM  per month", "—", "٣", "-0.0", "1e30"]),
+            lambda: rng.uniform(0, 5000),
+            lambda: rng.randint(0, 12),
+            lambda: None,
+            lambda: np.nan,
+        ]
+        return [rng.choice(forms)() for _ in range(n)]
+
+    @pytest.mark.parametrize("seed", [1, 2, 3])
+    def test_rent_and_size(self, seed):
+        s = pd.Series(self._cells(seed), dtype=object)
+        pd.testing.assert_series_equal(clean.clean_rent_series(s), s.apply(clean.clean_rent).astype(float))
+        pd.testing.assert_series_equal(clean.clean_size_series(s), s.apply(clean.clean_size).astype(float))
+
+    @pytest.mark.parametrize("seed", [1, 2, 3])
+    def test_rooms(self, seed):
+        s = pd.Series(self._cells(seed), dtype=object, index=[i % 50 for i in range(3000)])
+        expected = s.apply(clean.clean_rooms)
+        got = clean.clean_rooms_series(s)
+        assert got.index.equals(expected.index)
+        assert [type(v) for v in got] == [type(v) for v in expected]
+        assert got.fillna("<NA>").tolist() == expected.fillna("<NA>").tolist()
+
+    def test_numeric_column_dtype(self):
+        s = pd.Series([1200.0, np.nan, 3.0])
+        pd.testing.assert_series_equal(clean.clean_rent_series(s), s.apply(clean.clean_rent))
+        assert clean.clean_rooms_series(s).tolist()[::2] == ["1200", "3"]
+
+    def test_clean_rental_data_matches_fixture(self, sample_raw_df):
+        result = clean.clean_rental_data(sample_raw_df)
+        pd.testing.assert_series_equal(
+            result['monthly_rent'], sample_raw_df['monthly_rent'].apply(clean.clean_rent),
+        )
+        pd.testing.assert_series_equal(
+            result['size'], sample_raw_df['size'].apply(clean.clean_size),
+        )
+
+    def test_map_cpi(self, sample_mapping_dict):
+        types = pd.Series(['Apartment', ' Condominium ', 'Bungalow', None, np.nan])
+        assert clean.map_cpi(types, sample_mapping_dict).tolist() == [
+            'Apartment', 'Condominium', 'Other', 'Other', 'Other',
+        ]
+
+
+class TestCleanRawFiles:
+    @pytest.fixture
+    def dirs(self, tmp_path, monkeypatch):
+        import config
+        raw, processed = tmp_path / "raw", tmp_path / "processed"
+        (raw / "selangor").mkdir(parents=True)
+        (raw / "johor").mkdir()
+        processed.mkdir()
+        mapping = tmp_path / "mapping.csv"
+        pd.DataFrame({
+            "Mudah Property Type": ["Apartment\nFlat", "Condominium"],
+            "Standardized Property Type": ["Apartment", "Condominium"],
+        }).to_csv(mapping, index=False)
+        monkeypatch.setattr(config, "RAW_DATA_DIR", raw)
+        monkeypatch.setattr(config, "PROCESSED_DATA_DIR", processed)
+        monkeypatch.setattr(config, "MAPPING_FILE", mapping)
+
+        frame = pd.DataFrame({
+            'ads_id': ['1', '2'], 'monthly_rent': ['RM 1,200 per month', 'RM 900 per month'],
+            'size': ['850 sq.ft.', None], 'property_type': ['Flat', 'Bungalow'],
+        })
+        frame.to_csv(raw / "selangor" / "selangor_apartment.csv", index=False)
+        frame.to_csv(raw / "johor" / "johor_apartment.csv", index=False)
+        frame.to_csv(raw / "johor" / f"johor{config.SCRAPED_COMBINED_MARKER}x.csv", index=False)
+        (raw / "johor" / "johor_broken.csv").write_text("")        # EmptyDataError
+        frame.to_csv(raw / "johor" / "johor_house.csv", index=False)
+        (processed / "johor_house.csv").write_text("done\n")        # already processed
+        return raw, processed
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_cleans_pending_files_and_isolates_errors(self, dirs, workers):
+        raw, processed = dirs
+        results = clean.clean_raw_files(workers=workers)
+        assert [r["name"] for r in results] == [
+            "johor_apartment.csv", "johor_broken.csv", "selangor_apartment.csv",
+        ]
+        assert [bool(r["error"]) for r in results] == [False, True, False]
+        assert "EmptyDataError" in results[1]["error"]
+        assert sorted(p.name for p in processed.iterdir()) == [
+            "johor_apartment.csv", "johor_house.csv", "selangor_apartment.csv",
+        ]
+        assert (processed / "johor_house.csv").read_text() == "done\n"
+        out = pd.read_csv(processed / "selangor_apartment.csv")
+        assert out['CPI'].tolist() == ['Apartment', 'Other']
+        assert out['monthly_rent'].tolist() == [1200.0, 900.0]
+
+    def test_ids_and_counts_keep_their_text(self, tmp_path, sample_mapping_dict):
+        from scripts import staging
+        raw, out = tmp_path / "raw.csv", tmp_path / "out.csv"
+        raw.write_text("ads_id,bathroom,subarea_id,property_type_id,seller_name\n"
+                       "1,2,123,2020,NA\n"
+                       "2,,,,\n")
+        result = clean.clean_file(raw, out, sample_mapping_dict)
+        assert result["error"] is None
+        df = staging.read(out)
+        assert df['bathroom'].tolist()[0] == '2'
+        assert df['subarea_id'].tolist()[0] == '123'
+        assert df['property_type_id'].tolist()[0] == '2020'
+        assert df['seller_name'].tolist()[0] == 'NA'
+        assert df.iloc[1][['bathroom', 'subarea_id', 'seller_name']].isna().all()
+
+    def test_second_run_skips_everything_cleaned(self, dirs):
+        clean.clean_raw_files(workers=2)
+        assert [r["name"] for r in clean.clean_raw_files(workers=2)] == ["johor_broken.csv"]
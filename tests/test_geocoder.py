@@ -0,0 +1,163 @@
+import threading
+
+import pytest
+
+from scripts import geocoder
+
+
+class FakeBackend(geocoder.Geocoder):
+    name = "fake"
+
+    def __init__(self, answers, **kwargs):
+        kwargs.setdefault("error_wait", 0)
+        super().__init__(**kwargs)
+        self.answers = answers
+        self.calls = []
+
+    def lookup(self, query):
+        self.calls.append(query)
+        answer = self.answers.get(query)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+def test_geocode_many_result_contract():
+    backend = FakeBackend({
+        "A": (1.0, 2.0),
+        "Down": geocoder.GeocodeError("timeout"),
+    }, max_retries=1)
+    out = backend.geocode_many(["A", "B", "Down", "A", ""])
+    assert out == {"A": (1.0, 2.0), "B": None}  # "Down" omitted -> not cached
+    assert backend.calls.count("Down") == 2     # one retry
+    assert backend.calls.count("A") == 1        # deduped
+
+
+def test_non_authoritative_backend_omits_misses():
+    backend = FakeBackend({"A": (1.0, 2.0)})
+    backend.authoritative = False
+    assert backend.geocode_many(["A", "B"]) == {"A": (1.0, 2.0)}
+    assert geocoder.NullGeocoder().geocode_many(["A"]) == {}
+
+
+def test_min_delay_spaces_requests(monkeypatch):
+    clock = {"now": 100.0}
+    sleeps = []
+
+    def fake_sleep(s):
+        sleeps.append(s)
+        clock["now"] += s
+
+    monkeypatch.setattr(geocoder.time, "monotonic", lambda: clock["now"])
+    monkeypatch.setattr(geocoder.time, "sleep", fake_sleep)
+    backend = FakeBackend({}, min_delay=1.0)
+    backend.geocode_many(["A", "B", "C"])
+    assert sleeps == [pytest.approx(1.0), pytest.approx(1.0)]
+
+
+def test_workers_run_lookups_concurrently():
+    barrier = threading.Barrier(4, timeout=5)
+
+    class Parallel(FakeBackend):
+        def lookup(self, query):
+            barrier.wait()  # deadlocks (times out) unless 4 lookups are in flight
+            return (0.0, 0.0)
+
+    out = Parallel({}, workers=4).geocode_many(["A", "B", "C", "D"])
+    assert len(out) == 4
+
+
+def test_make_geocoder_selects_backend(monkeypatch):
+    import config
+    assert isinstance(geocoder.make_geocoder("null"), geocoder.NullGeocoder)
+    assert isinstance(geocoder.make_geocoder("offline"), geocoder.OfflineBackend)
+    monkeypatch.setattr(config, "GEOCODER_LOCAL_URL", "nominatim.internal:8080")
+    local = geocoder.make_geocoder("nominatim-local")
+    assert local.name == "nominatim-local"
+    assert local.min_delay == 0.0 and local.workers == config.GEOCODER_LOCAL_WORKERS
+    assert local._client.domain == "nominatim.internal:8080"
+    assert local._client.scheme == "http"
+    with pytest.raises(ValueError, match="backend"):
+        geocoder.make_geocoder("google")
+
+
+def test_worker_batches_queued_queries():
+    from scripts import scrape
+    from scripts.geocode_worker import GeocodeWorker
+
+    backend = FakeBackend({"A, Malaysia": (1.0, 2.0)})
+    geocoder.configure(backend)
+    batches = []
+
+    def resolve_many(queries, cache):
+        batches.append(list(queries))
+        return scrape.geocode_many(queries, cache)
+
+    cache = {}
+    worker = GeocodeWorker(cache, resolve_many, batch_size=2)
+    release = threading.Event()
+    original = worker._resolve_many
+    worker._resolve_many = lambda qs, c: (release.wait(5), original(qs, c))
+    for q in ["A, Malaysia", "B, Malaysia", "C, Malaysia"]:
+        worker.coords(q)
+    release.set()
+    worker.close()
+    assert sorted(q for b in batches for q in b) == ["A, Malaysia", "B, Malaysia", "C, Malaysia"]
+    assert all(len(b) <= 2 for b in batches)
+    assert cache == {"A, Malaysia": [1.0, 2.0], "B, Malaysia": [None, None],
+                     "C, Malaysia": [None, None]}
+
+
+@pytest.fixture
+def nominatim_server():
+    """A minimal Nominatim /search over {query: (lat, lon) | None}: None answers
+    `[]` (no such place), an unknown query gets a 404. Yields its host:port."""
+    import json
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlparse
+
+    answers = {
+        "Shah Alam, Selangor, Malaysia": (3.07, 101.52),
+        "Atlantis, Malaysia": None,
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query).get("q", [""])[0]
+            if query not in answers:
+                self.send_error(404)
+                return
+            found = answers[query]
+            body = json.dumps([] if found is None else [
+                {"lat": str(found[0]), "lon": str(found[1]), "display_name": query},
+            ]).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, fmt, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield "%s:%d" % server.server_address
+    server.shutdown()
+    server.server_close()
+
+
+def test_local_backend_against_a_server(nominatim_server):
+    backend = geocoder.NominatimGeocoder(domain=nominatim_server, min_delay=0, workers=4)
+    assert backend.authoritative
+    out = backend.geocode_many([
+        "Shah Alam, Selangor, Malaysia",
+        "Atlantis, Malaysia",
+        "Not Imported Yet, Malaysia",
+    ])
+    assert out == {
+        "Shah Alam, Selangor, Malaysia": (3.07, 101.52),
+        "Atlantis, Malaysia": None,  # an authoritative miss, safe to cache
+    }
+    # The 404 is asked once, not retried, and left out so it is never cached.
+    assert backend.stats() == {"requests": 3, "errors": 0}
@@ -0,0 +1,81 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import config
+from scripts import history, load_to_db, recheck
+
+
+def _scrape(conn, scrape_date, **rents):
+    """Upsert one listing per ads_id=rent pair, as a scrape on scrape_date would."""
+    df = pd.DataFrame([{'ads_id': ads_id, 'monthly_rent': rent, 'state': 'Selangor',
+                        'address': f'Jalan {ads_id}', 'scrape_date': scrape_date}
+                       for ads_id, rent in rents.items()])
+    load_to_db.upsert_dataframe(conn, df)
+    conn.commit()
+
+
+def test_only_changes_are_recorded(conn):
+    _scrape(conn, '2026-05-01', a1=1500.0, a2=900.0)
+    _scrape(conn, '2026-05-02', a1=1500.0, a2=900.0)   # nothing changed
+    _scrape(conn, '2026-05-03', a1=1400.0, a2=900.0)   # price cut
+    assert history.listing_history(conn, 'a1') == [
+        ('2026-05-01', 1500.0, 'active'),
+        ('2026-05-03', 1400.0, 'active'),
+    ]
+    assert history.listing_history(conn, 'a2') == [('2026-05-01', 900.0, 'active')]
+    assert history.rent_changes(conn, '2026-05-01') == [('a1', '2026-05-03', 1500.0, 1400.0)]
+    assert history.rent_changes(conn, '2026-05-04') == []
+
+
+def test_same_day_changes_keep_the_last(conn):
+    _scrape(conn, '2026-05-01', a1=1500.0)
+    _scrape(conn, '2026-05-02', a1=1450.0)
+    _scrape(conn, '2026-05-02', a1=1400.0)
+    assert history.listing_history(conn, 'a1') == [
+        ('2026-05-01', 1500.0, 'active'),
+        ('2026-05-02', 1400.0, 'active'),
+    ]
+
+
+def test_recheck_status_changes_are_recorded(conn):
+    _scrape(conn, '2026-05-01', a1=1500.0, a2=900.0)
+    writer = recheck._ResultWriter(conn, date(2026, 5, 4), commit_every=10)
+    writer.add('a1', False, '2026-06-30 00:00:00')   # gone before expiry -> rented
+    writer.add('a2', True, None)                      # still live: no observation
+    writer.flush()
+    _scrape(conn, '2026-05-06', a1=1500.0)            # relisted
+    assert history.listing_history(conn, 'a1') == [
+        ('2026-05-01', 1500.0, 'active'),
+        ('2026-05-04', 1500.0, 'rented'),
+        ('2026-05-06', 1500.0, 'active'),
+    ]
+    assert history.listing_history(conn, 'a2') == [('2026-05-01', 900.0, 'active')]
+
+
+def test_existing_db_is_seeded_once(conn):
+    _scrape(conn, '2026-05-01', a1=1500.0)
+    conn.execute(f"DROP TABLE {config.OBSERVATIONS_TABLE}")
+    conn.execute(f"UPDATE {config.DB_TABLE} SET last_checked_at = '2026-05-05'")
+    load_to_db.ensure_schema(conn)
+    load_to_db.ensure_schema(conn)
+    assert history.listing_history(conn, 'a1') == [('2026-05-05', 1500.0, 'active')]
+
+
+def test_dedup_keeps_history(conn):
+    _scrape(conn, '2026-05-01', a1=1500.0)
+    conn.execute(f"DELETE FROM {config.DB_TABLE} WHERE ads_id = 'a1'")
+    assert history.listing_history(conn, 'a1') == [('2026-05-01', 1500.0, 'active')]
+
+
+def test_queries_use_the_indexes(conn):
+    plans = {
+        "listing": f"SELECT * FROM {config.OBSERVATIONS_TABLE} WHERE ads_id = 'a1'",
+        "range": f"SELECT * FROM {config.OBSERVATIONS_TABLE} "
+                 f"WHERE observed_date BETWEEN '2026-05-01' AND '2026-05-31'",
+    }
+    details = {name: " ".join(r[-1] for r in conn.execute(f"EXPLAIN QUERY PLAN {sql}"))
+               for name, sql in plans.items()}
+    assert "USING PRIMARY KEY" in details["listing"]
+    assert "idx_observed_date" in details["range"]
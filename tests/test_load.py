@@ -2,6 +2,7 @@ import sqlite3
 import pandas as pd
 import pytest
 
+import config
 from scripts import load_to_db
 
 
@@ -83,3 +84,238 @@ class TestUpsertDataframe:
         minimal_df = pd.DataFrame({'ads_id': ['999'], 'monthly_rent': [1000.0]})
         count = load_to_db.upsert_dataframe(in_memory_conn, minimal_df)
         assert count == 1
+
+
+    @pytest.mark.parametrize("chunk_rows", [1, 2, 1000])
+    def test_streams_chunks_with_nulls_and_duplicates(self, in_memory_conn, chunk_rows):
+        df = pd.DataFrame({
+            'ads_id': ['1', '2', '1', '3', '4'],
+            'monthly_rent': [1000.0, float('nan'), 9999.0, 1500.0, 800.0],
+            'rooms': pd.array(['3', pd.NA, 'x', '2', None], dtype='string'),
+            'subarea_id': [11, 12, 13, 14, 15],
+            'address': ['a', None, 'c', float('nan'), 'e'],
+            'scrape_date': ['2026-05-01'] * 5,
+        })
+        assert load_to_db.upsert_dataframe(in_memory_conn, df, chunk_rows=chunk_rows) == 4
+        rows = in_memory_conn.execute(
+            "SELECT ads_id, monthly_rent, rooms, subarea_id, address, first_seen, state "
+            "FROM properties ORDER BY ads_id"
+        ).fetchall()
+        assert rows == [
+            ('1', 1000.0, '3', '11', 'a', '2026-05-01', None),   # first duplicate wins
+            ('2', None, None, '12', None, '2026-05-01', None),
+            ('3', 1500.0, '2', '14', None, '2026-05-01', None),
+            ('4', 800.0, None, '15', 'e', '2026-05-01', None),
+        ]
+
+    def test_empty_frame(self, in_memory_conn):
+        assert load_to_db.upsert_dataframe(in_memory_conn, pd.DataFrame({'ads_id': []})) == 0
+
+class TestDirectLoader:
+    ROWS = [
+        {'ads_id': '101', 'monthly_rent': 'RM 1,200 per month', 'size': '850 sq.ft.',
+         'rooms': '3', 'category_id': 'Apartment / Condominium, For rent',
+         'property_type': 'Condominium', 'address': 'Shah Alam, Selangor',
+         'seller_name': '', 'bathroom': '2', 'subarea_id': '123', 'publishedDatetime': '',
+         'latitude': None, 'longitude': None, 'scrape_date': '2026-05-01'},
+        {'ads_id': '102', 'monthly_rent': 'RM 900 per month', 'size': '',
+         'rooms': 'More than 10', 'category_id': 'Land, For rent',
+         'property_type': 'Residential', 'address': 'Kajang, Selangor',
+         'seller_name': 'Ali', 'bathroom': '1', 'subarea_id': '124', 'publishedDatetime': '01/05/2026',
+         'latitude': 2.99, 'longitude': 101.79, 'scrape_date': '2026-05-01'},
+        {'ads_id': '103', 'monthly_rent': 'RM 2,000 per month', 'size': '1,000 sq.ft.',
+         'rooms': '2', 'category_id': 'Room, For rent',
+         'property_type': 'Apartment', 'address': 'Petaling Jaya, Selangor',
+         'seller_name': 'Siti', 'bathroom': '', 'subarea_id': '', 'publishedDatetime': '02/05/2026',
+         'latitude': 3.1, 'longitude': 101.6, 'scrape_date': '2026-05-01'},
+    ]
+
+    def _table(self, db):
+        conn = sqlite3.connect(db)
+        df = pd.read_sql("SELECT * FROM properties ORDER BY ads_id", conn)
+        conn.close()
+        return df
+
+    def test_matches_file_round_trip(self, tmp_path, monkeypatch, sample_mapping_dict):
+        import config
+        from scripts import clean, staging
+        monkeypatch.setattr(config, "DB_FILE", tmp_path / "file.db")
+        monkeypatch.setattr(config, "PROCESSED_DATA_DIR", tmp_path)
+        raw = tmp_path / "raw.csv"
+        pd.DataFrame(self.ROWS).to_csv(raw, index=False)  # as scrape's _ChunkWriter does
+        assert clean.clean_file(raw, tmp_path / "processed.csv", sample_mapping_dict)["error"] is None
+        load_to_db.load_processed_files()
+
+        loader = load_to_db.DirectLoader(tmp_path / "direct.db", mapping_dict=sample_mapping_dict)
+        assert loader.write(self.ROWS[:2]) + loader.write(self.ROWS[2:]) == 2  # Land dropped
+        loader.close()
+
+        direct, via_files = self._table(tmp_path / "direct.db"), self._table(tmp_path / "file.db")
+        pd.testing.assert_frame_equal(direct, via_files)
+        assert direct['seller_name'].isna().iloc[0]  # "" stored as NULL, as read_csv would
+        # A blank elsewhere in the column doesn't turn "2" into "2.0" on the file path,
+        # so both paths fingerprint the listing alike and dedup works across them.
+        assert direct['bathroom'].tolist() == ['2', None]
+        assert direct['subarea_id'].tolist() == ['123', None]
+        assert direct['publishedDatetime'].isna().iloc[0]
+        assert direct['content_hash'].tolist() == via_files['content_hash'].tolist()
+
+    def test_fill_coordinates_after_geocoder_drains(self, tmp_path, sample_mapping_dict):
+        loader = load_to_db.DirectLoader(tmp_path / "direct.db", mapping_dict=sample_mapping_dict)
+        loader.write(self.ROWS)
+        cache = {"Shah Alam, Selangor, Malaysia": [3.07, 101.52]}
+        assert loader.fill_coordinates(cache) == 1
+        loader.close()
+        row = self._table(tmp_path / "direct.db").iloc[0]
+        assert (row['latitude'], row['longitude']) == (3.07, 101.52)
+
+
+class TestBulkLoad:
+    FILES = {
+        'a.csv': pd.DataFrame({'ads_id': ['1', '2', '2'], 'monthly_rent': [100.0, 200.0, 250.0],
+                               'state': ['Johor', 'Johor', 'Johor'], 'scrape_date': ['2026-05-01'] * 3}),
+        'b.csv': pd.DataFrame({'ads_id': ['2', '3'], 'monthly_rent': [300.0, None],
+                               'state': ['Johor', 'Perak'], 'scrape_date': ['2026-05-02'] * 2}),
+    }
+
+    def _load(self, tmp_path, monkeypatch, bulk):
+        import config
+        from scripts import staging
+        root = tmp_path / ('bulk' if bulk else 'per_file')
+        processed, raw = root / 'processed', root / 'raw' / 'johor'
+        processed.mkdir(parents=True)
+        raw.mkdir(parents=True)
+        monkeypatch.setattr(config, 'PROCESSED_DATA_DIR', processed)
+        monkeypatch.setattr(config, 'RAW_DATA_DIR', root / 'raw')
+        monkeypatch.setattr(config, 'DB_FILE', root / 'rent.db')
+        conn = load_to_db.connect()
+        load_to_db.upsert_dataframe(conn, pd.DataFrame({
+            'ads_id': ['3', '9'], 'monthly_rent': [1.0, 9.0], 'scrape_date': ['2026-04-01'] * 2,
+        }))
+        conn.commit()
+        conn.close()
+        for name, df in self.FILES.items():
+            staging.write(df, processed / name)
+            (raw / name).write_text('raw\n')
+        (processed / 'c.csv').write_text('monthly_rent\n1\n')  # no ads_id -> fails alone
+
+        assert load_to_db.load_processed_files(bulk=bulk) == 4
+        assert sorted(p.name for p in processed.iterdir()) == ['c.csv']
+        assert list(raw.iterdir()) == []
+        conn = sqlite3.connect(config.DB_FILE)
+        table = conn.execute(
+            "SELECT ads_id, monthly_rent, state, first_seen, last_checked_at "
+            "FROM properties ORDER BY ads_id").fetchall()
+        indexes = {r[0] for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+            "AND tbl_name = 'properties'")}
+        conn.close()
+        return table, indexes
+
+    def test_bulk_matches_per_file(self, tmp_path, monkeypatch):
+        per_file, per_file_indexes = self._load(tmp_path, monkeypatch, bulk=False)
+        bulk, bulk_indexes = self._load(tmp_path, monkeypatch, bulk=True)
+        assert bulk == per_file
+        assert bulk == [
+            ('1', 100.0, 'Johor', '2026-05-01', None),
+            ('2', 300.0, 'Johor', '2026-05-01', '2026-05-02'),  # later file wins
+            ('3', None, 'Perak', '2026-04-01', '2026-05-02'),   # first_seen kept
+            ('9', 9.0, None, '2026-04-01', None),
+        ]
+        assert bulk_indexes == per_file_indexes == set(load_to_db._index_names())
+
+
+class TestIncrementalDedup:
+    def _listing(self, ads_id, rent=1000.0, address='Jalan 1', **extra):
+        row = {'ads_id': ads_id, 'monthly_rent': rent, 'property_type': 'Condominium',
+               'state': 'Selangor', 'region': 'Shah Alam', 'rooms': '3', 'bathroom': '2',
+               'size': 900.0, 'address': address, 'publishedDatetime': '05/01/2026',
+               'scrape_date': '2026-05-01'}
+        row.update(extra)
+        return row
+
+    def test_hash_matches_stored_values(self, in_memory_conn):
+        bound = pd.DataFrame([self._listing('1', rent=1200, rooms=3, size='900')])
+        load_to_db.upsert_dataframe(in_memory_conn, bound)
+        *stored, stored_hash = in_memory_conn.execute(
+            f"SELECT {load_to_db._DEDUP_COLS}, content_hash FROM properties"
+        ).fetchone()
+        assert stored[0] == 1200.0 and stored[4] == '3'
+        assert load_to_db.content_hash(stored) == stored_hash
+        assert stored_hash == load_to_db.content_hash(
+            [1200.0, 'Condominium', 'Selangor', 'Shah Alam', '3', '2', 900.0, 'Jalan 1', '05/01/2026'])
+
+    def test_only_touched_groups_are_deduped(self, in_memory_conn):
+        # An untouched duplicate pair already in the table (e.g. from before a
+        # failed full dedup) is left alone; the load's own duplicates are removed.
+        load_to_db.upsert_dataframe(in_memory_conn, pd.DataFrame([
+            self._listing('10', address='Old'), self._listing('11', address='Old'),
+            self._listing('20'),
+        ]))
+        hashes: set = set()
+        load_to_db.upsert_dataframe(in_memory_conn, pd.DataFrame([
+            self._listing('05'), self._listing('30', rent=2000.0),
+        ]), hashes=hashes)
+        assert load_to_db._dedup(in_memory_conn, hashes) == 1
+        ids = [r[0] for r in in_memory_conn.execute("SELECT ads_id FROM properties ORDER BY ads_id")]
+        assert ids == ['05', '10', '11', '30']  # '20' duplicated '05' -> lowest ads_id kept
+        assert load_to_db._dedup(in_memory_conn) == 1  # a full pass still catches 10/11
+
+    def test_matches_full_scan(self, in_memory_conn):
+        import random
+        rng = random.Random(7)
+        rows = lambda start, n: pd.DataFrame([
+            self._listing(f"{start + i:05d}", rent=float(rng.choice([900, 1000, 1100])),
+                          address=rng.choice(['A', 'B', None]), rooms=rng.choice(['2', '3', None]))
+            for i in range(n)
+        ])
+        load_to_db.upsert_dataframe(in_memory_conn, rows(0, 200))
+        load_to_db._dedup(in_memory_conn)
+        hashes: set = set()
+        load_to_db.upsert_dataframe(in_memory_conn, rows(150, 200), hashes=hashes)  # overlaps
+        snapshot = list(in_memory_conn.iterdump())
+
+        incremental = load_to_db._dedup(in_memory_conn, hashes)
+        after_incremental = in_memory_conn.execute("SELECT ads_id FROM properties ORDER BY ads_id").fetchall()
+        full = sqlite3.connect(":memory:")
+        full.executescript("\n".join(snapshot))
+        assert load_to_db._dedup(full) == incremental > 0
+        assert full.execute("SELECT ads_id FROM properties ORDER BY ads_id").fetchall() == after_incremental
+
+    def test_plan_uses_fingerprint_index(self, in_memory_conn):
+        in_memory_conn.execute(load_to_db.CONTENT_HASH_INDEX_SQL)
+        in_memory_conn.execute(load_to_db.CREATE_DEDUP_PENDING_SQL)
+        plan = " ".join(r[-1] for r in in_memory_conn.execute(
+            "EXPLAIN QUERY PLAN SELECT ads_id FROM properties "
+            f"WHERE content_hash IN (SELECT content_hash FROM {config.DEDUP_PENDING_TABLE})"))
+        assert "idx_content_hash" in plan and "SCAN properties" not in plan
+
+    def test_hashes_survive_a_crash_before_dedup(self, tmp_path):
+        conn = sqlite3.connect(tmp_path / "rent.db")
+        conn.execute(load_to_db.CREATE_TABLE_SQL)
+        load_to_db.upsert_dataframe(conn, pd.DataFrame([self._listing('20')]))
+        load_to_db.upsert_dataframe(conn, pd.DataFrame([self._listing('05')]), hashes=set())
+        conn.commit()
+        conn.close()  # the run dies here, before its _dedup
+
+        conn = sqlite3.connect(tmp_path / "rent.db")
+        assert load_to_db._dedup(conn, set()) == 1  # the next run's (unrelated) load
+        assert [r[0] for r in conn.execute("SELECT ads_id FROM properties")] == ['05']
+        assert conn.execute(f"SELECT COUNT(*) FROM {config.DEDUP_PENDING_TABLE}").fetchone() == (0,)
+        conn.close()
+
+    def test_rolled_back_upsert_queues_nothing(self, in_memory_conn):
+        in_memory_conn.execute(load_to_db.CREATE_DEDUP_PENDING_SQL)
+        load_to_db.upsert_dataframe(in_memory_conn, pd.DataFrame([self._listing('1')]), hashes=set())
+        in_memory_conn.rollback()
+        assert in_memory_conn.execute(
+            f"SELECT COUNT(*) FROM {config.DEDUP_PENDING_TABLE}").fetchone() == (0,)
+
+    def test_ensure_schema_fingerprints_existing_rows(self):
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE properties (ads_id TEXT PRIMARY KEY, monthly_rent REAL, "
+                     "state TEXT, scrape_date TEXT)")
+        conn.execute("INSERT INTO properties VALUES ('1', 900, 'Perak', '2026-05-01')")
+        load_to_db.ensure_schema(conn)
+        (h,) = conn.execute("SELECT content_hash FROM properties").fetchone()
+        assert h == load_to_db.content_hash([900.0, None, 'Perak', None, None, None, None, None, None])
@@ -82,8 +82,15 @@ def test_search_retries_on_403_rate_limit(monkeypatch):
 
 @responses.activate
 def test_search_honors_retry_after_header(monkeypatch):
+    now = [0.0]
     waits = []
-    monkeypatch.setattr("scripts.mudah_api.time.sleep", lambda s: waits.append(s))
+
+    def fake_sleep(s):
+        waits.append(s)
+        now[0] += s
+
+    monkeypatch.setattr("scripts.mudah_api.time.monotonic", lambda: now[0])
+    monkeypatch.setattr("scripts.mudah_api.time.sleep", fake_sleep)
     responses.add(
         responses.GET, "https://search.mudah.my/v1/search",
         status=429, headers={"Retry-After": "7"},
@@ -93,7 +100,8 @@ def test_search_honors_retry_after_header(monkeypatch):
         json={"data": [], "meta": {}}, status=200,
     )
     mudah_api.search(region="8", offset=0)
-    assert waits == [7.0]
+    # The pause is global (held by the limiter), so it's measured against the clock.
+    assert waits == [pytest.approx(7.0, abs=0.05)]
 
 
 @responses.activate
@@ -270,3 +278,172 @@ def test_no_commercial_ids_in_residential_types():
     non_residential = {21, 22, 23, 24, 25, 26, 27, 28, 29, 31, 32, 33, 34, 35, 36}
     overlap = non_residential & set(config.RESIDENTIAL_PROPERTY_TYPE_IDS)
     assert not overlap, f"non-residential property_type_ids in config: {sorted(overlap)}"
+
+
+@responses.activate
+def test_search_and_lookup_share_pooled_client(monkeypatch):
+    monkeypatch.setattr("scripts.mudah_api.time.sleep", lambda _: None)
+    client = mudah_api.get_client()
+    responses.add(responses.GET, "https://search.mudah.my/v1/search", status=429)
+    for _ in range(2):
+        responses.add(
+            responses.GET, "https://search.mudah.my/v1/search",
+            json={"data": [], "meta": {}}, status=200,
+        )
+    mudah_api.search(region="8", offset=0)
+    mudah_api.lookup(1)
+    assert mudah_api.get_client() is client
+    stats = mudah_api.client_stats()
+    assert stats["requests"] == 3
+    assert stats["retries"] == 1
+    assert responses.calls[0].request.headers["User-Agent"] == config.API_USER_AGENT
+    assert "gzip" in responses.calls[0].request.headers["Accept-Encoding"]
+
+
+@responses.activate
+def test_client_retry_policy_is_configurable(monkeypatch):
+    monkeypatch.setattr("scripts.mudah_api.time.sleep", lambda _: None)
+    mudah_api.configure(max_retries=0, limiter=mudah_api.TokenBucket(rate=0))
+    responses.add(responses.GET, "https://search.mudah.my/v1/search", status=429)
+    try:
+        with pytest.raises(Exception):
+            mudah_api.lookup(1)
+        assert len(responses.calls) == 1
+    finally:
+        mudah_api.configure()
+
+
+def test_token_bucket_paces_after_burst(monkeypatch):
+    clock = [0.0]
+    waits = []
+
+    def fake_sleep(s):
+        waits.append(s)
+        clock[0] += s
+
+    monkeypatch.setattr("scripts.mudah_api.time.monotonic", lambda: clock[0])
+    monkeypatch.setattr("scripts.mudah_api.time.sleep", fake_sleep)
+    bucket = mudah_api.TokenBucket(rate=2.0, burst=2)
+    for _ in range(4):
+        bucket.acquire()
+    # Two burst tokens are free; the next two each wait 1/rate.
+    assert waits == pytest.approx([0.5, 0.5])
+
+
+class TestAdaptiveRateLimiter:
+    @pytest.fixture
+    def clock(self, monkeypatch):
+        now = [0.0]
+        waits = []
+
+        def fake_sleep(s):
+            waits.append(s)
+            now[0] += s
+
+        monkeypatch.setattr("scripts.mudah_api.time.monotonic", lambda: now[0])
+        monkeypatch.setattr("scripts.mudah_api.time.sleep", fake_sleep)
+        return waits
+
+    def test_additive_increase_on_clean_responses(self, clock):
+        lim = mudah_api.AdaptiveRateLimiter(rate=1.0, max_rate=1.2)
+        for _ in range(10):
+            lim.on_success()
+        assert lim.rate == pytest.approx(1.2)  # capped at max_rate
+
+    def test_throttle_halves_rate_and_pauses_all_callers(self, clock):
+        lim = mudah_api.AdaptiveRateLimiter(rate=2.0, min_rate=0.2)
+        lim.on_throttle(30.0)
+        assert lim.rate == pytest.approx(2.0 * config.API_RATE_DECREASE)
+        lim.acquire()
+        # any caller sleeps out the pause, then waits for a fresh token
+        assert clock == [pytest.approx(30.0), pytest.approx(1 / lim.rate)]
+
+    def test_pause_reaches_callers_already_waiting(self, monkeypatch):
+        now = [0.0]
+        lim = mudah_api.AdaptiveRateLimiter(rate=1.0, burst=1, min_rate=1.0)
+
+        def fake_sleep(s):
+            if now[0] < 0.2 <= now[0] + s:
+                # Another thread is throttled while this caller sleeps for a token.
+                now[0] = 0.2
+                lim.on_throttle(5.0)
+                s -= 0.2
+            now[0] += s
+
+        monkeypatch.setattr("scripts.mudah_api.time.monotonic", lambda: now[0])
+        monkeypatch.setattr("scripts.mudah_api.time.sleep", fake_sleep)
+        lim.acquire()  # the burst token
+        lim.acquire()  # waits 1 s for a token; the pause lands 0.2 s in
+        # Out at pause end (5.2 s) plus one token interval — no burst after the pause.
+        assert now[0] == pytest.approx(6.2)
+
+    def test_learned_rate_persists_across_runs(self, clock, tmp_path):
+        state = tmp_path / "rate.json"
+        lim = mudah_api.AdaptiveRateLimiter(rate=3.0, state_file=state)
+        lim.on_throttle(0)
+        lim.save()
+        assert mudah_api.AdaptiveRateLimiter(state_file=state).rate == pytest.approx(1.5)
+
+    @responses.activate
+    def test_client_feeds_status_back_to_limiter(self, clock):
+        lim = mudah_api.AdaptiveRateLimiter(rate=1.0)
+        mudah_api.configure(limiter=lim)
+        responses.add(responses.GET, "https://search.mudah.my/v1/search",
+                      status=429, headers={"Retry-After": "5"})
+        responses.add(responses.GET, "https://search.mudah.my/v1/search",
+                      json={"data": [], "meta": {}}, status=200)
+        mudah_api.lookup(1)
+        assert lim.throttles == 1
+        assert lim.rate == pytest.approx(1.0 * config.API_RATE_DECREASE + config.API_RATE_INCREASE)
+
+
+@responses.activate
+def test_iter_listings_fans_out_remaining_pages_in_offset_order():
+    import json
+    import urllib.parse
+    n = config.API_PAGE_SIZE
+    total = 3 * n + 6
+
+    def page(request):
+        offset = int(urllib.parse.parse_qs(urllib.parse.urlparse(request.url).query)["from"][0])
+        ids = range(offset, min(offset + n, total))
+        body = {"data": [{"attributes": {"list_id": i}} for i in ids],
+                "meta": {"total-results": total}}
+        return 200, {}, json.dumps(body)
+
+    responses.add_callback(responses.GET, "https://search.mudah.my/v1/search", callback=page)
+    totals = []
+    items = list(mudah_api.iter_listings(region="8", max_pages=10,
+                                         on_total=totals.append, concurrency=3))
+
+    assert [i["attributes"]["list_id"] for i in items] == list(range(total))
+    assert totals == [total]
+    assert len(responses.calls) == 4  # page one + three fanned-out offsets
+
+
+@responses.activate
+def test_iter_listings_total_is_clamped_to_offset_cap():
+    n = config.API_PAGE_SIZE
+    page = {"data": [{"attributes": {"list_id": i}} for i in range(n)],
+            "meta": {"total-results": 36393}}
+    responses.add(responses.GET, "https://search.mudah.my/v1/search", json=page, status=200)
+    totals = []
+    gen = mudah_api.iter_listings(region="8", max_pages=500, on_total=totals.append)
+    next(gen)
+    gen.close()
+    assert totals == [config.API_OFFSET_CAP]
+
+
+@responses.activate
+def test_iter_listings_stops_at_watermark_page():
+    n = config.API_PAGE_SIZE
+    # Newest-first: page one is all new, page two straddles the mark, page three is old.
+    pages = [range(3 * n, 2 * n, -1), range(2 * n, n, -1), range(n, 0, -1)]
+    for ids in pages:
+        responses.add(responses.GET, "https://search.mudah.my/v1/search", status=200, json={
+            "data": [{"attributes": {"list_id": i}} for i in ids],
+            "meta": {"total-results": 10 * n},
+        })
+    items = list(mudah_api.iter_listings(region="8", max_pages=10, stop_before=2 * n - 10))
+    assert len(responses.calls) == 3  # stopped after the first all-old page
+    assert len(items) == 3 * n
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import config
+from scripts import aggregates, load_to_db, query
+
+STATES = {'Selangor': ['Shah Alam', 'Klang'], 'Johor': ['Johor Bahru']}
+
+
+@pytest.fixture
+def conn(conn, db_file):
+    """The shared loader DB filled with 300 listings; yields a read-only query connection."""
+    rng = np.random.default_rng(0)
+    rows = []
+    for i in range(300):
+        state = ['Selangor', 'Johor'][i % 2]
+        regions = STATES[state]
+        rows.append({
+            'ads_id': str(1000 + i), 'monthly_rent': float(rng.integers(5, 60) * 100),
+            'state': state, 'region': regions[(i // 2) % len(regions)],
+            'CPI': ['Condominium', 'Terrace', 'Room'][i % 3], 'rooms': str(1 + i % 4),
+            'size': 900.0, 'address': f'Jalan {i}',
+            'scrape_date': ['2026-05-04', '2026-05-12'][(i // 3) % 2],
+        })
+    for i in range(0, 60, 4):  # unpriced rows, bunched into a few groups
+        rows[i]['monthly_rent'] = None
+    load_to_db.upsert_dataframe(conn, pd.DataFrame(rows))
+    conn.execute(f"UPDATE {config.DB_TABLE} SET availability_status = 'rented' "
+                 f"WHERE CAST(ads_id AS INTEGER) % 7 = 0")
+    conn.commit()
+    aggregates.refresh(conn)
+    reader = query.connect(db_file)
+    yield reader
+    reader.close()
+
+
+def _table(conn):
+    return pd.read_sql_query(f"SELECT * FROM {config.DB_TABLE}", conn)
+
+
+def _plan(conn, sql, params):
+    return [r[-1] for r in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+@pytest.mark.parametrize("filters, search", [
+    (dict(state='Selangor'), "idx_summary_group (state=?)"),
+    (dict(state='Johor', max_rent=2000), "idx_summary_group (state=?)"),
+    (dict(state='Johor', status='active'), "idx_summary_group (state=?)"),
+    (dict(state='Selangor', region='Klang', cpi='Terrace', rooms='2'),
+     "idx_summary_group (state=? AND region=? AND CPI=? AND rooms=?)"),
+    (dict(cpi='Condominium', min_rent=1000, max_rent=3000),
+     "idx_query_cpi_rent (CPI=? AND monthly_rent>? AND monthly_rent<?)"),
+    (dict(status='rented', max_rent=2500),
+     "idx_query_status_rent (availability_status=? AND monthly_rent<?)"),
+])
+def test_listings_are_index_driven(conn, filters, search):
+    plan = _plan(conn, *query._listings_sql(**filters))
+    assert plan[0].startswith(f"SEARCH {config.DB_TABLE} USING INDEX") and plan[0].endswith(search), plan
+    assert not any(step.startswith(f"SCAN {config.DB_TABLE}") for step in plan), plan
+
+
+def test_listings_filters(conn):
+    df = query.listings(conn, state='Selangor', cpi='Condominium', min_rent=1000,
+                        max_rent=3000, status='active')
+    t = _table(conn)
+    want = t[(t.state == 'Selangor') & (t.CPI == 'Condominium') & t.monthly_rent.between(1000, 3000)
+             & (t.availability_status == 'active')]
+    assert sorted(df['ads_id']) == sorted(want['ads_id']) and len(df) > 0
+    assert list(df.columns) == query.LISTING_COLUMNS
+    assert df['monthly_rent'].is_monotonic_increasing
+    assert len(query.listings(conn, cpi='Room', limit=5)) == 5
+    with pytest.raises(ValueError, match="region"):
+        query.listings(conn, region='Klang')
+
+
+def test_rent_percentiles(conn):
+    out = query.rent_percentiles(conn, 'Selangor', cpi='Terrace', percentiles=(10, 50))
+    t = _table(conn)
+    t = t[(t.state == 'Selangor') & (t.CPI == 'Terrace') & (t.availability_status == 'active')
+          & t.monthly_rent.notna()]
+    assert list(out.index) == ['Klang', 'Shah Alam']
+    assert list(out.columns) == ['listings', 'p10', 'p50']
+    for region, g in t.groupby('region'):
+        assert out.loc[region, 'listings'] == len(g)
+        assert out.loc[region, 'p50'] == g.monthly_rent.median()
+        assert out.loc[region, 'p10'] == pytest.approx(g.monthly_rent.quantile(0.1))
+    assert query.rent_percentiles(conn, 'Perlis').empty
+
+    plan = _plan(conn, *query._percentiles_sql('Selangor', 'Terrace'))
+    assert plan == [f"SEARCH {config.DB_TABLE} USING COVERING INDEX idx_summary_group (state=?)"]
+
+
+def test_weekly_summary(conn):
+    out = query.weekly_summary(conn, 'Selangor', region='Shah Alam')
+    t = _table(conn)
+    t = t[(t.state == 'Selangor') & (t.region == 'Shah Alam')]
+    t['week'] = np.where(t.scrape_date == '2026-05-04', '2026-05-04', '2026-05-11')
+    assert list(out.index) == ['2026-05-04', '2026-05-11']
+    assert list(out.columns) == ['listings', 'active', 'rented', 'expired'] + query.WEEKLY_RENT_COLUMNS
+    for week, g in t.groupby('week'):
+        assert out.loc[week, 'listings'] == len(g)
+        assert out.loc[week, 'rented'] == (g.availability_status == 'rented').sum()
+        # Exact, however many unpriced rows each group holds.
+        assert out.loc[week, 'mean_rent'] == pytest.approx(g.monthly_rent.mean())
+        assert out.loc[week, 'mean_rent_psf'] == pytest.approx((g.monthly_rent / g['size']).mean())
+    assert query.weekly_summary(conn, 'Perlis').empty
+
+    plan = _plan(conn, *query._weekly_sql('Selangor', 'Shah Alam', since='2026-05-01'))
+    assert any("USING INDEX idx_summary_key" in step for step in plan), plan
+
+
+def test_connect_is_read_only(conn):
+    import sqlite3
+    with pytest.raises(sqlite3.OperationalError, match="readonly"):
+        conn.execute(f"DELETE FROM {config.DB_TABLE}")
+
+
+def test_superseded_indexes_are_dropped(tmp_path):
+    conn = load_to_db.connect(tmp_path / "rent.db")
+    conn.execute(f"CREATE INDEX idx_state ON {config.DB_TABLE}(state)")
+    conn.close()
+    conn = load_to_db.connect(tmp_path / "rent.db")
+    names = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    conn.close()
+    assert not names & set(load_to_db.SUPERSEDED_INDEXES)
+    assert {'idx_query_cpi_rent', 'idx_query_status_rent', 'idx_summary_group'} <= names
@@ -37,6 +37,26 @@ class TestDueForCheck:
         assert recheck.due_for_check(None, "2026-05-31", self.TODAY) is True
 
 
+class TestDueSql:
+    """The SQL predicate must agree with due_for_check, which stays the reference."""
+    TODAY = date(2026, 6, 1)
+    DATES = [None, "", "garbage", "2026-06-01", "2026-05-31", "2026-05-29",
+             "2026-05-25", "2026-05-22", "2026-05-11", "2026-04-22", "2026-07-01",
+             "2026-05-30 12:00:00"]
+
+    def test_matches_python_policy(self):
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE t (first_seen TEXT, last_checked_at TEXT)")
+        conn.executemany("INSERT INTO t VALUES (?, ?)",
+                         [(fs, lc) for fs in self.DATES for lc in self.DATES])
+        rows = conn.execute(
+            f"SELECT first_seen, last_checked_at, {recheck.due_sql()} FROM t",
+            {"today": self.TODAY.isoformat()},
+        ).fetchall()
+        for fs, lc, due in rows:
+            assert bool(due) == recheck.due_for_check(fs, lc, self.TODAY), (fs, lc)
+
+
 class TestClassifyGone:
     TODAY = date(2026, 6, 1)
 
@@ -54,6 +74,23 @@ class TestClassifyGone:
         assert recheck.classify_gone("not-a-date", self.TODAY) == "expired"
 
 
+class TestCoveredBySighting:
+    TODAY = date(2026, 6, 1)
+
+    def test_fresh_sighting_covers_due_listing(self):
+        assert recheck.covered_by_sighting("2026-05-30", "2026-05-31", "2026-06-01", self.TODAY)
+
+    def test_no_sighting_not_covered(self):
+        assert not recheck.covered_by_sighting("2026-05-30", None, None, self.TODAY)
+
+    def test_sighting_older_than_last_check_not_covered(self):
+        assert not recheck.covered_by_sighting("2026-04-01", "2026-05-20", "2026-05-10", self.TODAY)
+
+    def test_sighting_too_old_for_cadence_not_covered(self):
+        # weekly cadence; seen 8 days ago -> still due, needs a probe
+        assert not recheck.covered_by_sighting("2026-04-01", "2026-05-01", "2026-05-24", self.TODAY)
+
+
 class TestRecheckIntegration:
     @pytest.fixture
     def db(self, tmp_path, monkeypatch):
@@ -81,8 +118,6 @@ class TestRecheckIntegration:
         return db_path
 
     def test_recheck_marks_gone_and_alive(self, db, monkeypatch):
-        monkeypatch.setattr("scripts.recheck.time.sleep", lambda _: None)
-
         def fake_lookup(list_id):
             return [] if str(list_id) == "gone1" else [{"attributes": {"list_id": list_id}}]
 
@@ -106,3 +141,123 @@ class TestRecheckIntegration:
         assert rows["alive1"][1] is None
         # rented1: terminal, untouched
         assert rows["rented1"][0] == "rented"
+
+    def test_sweep_mode_skips_probes_for_sighted_listings(self, db, monkeypatch):
+        conn = sqlite3.connect(db)
+        conn.execute(recheck.watermarks.CREATE_SIGHTINGS_SQL)
+        conn.execute(
+            "INSERT INTO listing_sightings (ads_id, region, property_type_id, seen_date) "
+            "VALUES ('alive1', '8', 1, ?)", (date.today().isoformat(),)
+        )
+        conn.commit()
+        conn.close()
+
+        probed = []
+
+        def fake_lookup(list_id):
+            probed.append(str(list_id))
+            return []
+
+        monkeypatch.setattr(recheck.mudah_api, "lookup", fake_lookup)
+        recheck.recheck(mode="sweep")
+
+        assert probed == ["gone1"]
+        conn = sqlite3.connect(db)
+        status, checked = conn.execute(
+            "SELECT availability_status, last_checked_at FROM properties WHERE ads_id='alive1'"
+        ).fetchone()
+        conn.close()
+        assert status == "active"
+        assert checked == date.today().isoformat()
+
+    def test_select_due_orders_most_overdue_first(self, db):
+        conn = sqlite3.connect(db)
+        conn.executemany(
+            "INSERT INTO properties (ads_id, first_seen, last_checked_at, availability_status) "
+            "VALUES (?, '2026-01-01', ?, 'active')",
+            [("week_over", "2026-05-18"), ("just_due", "2026-05-25"),
+             ("fresh", "2026-05-31")],
+        )
+        conn.commit()
+        due = [r[0] for r in recheck.select_due(conn, date(2026, 6, 1))]
+        assert "fresh" not in due and "rented1" not in due
+        # never-checked first (gone1/alive1), then by days past due
+        assert set(due[:2]) == {"gone1", "alive1"}
+        assert due[2:] == ["week_over", "just_due"]
+        assert len(recheck.select_due(conn, date(2026, 6, 1), limit=3)) == 3
+        conn.close()
+
+    def test_unknown_mode_rejected(self, db):
+        with pytest.raises(ValueError, match="mode"):
+            recheck.recheck(mode="batch")
+
+    def test_worker_pool_batches_writes_and_survives_failures(self, db, monkeypatch):
+        conn = sqlite3.connect(db)
+        conn.executemany(
+            "INSERT INTO properties (ads_id, first_seen, availability_status) "
+            "VALUES (?, '2026-05-30', 'active')",
+            [(f"x{i}",) for i in range(20)],
+        )
+        conn.commit()
+        conn.close()
+
+        def fake_lookup(list_id):
+            if list_id == "x3":
+                raise RuntimeError("boom")
+            return [] if str(list_id) == "gone1" else [{"attributes": {"list_id": list_id}}]
+
+        flushes = []
+        real_flush = recheck._ResultWriter.flush
+
+        def counting_flush(self):
+            flushes.append(len(self._alive) + len(self._gone))
+            real_flush(self)
+
+        monkeypatch.setattr(recheck.mudah_api, "lookup", fake_lookup)
+        monkeypatch.setattr(recheck._ResultWriter, "flush", counting_flush)
+        recheck.recheck(workers=4, commit_every=5)
+
+        conn = sqlite3.connect(db)
+        checked = dict(conn.execute("SELECT ads_id, last_checked_at FROM properties"))
+        status = conn.execute(
+            "SELECT availability_status FROM properties WHERE ads_id='gone1'"
+        ).fetchone()[0]
+        conn.close()
+
+        # 22 due, one failed lookup -> 21 written in batches of 5
+        assert sum(flushes) == 21
+        assert max(flushes) == 5
+        assert checked["x3"] is None
+        assert all(checked[f"x{i}"] == date.today().isoformat() for i in range(20) if i != 3)
+        assert status == "rented"
+
+    def test_interrupt_keeps_finished_results(self, db, monkeypatch):
+        conn = sqlite3.connect(db)
+        conn.executemany(
+            "INSERT INTO properties (ads_id, first_seen, availability_status) "
+            "VALUES (?, '2026-05-30', 'active')",
+            [(f"x{i}",) for i in range(50)],
+        )
+        conn.commit()
+        conn.close()
+
+        calls = []
+
+        def fake_lookup(list_id):
+            calls.append(list_id)
+            if len(calls) == 6:
+                raise KeyboardInterrupt
+            return [{"attributes": {"list_id": list_id}}]
+
+        monkeypatch.setattr(recheck.mudah_api, "lookup", fake_lookup)
+        with pytest.raises(KeyboardInterrupt):
+            recheck.recheck(workers=1, commit_every=1000)
+
+        conn = sqlite3.connect(db)
+        checked = {r[0] for r in conn.execute(
+            "SELECT ads_id FROM properties WHERE last_checked_at IS NOT NULL")}
+        conn.close()
+        # Lookups finished around the interrupt are written despite commit_every,
+        # and the bounded window stopped the queue from draining the backlog.
+        assert set(calls[:5]) <= checked <= set(calls) - {calls[5]}
+        assert len(calls) <= 6 + 2
@@ -0,0 +1,98 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import config
+from scripts import load_to_db, schema_v2
+
+V1_COLUMNS = ['ads_id'] + [c for c in load_to_db.COLUMN_DEFS]
+
+
+def _rows(start=100, n=3, **extra):
+    rows = []
+    for i in range(n):
+        row = {
+            'ads_id': str(start + i), 'monthly_rent': 1000.0 + i, 'property_type': 'Condominium',
+            'property_type_id': '2020', 'category_id': 'Apartment / Condominium',
+            'CPI': 'Condominium', 'state': 'Selangor', 'region': ['Shah Alam', 'Klang'][i % 2],
+            'subarea_id': '123.0', 'rooms': ['3', 'More than 10', None][i % 3], 'bathroom': '2',
+            'size': 850.0, 'address': f'Jalan {i}', 'seller_name': None, 'company_ad': '1',
+            'ad_seller_type': 'agent', 'store_verified': 'Yes',
+            'ad_expiry': '2026-07-01 12:30:00', 'latitude': 3.07, 'longitude': 101.52,
+            'publishedDatetime': '05/01/2026', 'scrape_date': '2026-05-01',
+            'adviewUrl': f'https://www.mudah.my/x-{start + i}.htm',
+        }
+        row.update(extra)
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture
+def db(conn, db_file, tmp_path):
+    """(v1 connection, its path, the v2 export path)."""
+    return conn, db_file, tmp_path / "rent_v2.db"
+
+
+def _decoded(conn, table):
+    cols = ", ".join(V1_COLUMNS)
+    return conn.execute(f"SELECT {cols} FROM {table} ORDER BY ads_id").fetchall()
+
+
+def _expected(conn):
+    rows = _decoded(conn, config.DB_TABLE)
+    # subarea_id is stored as an integer id in v2.
+    i = V1_COLUMNS.index('subarea_id')
+    return [r[:i] + (str(int(float(r[i]))) if r[i] else None,) + r[i + 1:] for r in rows]
+
+
+def _export(db):
+    conn, db_file, out_file = db
+    conn.commit()
+    rows = schema_v2.export(db_file, out_file)
+    v2 = sqlite3.connect(out_file)
+    try:
+        return rows, _decoded(v2, schema_v2.V2_VIEW), v2.execute(
+            "SELECT name FROM lk_region ORDER BY name").fetchall()
+    finally:
+        v2.close()
+
+
+def test_view_round_trips_v1(db):
+    conn, db_file, out_file = db
+    load_to_db.upsert_dataframe(conn, _rows())
+    rows, decoded, regions = _export(db)
+    assert rows == 3
+    assert decoded == _expected(conn)
+    assert regions == [('Klang',), ('Shah Alam',)]
+    v2 = sqlite3.connect(out_file)
+    assert v2.execute("SELECT typeof(ads_id), typeof(scrape_date_day), typeof(state_code) "
+                      f"FROM {schema_v2.V2_TABLE} LIMIT 1").fetchone() == ('integer',) * 3
+    v2.close()
+    # The export lives in its own file; the pipeline's DB gains nothing.
+    names = {r[0] for r in conn.execute("SELECT name FROM sqlite_master")}
+    assert schema_v2.V2_TABLE not in names and 'lk_region' not in names
+
+
+def test_re_export_follows_v1_and_prunes_lookups(db):
+    conn, _, _ = db
+    load_to_db.upsert_dataframe(conn, _rows())
+    _export(db)
+    # upsert conflict (UPDATE), recheck-style update, dedup-style delete
+    load_to_db.upsert_dataframe(conn, _rows(start=101, n=1, monthly_rent=2222.0, state='Johor'))
+    conn.execute(f"UPDATE {config.DB_TABLE} SET availability_status = 'rented', "
+                 f"gone_at = '2026-05-03' WHERE ads_id = '102'")
+    conn.execute(f"DELETE FROM {config.DB_TABLE} WHERE ads_id = '100'")
+    rows, decoded, regions = _export(db)
+    assert rows == 2
+    assert decoded == _expected(conn)
+    assert [r[0] for r in decoded] == ['101', '102']
+    assert regions == [('Shah Alam',)]  # 101 moved out of Klang, its only listing
+
+
+def test_export_skips_non_numeric_ids(db):
+    conn, _, _ = db
+    load_to_db.upsert_dataframe(conn, _rows(n=5))
+    conn.execute(f"INSERT INTO {config.DB_TABLE} (ads_id) VALUES ('not-a-number')")
+    _, decoded, _ = _export(db)
+    assert decoded == [r for r in _expected(conn) if r[0].isdigit()]
@@ -0,0 +1,81 @@
+import sys
+
+import pandas as pd
+import pytest
+
+from scripts import staging
+
+
+@pytest.fixture
+def cleaned_df():
+    return pd.DataFrame({
+        'ads_id': [100, 200],                  # int64, as read_csv infers it from raw
+        'monthly_rent': [1200.0, None],
+        'rooms': ['3', None],
+        'subarea_id': ['0123', '45'],
+        'latitude': ['3.07', ''],
+        'CPI': ['Apartment', 'Other'],
+        'extra': [1, 2],
+    })
+
+
+def test_csv_round_trip_keeps_schema(tmp_path, cleaned_df):
+    path = tmp_path / "x.csv"
+    staging.write(cleaned_df, path)
+    df = staging.read(path)
+    assert df['ads_id'].tolist() == ['100', '200']
+    assert df['subarea_id'].tolist() == ['0123', '45']   # leading zero survives
+    assert str(df['rooms'].dtype) == 'string' and df['rooms'].isna().tolist() == [False, True]
+    assert df['monthly_rent'].dtype == 'float64'
+    assert df['latitude'].tolist()[0] == 3.07 and pd.isna(df['latitude'].iloc[1])
+    assert df['extra'].tolist() == ['1', '2']
+
+
+def test_parquet_round_trip_matches_csv(tmp_path, cleaned_df):
+    pytest.importorskip("pyarrow")
+    staging.write(cleaned_df, tmp_path / "x.csv")
+    staging.write(cleaned_df, tmp_path / "x.parquet")
+    pd.testing.assert_frame_equal(staging.read(tmp_path / "x.parquet"),
+                                  staging.read(tmp_path / "x.csv"))
+
+
+def test_parquet_without_pyarrow_says_so(tmp_path, cleaned_df, monkeypatch):
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    with pytest.raises(ImportError, match="STAGING_FORMAT"):
+        staging.write(cleaned_df, tmp_path / "x.parquet")
+
+
+def test_paths_and_format_selection(tmp_path, monkeypatch):
+    import config
+    raw = tmp_path / "raw" / "selangor_1_apartment.csv"
+    monkeypatch.setattr(config, "STAGING_FORMAT", "parquet")
+    assert staging.staged_path(tmp_path, raw).name == "selangor_1_apartment.parquet"
+    assert staging.existing_staged(tmp_path, raw) is None
+    (tmp_path / "selangor_1_apartment.csv").write_text("ads_id\n1\n")
+    assert staging.existing_staged(tmp_path, raw).suffix == ".csv"
+    assert staging.staged_files(tmp_path) == [tmp_path / "selangor_1_apartment.csv"]
+    with pytest.raises(ValueError, match="staging format"):
+        staging.suffix("feather")
+
+
+def test_load_reads_any_staged_format(tmp_path, monkeypatch, cleaned_df):
+    import sqlite3
+    import config
+    from scripts import load_to_db
+
+    processed, raw = tmp_path / "processed", tmp_path / "raw" / "selangor"
+    processed.mkdir()
+    raw.mkdir(parents=True)
+    monkeypatch.setattr(config, "PROCESSED_DATA_DIR", processed)
+    monkeypatch.setattr(config, "RAW_DATA_DIR", tmp_path / "raw")
+    monkeypatch.setattr(config, "DB_FILE", tmp_path / "rent.db")
+    (raw / "a.csv").write_text("raw\n")
+    staging.write(cleaned_df, processed / "a.csv")
+
+    load_to_db.load_processed_files()
+
+    conn = sqlite3.connect(config.DB_FILE)
+    rows = conn.execute("SELECT ads_id, typeof(ads_id), subarea_id FROM properties ORDER BY ads_id").fetchall()
+    conn.close()
+    assert rows == [('100', 'text', '0123'), ('200', 'text', '45')]
+    assert not (processed / "a.csv").exists() and not (raw / "a.csv").exists()
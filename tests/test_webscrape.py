@@ -8,6 +8,7 @@ import pytest
 sys.path.insert(0, str(Path(__file__).parent.parent))
 import config
 from scripts import scrape
+from scripts.known_ids import KnownIds
 
 
 def _make_db(path: Path, ads_ids: list) -> None:
@@ -28,28 +29,69 @@ SAMPLE_ITEMS = [_make_item("111"), _make_item("222"), _make_item("333")]
 class TestLoadKnownAdsIds:
     def test_no_db_returns_empty_set(self, monkeypatch, tmp_path):
         monkeypatch.setattr(config, "DB_FILE", tmp_path / "nonexistent.db")
-        assert scrape._load_known_ads_ids() == set()
+        assert set(scrape._load_known_ads_ids()) == set()
 
     def test_empty_table_returns_empty_set(self, monkeypatch, tmp_path):
         db_path = tmp_path / "test.db"
         _make_db(db_path, [])
         monkeypatch.setattr(config, "DB_FILE", db_path)
         monkeypatch.setattr(config, "DB_TABLE", "properties")
-        assert scrape._load_known_ads_ids() == set()
+        assert set(scrape._load_known_ads_ids()) == set()
 
     def test_returns_all_ids(self, monkeypatch, tmp_path):
         db_path = tmp_path / "test.db"
         _make_db(db_path, ["111", "222", "333"])
         monkeypatch.setattr(config, "DB_FILE", db_path)
         monkeypatch.setattr(config, "DB_TABLE", "properties")
-        assert scrape._load_known_ads_ids() == {"111", "222", "333"}
+        assert set(scrape._load_known_ads_ids()) == {"111", "222", "333"}
 
     def test_corrupt_db_returns_empty_set(self, monkeypatch, tmp_path):
         db_path = tmp_path / "corrupt.db"
         db_path.write_bytes(b"not a sqlite file")
         monkeypatch.setattr(config, "DB_FILE", db_path)
         monkeypatch.setattr(config, "DB_TABLE", "properties")
-        assert scrape._load_known_ads_ids() == set()
+        assert set(scrape._load_known_ads_ids()) == set()
+
+
+class TestKnownIdsIndex:
+    def test_membership_accepts_str_and_int(self, tmp_path):
+        db_path = tmp_path / "test.db"
+        _make_db(db_path, ["111", "9", "20"])
+        known = KnownIds.from_db(db_path, "properties")
+        assert "111" in known and 9 in known and "20" in known
+        assert "10" not in known
+        assert len(known) == 3
+
+    def test_incremental_add(self):
+        known = KnownIds()
+        known.update(["5", "3"])
+        assert "3" in known
+        known.compact()
+        assert "5" in known and "4" not in known
+
+    def test_persisted_index_reads_only_new_rows(self, tmp_path):
+        db_path, idx = tmp_path / "test.db", tmp_path / "known.idx"
+        _make_db(db_path, ["111", "222"])
+        KnownIds.from_db(db_path, "properties", index_file=idx)
+        assert idx.exists()
+
+        conn = sqlite3.connect(db_path)
+        conn.execute("INSERT INTO properties VALUES ('333')")
+        conn.commit()
+        conn.close()
+        known = KnownIds.from_db(db_path, "properties", index_file=idx)
+        assert set(known) == {"111", "222", "333"}
+
+    def test_persisted_index_rebuilt_after_deletes(self, tmp_path):
+        db_path, idx = tmp_path / "test.db", tmp_path / "known.idx"
+        _make_db(db_path, ["111", "222"])
+        KnownIds.from_db(db_path, "properties", index_file=idx)
+
+        conn = sqlite3.connect(db_path)
+        conn.execute("DELETE FROM properties WHERE ads_id = '111'")
+        conn.commit()
+        conn.close()
+        assert set(KnownIds.from_db(db_path, "properties", index_file=idx)) == {"222"}
 
 
 class TestScrapeFiltering:
@@ -93,6 +135,15 @@ class TestScrapeFiltering:
         scrape.scrape("selangor", max_pages=1)
         assert mock_api.to_csv_row.call_count == 0
 
+    def test_shared_index_learns_scraped_ids(self, monkeypatch, tmp_path):
+        mock_api = self._patch_common(monkeypatch, tmp_path, ["111"])
+        known = scrape._load_known_ads_ids()
+        list(scrape.iter_row_batches("selangor", max_pages=1, known=known, progress=False))
+        assert "333" in known  # a later window in the same run skips it
+        mock_api.iter_listings.return_value = iter(list(SAMPLE_ITEMS))
+        list(scrape.iter_row_batches("selangor", max_pages=1, known=known, progress=False))
+        assert mock_api.to_csv_row.call_count == 2
+
 
 def test_backfill_imports_without_error():
     """Regression: backfill_geocode previously referenced _geocode_query which doesn't exist."""
@@ -101,3 +152,335 @@ def test_backfill_imports_without_error():
         if 'backfill' in key:
             del sys.modules[key]
     import scripts.backfill_geocode  # must not raise AttributeError
+
+
+def _fake_batches(state, property_type_id, **kwargs):
+    # The same listing surfaces under every type -> deduped in the combined file.
+    yield [{"ads_id": f"{state}-1"}]
+    yield [{"ads_id": f"{state}-{property_type_id}"}]
+
+
+def test_scrape_states_concurrent_writes_checkpoints_and_combined(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "RAW_DATA_DIR", tmp_path)
+    monkeypatch.setattr(config, "REGION_CODES", {"selangor": "8", "johor": "12"})
+    monkeypatch.setattr(scrape, "_load_geocache", lambda: {})
+    monkeypatch.setattr(scrape, "_save_geocache", lambda c: None)
+    monkeypatch.setattr(scrape, "iter_row_batches", _fake_batches)
+
+    results = scrape.scrape_states_concurrent(
+        ["selangor", "johor"], concurrency=4, property_type_ids=[1, 2],
+    )
+
+    assert results == {"selangor": 2, "johor": 2}
+    names = sorted(p.name for p in (tmp_path / "selangor").iterdir())
+    assert len(names) == 3  # two per-type checkpoints + one combined
+    combined = [n for n in names if config.SCRAPED_COMBINED_MARKER in n]
+    assert len(combined) == 1
+    ids = scrape.pd.read_csv(tmp_path / "selangor" / combined[0], dtype=str)["ads_id"]
+    assert sorted(ids) == ["selangor-1", "selangor-2"]
+
+
+def test_scrape_states_concurrent_reports_failed_windows(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "RAW_DATA_DIR", tmp_path)
+    monkeypatch.setattr(config, "REGION_CODES", {"selangor": "8", "johor": "12"})
+    monkeypatch.setattr(scrape, "_load_geocache", lambda: {})
+    monkeypatch.setattr(scrape, "_save_geocache", lambda c: None)
+
+    def batches(state, property_type_id, **kwargs):
+        yield from _fake_batches(state, property_type_id)
+        if (state, property_type_id) == ("johor", 2):
+            raise RuntimeError("HTTP 500")
+
+    monkeypatch.setattr(scrape, "iter_row_batches", batches)
+
+    with pytest.raises(scrape.ScrapeError, match="johor") as info:
+        scrape.scrape_states_concurrent(["selangor", "johor"], concurrency=4,
+                                        property_type_ids=[1, 2])
+
+    assert [(state, str(e)) for state, _, e in info.value.failures] == [("johor", "HTTP 500")]
+    assert info.value.counts == {"selangor": 2, "johor": 2}
+    # The failed state keeps its per-type checkpoints but no combined snapshot.
+    assert any(config.SCRAPED_COMBINED_MARKER in p.name for p in (tmp_path / "selangor").iterdir())
+    johor = sorted(p.name for p in (tmp_path / "johor").iterdir())
+    assert len(johor) == 2 and not any(config.SCRAPED_COMBINED_MARKER in n for n in johor)
+
+
+def test_scrape_all_types_appends_batches_to_checkpoints(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "RAW_DATA_DIR", tmp_path)
+    monkeypatch.setattr(config, "REGION_CODES", {"selangor": "8"})
+    monkeypatch.setattr(scrape, "_load_geocache", lambda: {})
+    monkeypatch.setattr(scrape, "_save_geocache", lambda c: None)
+    monkeypatch.setattr(scrape, "iter_row_batches", _fake_batches)
+
+    assert scrape.scrape_all_types("selangor", property_type_ids=[1, 2]) == 2
+
+    type_file = next((tmp_path / "selangor").glob("selangor_2_*.csv"))
+    # Both batches landed in the checkpoint, under a single header row.
+    assert list(scrape.pd.read_csv(type_file, dtype=str)["ads_id"]) == ["selangor-1", "selangor-2"]
+
+
+def test_scrape_all_types_leaves_no_file_for_empty_type(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "RAW_DATA_DIR", tmp_path)
+    monkeypatch.setattr(config, "REGION_CODES", {"selangor": "8"})
+    monkeypatch.setattr(scrape, "_load_geocache", lambda: {})
+    monkeypatch.setattr(scrape, "_save_geocache", lambda c: None)
+    monkeypatch.setattr(scrape, "iter_row_batches", lambda state, **kw: iter(()))
+
+    assert scrape.scrape_all_types("selangor", property_type_ids=[1]) == 0
+    assert list((tmp_path / "selangor").iterdir()) == []
+
+
+class _ListSink:
+    def __init__(self, fail_on=None):
+        self.rows, self.fail_on = [], fail_on
+
+    def write(self, batch):
+        if self.fail_on in [r["ads_id"] for r in batch]:
+            raise RuntimeError("db locked")
+        self.rows.extend(batch)
+        return len(batch)
+
+
+@pytest.mark.parametrize("checkpoint", [False, True])
+def test_scrape_all_types_direct_sink_leaves_no_files(monkeypatch, tmp_path, checkpoint):
+    monkeypatch.setattr(config, "RAW_DATA_DIR", tmp_path)
+    monkeypatch.setattr(config, "REGION_CODES", {"selangor": "8"})
+    monkeypatch.setattr(scrape, "_load_geocache", lambda: {})
+    monkeypatch.setattr(scrape, "_save_geocache", lambda c: None)
+    monkeypatch.setattr(scrape, "iter_row_batches", _fake_batches)
+
+    sink = _ListSink()
+    assert scrape.scrape_all_types("selangor", property_type_ids=[1, 2],
+                                   sink=sink, checkpoint=checkpoint) == 4
+    assert [r["ads_id"] for r in sink.rows] == ["selangor-1", "selangor-1", "selangor-1", "selangor-2"]
+    assert list((tmp_path / "selangor").iterdir()) == []
+
+
+def test_direct_checkpoint_survives_a_failed_window(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "RAW_DATA_DIR", tmp_path)
+    monkeypatch.setattr(config, "REGION_CODES", {"selangor": "8"})
+    monkeypatch.setattr(scrape, "_load_geocache", lambda: {})
+    monkeypatch.setattr(scrape, "_save_geocache", lambda c: None)
+    monkeypatch.setattr(scrape, "iter_row_batches", _fake_batches)
+
+    with pytest.raises(RuntimeError):
+        scrape.scrape_all_types("selangor", property_type_ids=[2],
+                                sink=_ListSink(fail_on="selangor-2"), checkpoint=True)
+    type_file = next((tmp_path / "selangor").glob("selangor_2_*.csv"))
+    assert list(scrape.pd.read_csv(type_file, dtype=str)["ads_id"]) == ["selangor-1", "selangor-2"]
+
+
+def test_scrape_states_concurrent_rejects_unknown_state(monkeypatch):
+    with pytest.raises(ValueError, match="Unknown state"):
+        scrape.scrape_states_concurrent(["atlantis"])
+
+
+class TestIncrementalWatermarks:
+    TODAY = scrape.datetime(2026, 6, 10).date()
+
+    def test_needs_full_sweep_without_mark_or_when_stale(self):
+        from scripts import watermarks
+        assert watermarks.needs_full_sweep(None, self.TODAY)
+        fresh = watermarks.Watermark(500, "2026-06-09 10:00:00", "2026-06-08")
+        stale = watermarks.Watermark(500, "2026-06-09 10:00:00", "2026-06-01")
+        assert not watermarks.needs_full_sweep(fresh, self.TODAY, every_days=7)
+        assert watermarks.needs_full_sweep(stale, self.TODAY, every_days=7)
+
+    def test_second_run_stops_at_recorded_mark(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(config, "DB_FILE", tmp_path / "test.db")
+        monkeypatch.setattr(config, "REGION_CODES", {"selangor": "9"})
+        mock_api = MagicMock()
+        mock_api.iter_listings.side_effect = lambda **kw: iter(list(SAMPLE_ITEMS))
+        mock_api.to_csv_row.side_effect = lambda item: {"ads_id": str(item["attributes"]["list_id"])}
+        mock_api.geocode_query.return_value = ""
+        monkeypatch.setattr(scrape, "mudah_api", mock_api)
+        monkeypatch.setattr(scrape, "geocode", lambda q, c: (None, None))
+
+        def run():
+            return list(scrape.iter_row_batches(
+                "selangor", property_type_id=1, skip_known=False,
+                progress=False, incremental=True,
+            ))
+
+        run()  # no mark yet -> full sweep, records newest list_id 333
+        assert mock_api.iter_listings.call_args.kwargs["stop_before"] is None
+        run()
+        assert mock_api.iter_listings.call_args.kwargs["stop_before"] == 333
+
+
+class TestBackgroundGeocoding:
+    def test_distinct_queries_resolved_once_without_blocking_rows(self):
+        import threading
+        from scripts.geocode_worker import GeocodeWorker
+
+        release = threading.Event()
+        calls = []
+
+        def slow_resolve(queries, cache):
+            release.wait(5)
+            for query in queries:
+                calls.append(query)
+                cache[query] = [3.1, 101.6]
+
+        worker = GeocodeWorker({"Cached, Malaysia": [1.0, 2.0]}, slow_resolve)
+        pairs = [({"address": a}, f"{a}, Malaysia")
+                 for a in ["Shah Alam", "Shah Alam", "Cached", "Klang", "Shah Alam"]]
+        # All rows come out while the resolver is still blocked.
+        rows = list(scrape._geocode_rows(pairs, worker.cache, worker))
+        assert [r["latitude"] for r in rows] == [None, None, 1.0, None, None]
+        assert worker.queued == 2
+
+        release.set()
+        worker.close()
+        assert sorted(calls) == ["Klang, Malaysia", "Shah Alam, Malaysia"]
+        assert worker.fill_rows(rows) == 4
+        assert all(r["latitude"] is not None for r in rows)
+
+    def test_backfill_csv_fills_only_resolved_rows(self, tmp_path):
+        from scripts.geocode_worker import backfill_csv
+
+        path = tmp_path / "out.csv"
+        path.write_text(
+            "ads_id,subarea_id,address,latitude,longitude\n"
+            "1,007,\"Hill10, Shah Alam, Selangor\",,\n"
+            "2,008,\"Nowhere, Perlis\",,\n"
+            "3,009,\"Klang, Selangor\",3.0,101.4\n",
+            encoding="utf-8",
+        )
+        cache = {"Hill10, Shah Alam, Selangor, Malaysia": [3.07, 101.52],
+                 "Nowhere, Perlis, Malaysia": [None, None]}
+        assert backfill_csv(path, cache) == 1
+        lines = path.read_text(encoding="utf-8").splitlines()
+        assert lines[1] == '1,007,"Hill10, Shah Alam, Selangor",3.07,101.52'
+        assert lines[2] == '2,008,"Nowhere, Perlis",,'
+        assert lines[3] == '3,009,"Klang, Selangor",3.0,101.4'
+
+    def test_address_rebuilds_geocode_query(self):
+        from scripts import mudah_api
+
+        a = {"building_name": "Hill10 Residence", "subarea_name": "Shah Alam",
+             "region_name": "Selangor"}
+        row = mudah_api.to_csv_row({"attributes": a})
+        assert mudah_api.geocode_query_for_address(row["address"]) == mudah_api.geocode_query(a)
+        assert mudah_api.geocode_query_for_address("") == ""
+
+
+class TestGeoCache:
+    def _cache(self, tmp_path, **kw):
+        from scripts.geocache import GeoCache
+        kw.setdefault("legacy_json", tmp_path / "none.json")
+        return GeoCache(tmp_path / "geo.db", **kw)
+
+    def test_entries_persist_across_opens(self, tmp_path):
+        cache = self._cache(tmp_path)
+        cache["Shah Alam, Selangor, Malaysia"] = (3.07, 101.52)
+        cache.close()
+        cache = self._cache(tmp_path)
+        assert cache["Shah Alam, Selangor, Malaysia"] == [3.07, 101.52]
+        assert "Klang, Selangor, Malaysia" not in cache
+        assert len(cache) == 1
+        assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    def test_negative_results_expire_after_ttl(self, tmp_path):
+        cache = self._cache(tmp_path, negative_ttl_days=30)
+        cache["Nowhere, Malaysia"] = [None, None]
+        assert cache.get("Nowhere, Malaysia") == [None, None]
+        cache._conn.execute("UPDATE geocache SET cached_at = '2000-01-01 00:00:00'")
+        assert cache.get("Nowhere, Malaysia") is None  # stale miss -> retried
+        cache["Found, Malaysia"] = [1.0, 2.0]
+        cache._conn.execute("UPDATE geocache SET cached_at = '2000-01-01 00:00:00'")
+        assert cache.get("Found, Malaysia") == [1.0, 2.0]  # hits never expire
+
+    def test_legacy_json_migrated_once(self, tmp_path):
+        import json
+        legacy = tmp_path / "geocache.json"
+        legacy.write_text(json.dumps({"A, Malaysia": [1.0, 2.0], "B, Malaysia": [None, None]}))
+        cache = self._cache(tmp_path, legacy_json=legacy)
+        assert cache.get("A, Malaysia") == [1.0, 2.0]
+        assert cache.get("B, Malaysia") == [None, None]
+        cache.close()
+
+        legacy.write_text(json.dumps({"C, Malaysia": [5.0, 6.0]}))
+        cache = self._cache(tmp_path, legacy_json=legacy)
+        assert "C, Malaysia" not in cache
+        assert len(cache) == 2
+
+    def test_geocode_stores_result_in_geocache(self, tmp_path):
+        from scripts import geocoder
+        cache = self._cache(tmp_path)
+        calls = []
+
+        class FakeBackend(geocoder.Geocoder):
+            def lookup(self, query):
+                calls.append(query)
+                return (3.0, 101.0) if query.startswith("X") else None
+
+        geocoder.configure(FakeBackend())
+        assert scrape.geocode("X, Malaysia", cache) == (3.0, 101.0)
+        assert scrape.geocode("X, Malaysia", cache) == (3.0, 101.0)
+        assert scrape.geocode("Nowhere, Malaysia", cache) == (None, None)
+        assert calls == ["X, Malaysia", "Nowhere, Malaysia"]
+        assert cache.get("Nowhere, Malaysia") == [None, None]  # authoritative miss cached
+        assert cache.stats()["writes"] == 2
+
+
+class TestOfflineGeocoder:
+    CACHE = {
+        "Hill10 Residence, Shah Alam, Selangor, Malaysia": [3.08, 101.50],
+        "Shah Alam, Selangor, Malaysia": [3.06, 101.54],
+        "Bukit Jelutong, Shah Alam, Selangor, Malaysia": [3.10, 101.53],
+        "Nowhere, Perlis, Malaysia": [None, None],
+    }
+
+    def _table(self, tmp_path):
+        from scripts.offline_geocoder import OfflineGeocoder
+        gaz = tmp_path / "gazetteer.csv"
+        gaz.write_text("state,region,latitude,longitude\n"
+                       "Selangor,,3.07,101.52\n"
+                       "Johor,Skudai,1.53,103.66\n", encoding="utf-8")
+        return OfflineGeocoder.build(self.CACHE.items(), gaz)
+
+    def test_parse_query(self):
+        from scripts.offline_geocoder import parse_query
+        assert parse_query("Hill10, Shah Alam, Selangor, Malaysia") == ("hill10", "shah alam", "selangor")
+        assert parse_query("Shah Alam, Selangor, Malaysia") == ("", "shah alam", "selangor")
+        assert parse_query("Selangor, Malaysia") == ("", "", "selangor")
+        assert parse_query("") == ("", "", "")
+
+    def test_lookup_levels(self, tmp_path):
+        table = self._table(tmp_path)
+        # known building (case/space-insensitive)
+        assert table.lookup("hill10  residence, Shah Alam, SELANGOR, Malaysia") == (3.08, 101.50)
+        # unknown building -> subarea centroid (mean of the three Shah Alam entries)
+        lat, lon = table.lookup("New Tower, Shah Alam, Selangor, Malaysia")
+        assert lat == pytest.approx(3.08) and lon == pytest.approx((101.50 + 101.54 + 101.53) / 3)
+        # gazetteer subarea and state rows
+        assert table.lookup("Skudai, Johor, Malaysia") == (1.53, 103.66)
+        assert table.lookup("Selangor, Malaysia") == (3.07, 101.52)
+        # unknown subarea -> network; a state point never stands in for it
+        assert table.lookup("Klang, Selangor, Malaysia") is None
+        assert table.lookup("Nowhere, Perlis, Malaysia") is None
+        assert table.stats() == {"hits": 4, "misses": 2}
+
+    def test_reverse_matches_brute_force(self):
+        import random
+        from scripts.offline_geocoder import KDTree, Place, _LON_SCALE
+        rng = random.Random(7)
+        places = [Place(f"s{i}", "x", rng.uniform(1, 7), rng.uniform(100, 119)) for i in range(300)]
+        tree = KDTree(places)
+        for _ in range(200):
+            lat, lon = rng.uniform(0, 8), rng.uniform(99, 120)
+            brute = min(places, key=lambda p: (p.latitude - lat) ** 2
+                        + ((p.longitude - lon) * _LON_SCALE) ** 2)
+            assert tree.nearest(lat, lon) == brute
+
+    def test_reverse_names_nearest_subarea(self, tmp_path):
+        place = self._table(tmp_path).reverse(1.55, 103.60)
+        assert (place.subarea, place.state) == ("Skudai", "Johor")
+
+    def test_worker_answers_offline_without_queueing(self, tmp_path):
+        from scripts.geocode_worker import GeocodeWorker
+        worker = GeocodeWorker({}, lambda qs, c: pytest.fail("network call"),
+                               offline=self._table(tmp_path))
+        assert worker.coords("Skudai, Johor, Malaysia") == (1.53, 103.66)
+        assert worker.queued == 0